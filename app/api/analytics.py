@@ -0,0 +1,20 @@
+"""
+Analytics endpoints.
+These read the daily rollup tables (see app/database/rollup.py), never the raw ones.
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import get_async_db
+from app.database.rollup import daily_report
+
+router = APIRouter()
+
+@router.get("/daily")
+async def daily_metrics(days: int = Query(14, ge=1, le=366), db: AsyncSession = Depends(get_async_db)):
+    """
+    Daily sends, answers, active users, response rate and average score,
+    with breakdowns by tech area and language. Newest day first; `watermark`
+    says how fresh the rollup is (refresh it with rollup_stats.py).
+    """
+    return await db.run_sync(daily_report, days)
@@ -1,11 +1,21 @@
 """
 User management endpoints.
-This handles user registration from the web form.
+This handles registration from the web form, bulk import, progress and answer history.
 """
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from enum import Enum
+from app.core.config import settings
+from app.core.logs import masked
+from app.database import async_crud, models
+from app.database.database import AsyncSessionLocal, get_async_db
+from app.database.history import export_query, stream_ndjson, to_record
+from app.database.schedule import is_valid_timezone
+from app.services.user_import import FORMATS, import_users_async, normalize_number
+import hmac
 import logging
 
 router = APIRouter()
@@ -32,14 +42,41 @@ class UserRegistration(BaseModel):
     tech_area: TechArea = Field(..., description="Area of technical questions")
     agreed_to_messages: bool = Field(..., description="Consent to receive messages")
     name: str = Field(..., description="User's name")
+    timezone: str = Field(settings.default_timezone, description="IANA timezone, e.g. America/Sao_Paulo")
+
+    @field_validator("whatsapp_number")
+    @classmethod
+    def normalized_number(cls, value: str) -> str:
+        return normalize_number(value)
+
+    @field_validator("timezone")
+    @classmethod
+    def known_timezone(cls, value: str) -> str:
+        if not is_valid_timezone(value):
+            raise ValueError(f"Unknown timezone: {value}")
+        return value
+
+def whatsapp_number_path(whatsapp_number: str) -> str:
+    """Path parameter dependency: the number as stored ("+" and digits), however it was typed"""
+    try:
+        return normalize_number(whatsapp_number)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Guard for bulk endpoints: X-Admin-Token must match admin_api_token (unset disables them)"""
+    if not settings.admin_api_token:
+        raise HTTPException(status_code=403, detail="Bulk endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), settings.admin_api_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
 
 @router.post("/register")
-async def register_user(user_data: UserRegistration):
+async def register_user(user_data: UserRegistration, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user for the interview bot.
     This endpoint will be called by the frontend form.
     """
-    logger.info(f"New user registration: {user_data.whatsapp_number}")
+    logger.info("New user registration: %s", masked(user_data.whatsapp_number))
     
     # Validate consent
     if not user_data.agreed_to_messages:
@@ -49,36 +86,150 @@ async def register_user(user_data: UserRegistration):
         )
     
     try:
-        # TODO: Save user to database
+        tech_area = models.TechArea(user_data.tech_area.value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tech area not available yet: {user_data.tech_area.value}"
+        )
+    
+    if await async_crud.get_user_by_whatsapp(db, user_data.whatsapp_number):
+        raise HTTPException(status_code=409, detail="User already registered")
+    
+    try:
+        await async_crud.create_user(
+            db,
+            whatsapp_number=user_data.whatsapp_number,
+            name=user_data.name,
+            preferred_language=models.Language(user_data.preferred_language.value),
+            tech_area=tech_area,
+            timezone=user_data.timezone
+        )
+        
         # TODO: Send welcome message via WhatsApp
-        # TODO: Schedule first question
+        # The first question is scheduled by the scheduler's next tick (schedule.schedule_missing)
         
         return {
             "message": "User registered successfully",
             "whatsapp_number": user_data.whatsapp_number,
             "tech_area": user_data.tech_area,
             "language": user_data.preferred_language,
-            "name": user_data.name
+            "name": user_data.name,
+            "timezone": user_data.timezone
         }
         
     except Exception as e:
-        logger.error(f"Registration error: {e}")
+        logger.error("Registration error: %s", e)
         raise HTTPException(status_code=500, detail="Registration failed")
 
+@router.post("/import")
+async def import_users(
+    request: Request,
+    format: str = Query("csv", description="csv or ndjson"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Bulk import users from a CSV or NDJSON request body.
+    The body is streamed and upserted in chunks; invalid rows are reported
+    without aborting the import.
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(FORMATS)}")
+    
+    report = await import_users_async(db, request.stream(), fmt=format, chunk_size=chunk_size)
+    logger.info("User import: %d upserted, %d failed", report.upserted, report.failed)
+    return report.as_dict()
+
+@router.get("/{whatsapp_number}/progress")
+async def user_progress(
+    whatsapp_number: str = Depends(whatsapp_number_path),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Progress of a user: answers, average score per tech area and streaks.
+    Read from the user_stats aggregates, so it costs the same for any history length.
+    """
+    user = await async_crud.get_user_by_whatsapp(db, whatsapp_number)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    progress = await async_crud.get_user_progress(db, user.id)
+    if progress is None:
+        return {"whatsapp_number": whatsapp_number, "responses": 0, "scored": 0, "average_score": None,
+                "by_area": {}, "current_streak": 0, "best_streak": 0, "last_answered_at": None}
+    
+    return {
+        "whatsapp_number": whatsapp_number,
+        **progress._asdict(),
+        "by_area": {area.value: stats._asdict() for area, stats in progress.by_area.items()},
+    }
+
+@router.get("/responses/export", dependencies=[Depends(require_admin)])
+async def export_all_responses(after_id: Optional[int] = Query(None, description="Resume after this response id")):
+    """
+    Export every response as NDJSON, in id order (requires X-Admin-Token).
+    Streamed in batches from a server-side cursor, so memory stays flat.
+    """
+    return StreamingResponse(stream_ndjson(AsyncSessionLocal, export_query(after_id=after_id)),
+                             media_type="application/x-ndjson")
+
+@router.get("/{whatsapp_number}/responses")
+async def user_responses(
+    whatsapp_number: str = Depends(whatsapp_number_path),
+    limit: int = Query(50, ge=1, le=settings.history_page_max_size),
+    cursor: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    A user's answers, newest first, one page at a time.
+    Keyset pagination: every page costs the same, however deep.
+    """
+    user = await async_crud.get_user_by_whatsapp(db, whatsapp_number)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    page = await async_crud.get_user_responses_page(db, user.id, limit=limit, before_id=cursor)
+    return {
+        "items": [to_record(response) for response in page],
+        "next_cursor": page[-1].id if len(page) == limit else None
+    }
+
+@router.get("/{whatsapp_number}/responses/export")
+async def export_user_responses(
+    whatsapp_number: str = Depends(whatsapp_number_path),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Export a user's answers as NDJSON, oldest first"""
+    user = await async_crud.get_user_by_whatsapp(db, whatsapp_number)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return StreamingResponse(stream_ndjson(AsyncSessionLocal, export_query(user_id=user.id)),
+                             media_type="application/x-ndjson",
+                             headers={"Content-Disposition": f'attachment; filename="responses-{user.id}.ndjson"'})
+
 @router.post("/unsubscribe/{whatsapp_number}")
-async def unsubscribe_user(whatsapp_number: str):
+async def unsubscribe_user(
+    whatsapp_number: str = Depends(whatsapp_number_path),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Unsubscribe user from daily questions.
     This can be called via STOP command or web interface.
     """
     try:
-        logger.info(f"Unsubscribing user: {whatsapp_number}")
+        logger.info("Unsubscribing user: %s", masked(whatsapp_number))
+        
+        if not await async_crud.deactivate_user(db, whatsapp_number):
+            raise HTTPException(status_code=404, detail="User not found")
         
-        # TODO: Mark user as inactive in database
-        # TODO: Cancel scheduled questions
+        # Inactive users drop out of the due-time index, so nothing is left scheduled
         
         return {"message": "User unsubscribed successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Unsubscribe error: {e}")
+        logger.error("Unsubscribe error: %s", e)
         raise HTTPException(status_code=500, detail="Unsubscribe failed")
\ No newline at end of file
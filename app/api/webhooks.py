@@ -3,12 +3,33 @@ WhatsApp webhook endpoints.
 This handles incoming messages from WhatsApp Cloud API.
 """
 from fastapi import APIRouter, Request, HTTPException, Query
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import PlainTextResponse, JSONResponse
 from app.core.config import settings
+from app.core.logs import logging_stats
+from app.database.user_state import user_states
+from app.services.audio import get_audio_pipeline
+from app.services.status_ingest import StatusIngestor
+from app.services.webhook_decoder import WebhookDecodeError, decode, verify_signature
+from app.services.webhook_processor import process_messages, deduplicator
+from app.services.webhook_queue import WebhookQueue
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
+# High-frequency events get their own loggers so they can be sampled (log_sample_rates)
+receipt_logger = logging.getLogger(f"{__name__}.receipt")
+verify_logger = logging.getLogger(f"{__name__}.verify")
+
+# Incoming payloads are processed by background workers, started in app.main
+webhook_queue = WebhookQueue(
+    handler=process_messages,
+    maxsize=settings.webhook_queue_size,
+    workers=settings.webhook_workers,
+    enqueue_timeout=settings.webhook_enqueue_timeout
+)
+
+# Delivery status callbacks skip the queue and are written in coalesced batches
+status_ingestor = StatusIngestor()
 
 @router.get("/whatsapp")
 async def verify_webhook(
@@ -20,10 +41,10 @@ async def verify_webhook(
     Webhook verification endpoint for WhatsApp Cloud API.
     Meta calls this to verify our webhook URL.
     """
-    logger.info(f"Webhook verification attempt with token: {hub_verify_token}")
+    verify_logger.info("Webhook verification attempt (mode %s)", hub_mode)
     
     if hub_mode == "subscribe" and hub_verify_token == settings.webhook_verify_token:
-        logger.info("Webhook verified successfully")
+        verify_logger.info("Webhook verified successfully")
         return PlainTextResponse(hub_challenge)
     
     logger.warning("Webhook verification failed")
@@ -33,20 +54,50 @@ async def verify_webhook(
 async def receive_message(request: Request):
     """
     Receive incoming WhatsApp messages.
-    This is where we'll process user responses and handle commands like STOP.
+    The raw body is signature-checked (when whatsapp_app_secret is set) and
+    decoded into message and status events. Messages are queued; webhook
+    workers process them so Meta gets its 200 response right away. Delivery
+    status callbacks go to the status ingestor instead.
     """
+    raw = await request.body()
+    if settings.whatsapp_app_secret and not verify_signature(
+            raw, request.headers.get("X-Hub-Signature-256"), settings.whatsapp_app_secret):
+        logger.warning("Rejecting webhook with a missing or invalid signature")
+        raise HTTPException(status_code=403, detail="Invalid signature")
+    
     try:
-        body = await request.json()
-        logger.info(f"Received webhook: {body}")
-        
-        # TODO: Process incoming messages
-        # - Extract user phone number and message content
-        # - Handle STOP command for unsubscription
-        # - Process user responses to questions
-        # - Send to AI for analysis
-        
-        return {"status": "received"}
-        
-    except Exception as e:
-        logger.error(f"Error processing webhook: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
\ No newline at end of file
+        batch = decode(raw)
+    except WebhookDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    receipt_logger.info("Webhook received: %d messages, %d statuses, %d bytes",
+                        len(batch.messages), len(batch.statuses), len(raw))
+    
+    if batch.statuses and (not status_ingestor.running or not status_ingestor.add(batch.statuses)):
+        logger.warning("Status buffer full, rejecting payload")
+        return _busy()
+    
+    if batch.messages and (not webhook_queue.running or not await webhook_queue.put(batch.messages)):
+        # Queue is full: ask Meta to redeliver later instead of dropping the event
+        logger.warning("Webhook queue full, rejecting payload")
+        return _busy()
+    
+    return {"status": "received"}
+
+def _busy() -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"status": "busy"},
+        headers={"Retry-After": "1"}
+    )
+
+@router.get("/whatsapp/metrics")
+async def webhook_metrics():
+    """Ingestion queue depth/latency, status buffer, dedup and user state cache counters, audio pipeline stages, log queue"""
+    return {
+        "queue": webhook_queue.metrics(),
+        "statuses": status_ingestor.metrics(),
+        "dedup": deduplicator.stats(),
+        "user_state": user_states.stats(),
+        "audio": get_audio_pipeline().metrics(),
+        "logging": logging_stats()
+    }
@@ -12,16 +12,97 @@ class Settings(BaseSettings):
     whatsapp_access_token: str
     whatsapp_phone_number_id: str
     webhook_verify_token: str
+    whatsapp_app_secret: Optional[str] = None  # Checks X-Hub-Signature-256 on webhooks when set
+    whatsapp_api_url: str = "https://graph.facebook.com/v18.0"
+    whatsapp_max_concurrency: int = 64  # In-flight requests on the pooled client
+    whatsapp_rate_limit_per_second: float = 80.0  # Meta's default per-number throughput
+    whatsapp_max_retries: int = 5  # Retries on 429 / 5xx responses
+    whatsapp_request_timeout: float = 10.0
+    
+    # Outbox (outbound messages queued with the state change that causes them)
+    outbox_enabled: bool = True  # Drain the outbox in the API process
+    outbox_batch_size: int = 100  # Rows claimed and sent concurrently per cycle
+    outbox_poll_seconds: float = 1.0  # Wait between cycles when the outbox is empty
+    outbox_claim_seconds: int = 60  # A claimed row is retried after this if its sender died
+    outbox_max_attempts: int = 8  # Failed 5xx / network sends before a row is marked failed
+    outbox_retention_days: int = 7  # Sent and failed rows are deleted after this
+    
+    # Webhook ingestion queue
+    webhook_queue_size: int = 10000  # Payloads buffered before backpressure
+    webhook_workers: int = 4
+    webhook_enqueue_timeout: float = 0.05  # Seconds to wait for a free slot
+    webhook_dedup_max_entries: int = 100000  # In-memory message IDs kept for dedup
+    webhook_dedup_ttl_seconds: int = 86400  # Meta redelivers for up to a day
+    webhook_dedup_persist: bool = False  # Also record message IDs in SQLite
+    status_flush_ms: int = 500  # Delivery status callbacks are coalesced and upserted this often
+    status_max_pending: int = 100000  # Buffered message IDs before status callbacks get a 503
+    status_retention_days: int = 30  # message_statuses rows are deleted after this
     
     # Database Configuration
     database_url: str = "sqlite:///./interview_bot.db"
+    user_state_cache_max_entries: int = 50000  # Conversation state cached for inbound routing
+    user_state_cache_ttl_seconds: int = 300  # Bounds staleness from writes in other processes
+    
+    # SQLite engine profile (applied as PRAGMAs on every new connection)
+    sqlite_journal_mode: str = "wal"  # Readers don't block the writer
+    sqlite_synchronous: str = "normal"  # Safe with WAL, far fewer fsyncs
+    sqlite_mmap_size: int = 268435456  # 256 MiB memory-mapped I/O
+    sqlite_cache_size: int = -65536  # Negative = KiB, so 64 MiB page cache
+    sqlite_busy_timeout_ms: int = 5000  # Wait for locks instead of failing
+    sqlite_temp_store: str = "memory"
+    sqlite_read_pool_size: int = 8  # Reader connections; writes use a single connection
+    sqlite_split_read_write: bool = True  # Route reads and writes to separate pools
+    history_page_max_size: int = 200  # Largest page of response history per request
+    history_export_batch_size: int = 1000  # Rows fetched per round trip by NDJSON exports
+    admin_api_token: Optional[str] = None  # X-Admin-Token for bulk endpoints, which are disabled when unset
     
     # OpenAI Configuration (for response analysis)
     openai_api_key: Optional[str] = None
+    openai_model: str = "gpt-3.5-turbo"
+    ai_feedback_enabled: bool = False  # Run the grading engine inside the API process
+    ai_feedback_provider: str = "openai"  # "openai", or "fake" for local runs and CI
+    ai_max_concurrency: int = 16  # Concurrent grading calls
+    ai_batch_size: int = 64  # Pending responses fetched / results written per batch
+    ai_feedback_sla_seconds: int = 120  # Feedback must arrive within 2 minutes
+    ai_regrade_after_seconds: int = 900  # Responses given fallback feedback are graded again after this
+    ai_max_regrades: int = 3  # Then the fallback feedback is final
+    feedback_cache_enabled: bool = True  # Reuse feedback for repeated answers
+    feedback_cache_max_entries: int = 50000  # In-memory tier
+    feedback_cache_persist: bool = True  # Also keep entries in the feedback_cache table
+    feedback_cache_max_rows: int = 500000  # Persisted tier, least recently used rows evicted
+    feedback_cache_ttl_seconds: int = 2592000  # 30 days
+    
+    # Voice answers (media download and transcription)
+    audio_transcription_enabled: bool = False  # Run the transcription process pool in the API process
+    transcription_backend: str = "openai"  # "openai", or "stub" for local runs and CI
+    transcription_model: str = "whisper-1"
+    audio_workers: int = 2  # Worker processes for decoding and transcription
+    audio_queue_size: int = 100  # Voice notes waiting for a worker before callers block
+    audio_sample_rate: int = 16000  # What speech models expect
+    media_chunk_size: int = 65536  # Download chunk size in bytes
+    media_max_bytes: int = 16777216  # WhatsApp's 16 MB audio limit
+    media_spool_max_memory: int = 1048576  # Larger downloads roll over to a temp file
+    media_spool_dir: Optional[str] = None  # Defaults to the system temp dir
     
     # Application Settings
     debug: bool = False
-    daily_question_hour: int = 9  # Send questions at 9 AM
+    daily_question_hour: int = 9  # Send questions at 9 AM in each user's timezone
+    default_timezone: str = "UTC"  # For users registered without one
+    scheduler_enabled: bool = False  # Run the daily question scheduler in the API process
+    dispatch_window_minutes: int = 60  # Sends for one local 9 AM are spread over this window
+    dispatch_max_per_second: float = 20.0  # Upper bound on questions queued per second (per process)
+    dispatch_tick_seconds: int = 10  # How often the scheduler looks for due users
+    dispatch_lease_seconds: int = 60  # Partition leases of a worker that stops ticking expire after this
+    dispatch_min_interval_hours: int = 20  # A user is never sent two daily questions closer than this
+    question_no_repeat_window: int = 30  # Last N questions sent to a user are not repeated
+    rollup_late_data_minutes: int = 360  # Rollups recompute this far behind the watermark (late scores)
+    
+    # Logging (written by a background thread, see app/core/logs.py)
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" lines, or "text" for reading locally
+    log_queue_size: int = 10000  # Records waiting for the writer thread; more are dropped and counted
+    # logger=rate pairs; INFO and DEBUG records of these loggers (and their children) are sampled
+    log_sample_rates: str = "app.api.webhooks.receipt=0.01,app.api.webhooks.verify=0.1,uvicorn.access=0.01"
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,230 @@
+"""
+Non-blocking structured logging.
+Every logger feeds a bounded queue through a QueueHandler; a QueueListener
+thread formats the records (as JSON lines, or the old text format) and
+writes them, so neither formatting nor stdout/disk I/O happens inside a
+request. When the queue is full records are dropped and counted instead of
+blocking the event loop. INFO and DEBUG records of high-frequency loggers
+can be sampled (log_sample_rates); warnings and errors always pass. Each
+record carries the ID of the request that produced it (see RequestIdMiddleware).
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from enum import Enum
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ID of the HTTP request (or queued webhook) being handled in this context
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Arguments safe to format later on the listener thread (they can't change meanwhile)
+_IMMUTABLE = (str, int, float, bool, type(None), bytes, Enum)
+# LogRecord attributes that aren't `extra` fields
+_STANDARD = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id",
+                                                                        "sample_rate"}
+
+_listener: Optional[QueueListener] = None
+_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def masked(number: Optional[str]) -> str:
+    """Phone number with the middle digits hidden, for logs"""
+    if not number:
+        return "-"
+    return f"{number[:3]}{'*' * max(0, len(number) - 7)}{number[-4:]}" if len(number) > 7 else "****"
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """"logger=rate,logger=rate" -> {logger: rate}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a share of the INFO/DEBUG records of some loggers (and their children)"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def _rate(self, name: str) -> Optional[float]:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate is None:
+            return True
+        if rate < 1.0 and random.random() >= rate:
+            self.sampled_out += 1
+            return False
+        record.sample_rate = rate  # Lets readers scale counts back up
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks and defers message formatting to the listener"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id.get()
+        args = record.args
+        # A lone mapping argument becomes record.args itself, so mappings are rendered now too
+        if args and (isinstance(args, dict) or not all(isinstance(arg, _IMMUTABLE) for arg in args)):
+            record.msg, record.args = record.getMessage(), None
+        if record.exc_info:
+            # Tracebacks hold frames, so they are rendered here
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop() waits for room in a full queue instead of failing"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, extras, exc"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "sample_rate", None) is not None:
+            entry["sample_rate"] = record.sample_rate
+        for key, value in vars(record).items():
+            if key not in _STANDARD:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode()
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic text format, with the request ID appended when there is one"""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        rid = getattr(record, "request_id", None)
+        return f"{line} [{rid}]" if rid else line
+
+
+def configure_logging(level: str = "INFO", fmt: str = "json", queue_size: int = 10000,
+                      sample_rates: str = "", stream=None):
+    """Route the root logger (and uvicorn's) through the queue; safe to call again"""
+    global _listener, _handler
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(SamplingFilter(parse_sample_rates(sample_rates)))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level.upper())
+    # uvicorn installs its own synchronous handlers; send its records through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = DrainingQueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def logging_stats() -> dict:
+    """Records dropped on a full queue or sampled out, and the current backlog"""
+    if _handler is None:
+        return {"queued": 0, "dropped": 0, "sampled_out": 0}
+    sampler = next((f for f in _handler.filters if isinstance(f, SamplingFilter)), None)
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "sampled_out": sampler.sampled_out if sampler else 0,
+    }
+
+
+class RequestIdMiddleware:
+    """ASGI middleware: take X-Request-ID from the request (or make one) and echo it on the response"""
+
+    def __init__(self, app, header: str = "x-request-id"):
+        self.app = app
+        self.header = header.encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = next((value for key, value in scope["headers"] if key == self.header), None)
+        rid = incoming.decode("latin-1")[:64] if incoming else uuid.uuid4().hex
+        token = request_id.set(rid)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), (self.header, rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,202 @@
+"""
+Prometheus metrics.
+This defines the process-wide metrics and the hooks that feed them: ASGI
+middleware for per-route latency, SQLAlchemy cursor events for per-statement
+timing tagged with the calling CRUD function, and helpers for timing outbound
+calls. Scraped from GET /metrics.
+"""
+import functools
+import inspect
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Buckets in seconds, from sub-millisecond SQLite reads to slow AI calls
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SLOW_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"], buckets=FAST_BUCKETS + (5.0, 10.0),
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement latency by CRUD function and statement type",
+    ["operation", "statement"], buckets=FAST_BUCKETS,
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "SQL statements that raised", ["operation", "error"],
+)
+OUTBOUND_SECONDS = Histogram(
+    "outbound_call_duration_seconds", "Latency of calls to external services",
+    ["service", "outcome"], buckets=SLOW_BUCKETS,
+)
+OUTBOUND_ERRORS = Counter(
+    "outbound_call_errors_total", "Failed calls to external services", ["service", "reason"],
+)
+QUEUE_DEPTH = Gauge("queue_depth", "Items waiting in in-process queues", ["queue"])
+DB_PROBE_SECONDS = Gauge("db_probe_duration_seconds", "Latency of the last /health database probe")
+
+# Name of the CRUD function running in this context, used to tag SQL timings
+_operation: ContextVar[str] = ContextVar("db_operation", default="untagged")
+
+
+@contextmanager
+def db_operation(name: str):
+    """Tag SQL statements run inside the block with an operation name"""
+    token = _operation.set(name)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+def tagged(func: Callable) -> Callable:
+    """Decorator: tag SQL run by a (sync or async) function with its module.function name"""
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with db_operation(name):
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    if inspect.isasyncgenfunction(func):
+        @functools.wraps(func)
+        async def async_generator_wrapper(*args, **kwargs):
+            generator = func(*args, **kwargs)
+            try:
+                while True:
+                    with db_operation(name):
+                        try:
+                            item = await generator.__anext__()
+                        except StopAsyncIteration:
+                            return
+                    yield item
+            finally:
+                # A consumer that stops early (e.g. a disconnected client) must not leave the
+                # inner generator's session and cursor open until garbage collection
+                with db_operation(name):
+                    await generator.aclose()
+        return async_generator_wrapper
+
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            # Statements run while the caller iterates, so tag each resume
+            generator = func(*args, **kwargs)
+            try:
+                while True:
+                    with db_operation(name):
+                        try:
+                            item = next(generator)
+                        except StopIteration:
+                            return
+                    yield item
+            finally:
+                with db_operation(name):
+                    generator.close()
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with db_operation(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _statement_type(statement: str) -> str:
+    return statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+
+
+def instrument_engine(engine: Engine):
+    """Time every statement on a (sync) engine; async engines pass .sync_engine"""
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+    engine._metrics_instrumented = True
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(_operation.get(), _statement_type(statement)).observe(
+            time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+        DB_QUERY_ERRORS.labels(_operation.get(),
+                               type(exception_context.original_exception).__name__).inc()
+
+
+@contextmanager
+def outbound_call(service: str):
+    """Time an outbound call; exceptions count as errors and propagate"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        OUTBOUND_SECONDS.labels(service, "error").observe(time.perf_counter() - started)
+        OUTBOUND_ERRORS.labels(service, type(e).__name__).inc()
+        raise
+    OUTBOUND_SECONDS.labels(service, "ok").observe(time.perf_counter() - started)
+
+
+def observe_outbound(service: str, seconds: float, error: str = None):
+    """Record an outbound call timed elsewhere; error is a short reason, e.g. an HTTP status"""
+    OUTBOUND_SECONDS.labels(service, "error" if error else "ok").observe(seconds)
+    if error:
+        OUTBOUND_ERRORS.labels(service, error).inc()
+
+
+def percentile(samples: Iterable[float], pct: float, scale: float = 1000.0) -> float:
+    """Nearest-rank percentile of durations in seconds, in milliseconds (scale=1 keeps seconds)"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    rank = min(len(ordered), max(1, math.ceil(pct / 100 * len(ordered))))
+    return round(ordered[rank - 1] * scale, 3)
+
+
+def track_queue(name: str, depth: Callable[[], int]):
+    """Report a queue's depth at scrape time"""
+    QUEUE_DEPTH.labels(name).set_function(depth)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency by route template (not raw path)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status["code"])
+            ).observe(time.perf_counter() - started)
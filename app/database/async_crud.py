@@ -0,0 +1,198 @@
+"""
+Async CRUD operations for database models.
+These mirror crud.py for use inside async endpoints and workers, so queries
+don't block the event loop. Scripts keep using the sync functions in crud.py.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select, update
+from app.core.config import settings
+from app.core.metrics import tagged
+from app.database.models import User, Question, UserResponse, QuestionSend, TechArea, Language
+from app.database.catalog import CatalogQuestion, question_catalog
+from app.database.history import page_query
+from app.database.outbox import aenqueue_question
+from app.database.rotation import next_question_id
+from app.database.stats import UserProgress, arecord_answer, arecord_scores, build_progress, progress_queries
+from app.database.user_state import user_states
+from typing import Optional, List, AsyncIterator, Tuple
+from datetime import datetime
+
+# User CRUD operations
+@tagged
+async def create_user(db: AsyncSession, whatsapp_number: str, name: Optional[str],
+                      preferred_language: Language, tech_area: TechArea,
+                      timezone: Optional[str] = None) -> User:
+    """Create a new user"""
+    db_user = User(
+        whatsapp_number=whatsapp_number,
+        name=name,
+        preferred_language=preferred_language,
+        tech_area=tech_area,
+        timezone=timezone or settings.default_timezone
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    user_states.invalidate(whatsapp_number)  # May be cached as unknown
+    return db_user
+
+@tagged
+async def get_user_by_whatsapp(db: AsyncSession, whatsapp_number: str) -> Optional[User]:
+    """Get user by WhatsApp number"""
+    result = await db.execute(select(User).where(User.whatsapp_number == whatsapp_number).limit(1))
+    return result.scalars().first()
+
+@tagged
+async def get_active_users(db: AsyncSession) -> List[User]:
+    """Get all active users"""
+    result = await db.execute(select(User).where(User.is_active == True))
+    return list(result.scalars().all())
+
+@tagged
+async def iter_active_users(db: AsyncSession, chunk_size: int = 1000) -> AsyncIterator[List[User]]:
+    """Stream active users in id-ordered chunks (keyset pagination)"""
+    last_id = 0
+    while True:
+        result = await db.execute(
+            select(User)
+            .where(and_(User.is_active == True, User.id > last_id))
+            .order_by(User.id)
+            .limit(chunk_size)
+        )
+        chunk = list(result.scalars().all())
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        yield chunk
+
+@tagged
+async def deactivate_user(db: AsyncSession, whatsapp_number: str) -> bool:
+    """Deactivate user (for STOP command)"""
+    user = await get_user_by_whatsapp(db, whatsapp_number)
+    if user:
+        user.is_active = False
+        await db.commit()
+        user_states.update_user(user.id, is_active=False)
+        return True
+    return False
+
+@tagged
+async def update_last_question_sent(db: AsyncSession, user_id: int,
+                                    question_id: Optional[int] = None):
+    """
+    Update when last question was sent to user, and which question is now open.
+    With a question, its message is queued in the outbox by the same commit.
+    """
+    user = await db.get(User, user_id)
+    if user:
+        user.last_question_sent = datetime.utcnow()
+        if question_id is not None:
+            user.pending_question_id = question_id
+            db.add(QuestionSend(user_id=user_id, question_id=question_id, sent_at=user.last_question_sent))
+            await aenqueue_question(db, user, question_id)
+        await db.commit()
+        if question_id is not None:
+            user_states.update_user(user_id, pending_question_id=question_id)
+
+# Question CRUD operations
+@tagged
+async def create_question(db: AsyncSession, tech_area: TechArea, difficulty: str,
+                          question_text_en: str, question_text_es: Optional[str] = None,
+                          question_text_pt: Optional[str] = None,
+                          expected_concepts: Optional[str] = None) -> Question:
+    """Create a new question"""
+    db_question = Question(
+        tech_area=tech_area,
+        difficulty=difficulty,
+        question_text_en=question_text_en,
+        question_text_es=question_text_es,
+        question_text_pt=question_text_pt,
+        expected_concepts=expected_concepts
+    )
+    db.add(db_question)
+    await db.commit()
+    await db.refresh(db_question)
+    question_catalog.invalidate()
+    return db_question
+
+@tagged
+async def get_questions_by_area(db: AsyncSession, tech_area: TechArea) -> Tuple[CatalogQuestion, ...]:
+    """Get all questions for a specific tech area (read-only records from the question catalog)"""
+    return await db.run_sync(question_catalog.by_area, tech_area)
+
+@tagged
+async def get_random_question(db: AsyncSession, tech_area: TechArea,
+                              exclude_answered_by_user: Optional[int] = None) -> Optional[Question]:
+    """
+    Get a random question for a tech area.
+    With a user id, the question is drawn from the user's rotation deck; the draw
+    is flushed but left for the caller to commit (see crud.get_random_question).
+    """
+    if exclude_answered_by_user:
+        question_id = await db.run_sync(next_question_id, exclude_answered_by_user, tech_area)
+        await db.flush()
+    else:
+        question = await db.run_sync(question_catalog.random_question, tech_area)
+        question_id = question.id if question else None
+
+    return await db.get(Question, question_id) if question_id else None
+
+# Response CRUD operations
+@tagged
+async def create_user_response(db: AsyncSession, user_id: int, question_id: int,
+                               response_text: str, response_type: str = "text") -> UserResponse:
+    """Create a new user response"""
+    db_response = UserResponse(
+        user_id=user_id,
+        question_id=question_id,
+        response_text=response_text,
+        response_type=response_type
+    )
+    db.add(db_response)
+    # The answered question is no longer open
+    await db.execute(
+        update(User)
+        .where(and_(User.id == user_id, User.pending_question_id == question_id))
+        .values(pending_question_id=None)
+    )
+    await arecord_answer(db, user_id, question_id)
+    await db.commit()
+    await db.refresh(db_response)
+    user_states.answered(user_id, question_id)
+    return db_response
+
+@tagged
+async def update_response_feedback(db: AsyncSession, response_id: int,
+                                   ai_feedback: str, score: int):
+    """Update response with AI feedback and score"""
+    response = await db.get(UserResponse, response_id)
+    if response:
+        await arecord_scores(db, [{"response_id": response_id, "score": score}])
+        response.ai_feedback = ai_feedback
+        response.feedback_retry_at = None  # Not a fallback any more
+        response.score = score
+        await db.commit()
+        return response
+    return None
+
+@tagged
+async def get_user_responses(db: AsyncSession, user_id: int) -> List[UserResponse]:
+    """Get all responses from a user (unbounded; prefer get_user_responses_page)"""
+    result = await db.execute(select(UserResponse).where(UserResponse.user_id == user_id))
+    return list(result.scalars().all())
+
+@tagged
+async def get_user_responses_page(db: AsyncSession, user_id: int, limit: int = 50,
+                                  before_id: Optional[int] = None) -> List[UserResponse]:
+    """Get a newest-first page of a user's responses (see crud.get_user_responses_page)"""
+    result = await db.execute(page_query(user_id, limit, before_id))
+    return list(result.scalars().all())
+
+@tagged
+async def get_user_progress(db: AsyncSession, user_id: int) -> Optional[UserProgress]:
+    """Get a user's progress from the user_stats aggregates (see crud.get_user_progress)"""
+    stats_query, areas_query = progress_queries(user_id)
+    row = (await db.execute(stats_query)).first()
+    if row is None:
+        return None
+    return build_progress(row[0], row[1], (await db.execute(areas_query)).scalars().all())
@@ -0,0 +1,141 @@
+"""
+Process-wide question catalog.
+The questions table is small and rarely changes, so it is loaded once into
+compact read-only records indexed by tech area, difficulty and language.
+"""
+import logging
+import random
+import threading
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database.models import Question, TechArea, Language
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogQuestion(NamedTuple):
+    """Read-only copy of a question row"""
+    id: int
+    tech_area: TechArea
+    difficulty: str
+    text_en: str
+    text_es: Optional[str]
+    text_pt: Optional[str]
+    expected_concepts: Optional[str]
+
+    def text(self, language: Language) -> str:
+        """Question text in the given language, falling back to English"""
+        if language == Language.SPANISH and self.text_es:
+            return self.text_es
+        if language == Language.PORTUGUESE and self.text_pt:
+            return self.text_pt
+        return self.text_en
+
+
+class CatalogSnapshot:
+    """Immutable indexed view of the questions table at one version"""
+
+    def __init__(self, version: int, fingerprint: tuple, questions: Tuple[CatalogQuestion, ...]):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.by_id: Dict[int, CatalogQuestion] = {q.id: q for q in questions}
+
+        by_area: Dict[TechArea, list] = {}
+        by_difficulty: Dict[Tuple[TechArea, str], list] = {}
+        for q in questions:
+            by_area.setdefault(q.tech_area, []).append(q)
+            by_difficulty.setdefault((q.tech_area, q.difficulty), []).append(q)
+        self.by_area = {key: tuple(value) for key, value in by_area.items()}
+        self.by_difficulty = {key: tuple(value) for key, value in by_difficulty.items()}
+
+        # (area, difficulty, language) -> ((question_id, localized text), ...)
+        self.localized: Dict[Tuple[TechArea, str, Language], Tuple[Tuple[int, str], ...]] = {
+            (area, difficulty, language): tuple((q.id, q.text(language)) for q in items)
+            for (area, difficulty), items in self.by_difficulty.items()
+            for language in Language
+        }
+
+
+def _fingerprint(db: Session) -> tuple:
+    """Cheap summary of the questions table used to detect changes"""
+    return tuple(db.query(func.count(Question.id), func.max(Question.id),
+                          func.max(Question.created_at)).one())
+
+
+class QuestionCatalog:
+    """Holds the current snapshot and swaps it atomically on reload"""
+
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._stale = True
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def invalidate(self):
+        """Mark the catalog stale; the next access reloads it"""
+        self._stale = True
+
+    def reload(self, db: Session) -> CatalogSnapshot:
+        """Load every question into a new snapshot"""
+        with self._lock:
+            # Cleared first so an invalidate() racing with this load is kept
+            self._stale = False
+            fingerprint = _fingerprint(db)
+            rows = db.query(
+                Question.id, Question.tech_area, Question.difficulty,
+                Question.question_text_en, Question.question_text_es,
+                Question.question_text_pt, Question.expected_concepts
+            ).order_by(Question.id).all()
+            self.version += 1
+            self._snapshot = CatalogSnapshot(
+                self.version, fingerprint, tuple(CatalogQuestion(*row) for row in rows)
+            )
+            logger.info("Question catalog v%d loaded with %d questions", self.version, len(rows))
+            return self._snapshot
+
+    def refresh(self, db: Session) -> CatalogSnapshot:
+        """Reload only if the table changed (e.g. written by another process)"""
+        if self._snapshot is None or self._snapshot.fingerprint != _fingerprint(db):
+            return self.reload(db)
+        return self._snapshot
+
+    def snapshot(self, db: Session) -> CatalogSnapshot:
+        """Current snapshot, loading it first if needed"""
+        if self._stale or self._snapshot is None:
+            return self.reload(db)
+        return self._snapshot
+
+    def get(self, db: Session, question_id: int) -> Optional[CatalogQuestion]:
+        """Look up a question by id"""
+        return self.snapshot(db).by_id.get(question_id)
+
+    def by_area(self, db: Session, tech_area: TechArea) -> Tuple[CatalogQuestion, ...]:
+        """All questions for a tech area"""
+        return self.snapshot(db).by_area.get(tech_area, ())
+
+    def random_question(self, db: Session, tech_area: TechArea,
+                        difficulty: Optional[str] = None) -> Optional[CatalogQuestion]:
+        """Pick a random question for an area (and optional difficulty) in O(1)"""
+        snapshot = self.snapshot(db)
+        if difficulty is None:
+            pool = snapshot.by_area.get(tech_area, ())
+        else:
+            pool = snapshot.by_difficulty.get((tech_area, difficulty), ())
+        return random.choice(pool) if pool else None
+
+    def localized(self, db: Session, tech_area: TechArea, difficulty: str,
+                  language: Language) -> Tuple[Tuple[int, str], ...]:
+        """(question_id, text) pairs for an area and difficulty in one language"""
+        return self.snapshot(db).localized.get((tech_area, difficulty, language), ())
+
+    def text(self, db: Session, question_id: int, language: Language) -> Optional[str]:
+        """Localized text of a question"""
+        question = self.get(db, question_id)
+        return question.text(language) if question else None
+
+
+# Global catalog instance
+question_catalog = QuestionCatalog()
@@ -3,51 +3,91 @@ CRUD operations for database models.
 These functions handle creating, reading, updating, and deleting data.
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
-from app.database.models import User, Question, UserResponse, TechArea, Language
-from typing import Optional, List
+from sqlalchemy import and_, update
+from app.core.config import settings
+from app.core.metrics import tagged
+from app.database.models import User, Question, UserResponse, QuestionSend, TechArea, Language
+from app.database.catalog import CatalogQuestion, question_catalog
+from app.database.history import page_query
+from app.database.outbox import enqueue_question
+from app.database.rotation import next_question_id
+from app.database.stats import UserProgress, build_progress, progress_queries, record_answer, record_scores
+from app.database.user_state import user_states
+from typing import Optional, List, Iterator, Tuple
 from datetime import datetime
 
 # User CRUD operations
+@tagged
 def create_user(db: Session, whatsapp_number: str, name: Optional[str], 
-                preferred_language: Language, tech_area: TechArea) -> User:
+                preferred_language: Language, tech_area: TechArea,
+                timezone: Optional[str] = None) -> User:
     """Create a new user"""
     db_user = User(
         whatsapp_number=whatsapp_number,
         name=name,
         preferred_language=preferred_language,
-        tech_area=tech_area
+        tech_area=tech_area,
+        timezone=timezone or settings.default_timezone
     )
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    user_states.invalidate(whatsapp_number)  # May be cached as unknown
     return db_user
 
+@tagged
 def get_user_by_whatsapp(db: Session, whatsapp_number: str) -> Optional[User]:
     """Get user by WhatsApp number"""
     return db.query(User).filter(User.whatsapp_number == whatsapp_number).first()
 
+@tagged
 def get_active_users(db: Session) -> List[User]:
     """Get all active users"""
     return db.query(User).filter(User.is_active == True).all()
 
+@tagged
+def iter_active_users(db: Session, chunk_size: int = 1000) -> Iterator[List[User]]:
+    """Stream active users in id-ordered chunks (keyset pagination)"""
+    last_id = 0
+    while True:
+        chunk = db.query(User).filter(
+            and_(User.is_active == True, User.id > last_id)
+        ).order_by(User.id).limit(chunk_size).all()
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        yield chunk
+
+@tagged
 def deactivate_user(db: Session, whatsapp_number: str) -> bool:
     """Deactivate user (for STOP command)"""
     user = get_user_by_whatsapp(db, whatsapp_number)
     if user:
         user.is_active = False
         db.commit()
+        user_states.update_user(user.id, is_active=False)
         return True
     return False
 
-def update_last_question_sent(db: Session, user_id: int):
-    """Update when last question was sent to user"""
+@tagged
+def update_last_question_sent(db: Session, user_id: int, question_id: Optional[int] = None):
+    """
+    Update when last question was sent to user, and which question is now open.
+    With a question, its message is queued in the outbox by the same commit.
+    """
     user = db.query(User).filter(User.id == user_id).first()
     if user:
         user.last_question_sent = datetime.utcnow()
+        if question_id is not None:
+            user.pending_question_id = question_id
+            db.add(QuestionSend(user_id=user_id, question_id=question_id, sent_at=user.last_question_sent))
+            enqueue_question(db, user, question_id)
         db.commit()
+        if question_id is not None:
+            user_states.update_user(user_id, pending_question_id=question_id)
 
 # Question CRUD operations
+@tagged
 def create_question(db: Session, tech_area: TechArea, difficulty: str,
                    question_text_en: str, question_text_es: Optional[str] = None,
                    question_text_pt: Optional[str] = None,
@@ -64,32 +104,35 @@ def create_question(db: Session, tech_area: TechArea, difficulty: str,
     db.add(db_question)
     db.commit()
     db.refresh(db_question)
+    question_catalog.invalidate()
     return db_question
 
-def get_questions_by_area(db: Session, tech_area: TechArea) -> List[Question]:
-    """Get all questions for a specific tech area"""
-    return db.query(Question).filter(Question.tech_area == tech_area).all()
+@tagged
+def get_questions_by_area(db: Session, tech_area: TechArea) -> Tuple[CatalogQuestion, ...]:
+    """Get all questions for a specific tech area (read-only records from the question catalog)"""
+    return question_catalog.by_area(db, tech_area)
 
+@tagged
 def get_random_question(db: Session, tech_area: TechArea, 
                        exclude_answered_by_user: Optional[int] = None) -> Optional[Question]:
-    """Get a random question that user hasn't answered recently"""
-    query = db.query(Question).filter(Question.tech_area == tech_area)
-    
+    """
+    Get a random question for a tech area.
+    With a user id, the question is drawn from the user's rotation deck, so it
+    was not among the last questions sent to them (settings.question_no_repeat_window).
+    The deck advance is flushed but not committed: it is kept only if the caller
+    commits (e.g. with the send or the response), and dropped on rollback.
+    """
     if exclude_answered_by_user:
-        # Exclude questions answered by this user in last 30 days
-        # This is a simplified version - you might want more complex logic
-        answered_question_ids = db.query(UserResponse.question_id).filter(
-            and_(
-                UserResponse.user_id == exclude_answered_by_user,
-                UserResponse.created_at >= datetime.utcnow().replace(day=1)  # This month
-            )
-        ).subquery()
-        
-        query = query.filter(~Question.id.in_(answered_question_ids))
+        question_id = next_question_id(db, exclude_answered_by_user, tech_area)
+        db.flush()  # A second draw in the same transaction finds the deck
+    else:
+        question = question_catalog.random_question(db, tech_area)
+        question_id = question.id if question else None
     
-    return query.order_by(func.random()).first()
+    return db.get(Question, question_id) if question_id else None
 
 # Response CRUD operations
+@tagged
 def create_user_response(db: Session, user_id: int, question_id: int,
                         response_text: str, response_type: str = "text") -> UserResponse:
     """Create a new user response"""
@@ -100,21 +143,54 @@ def create_user_response(db: Session, user_id: int, question_id: int,
         response_type=response_type
     )
     db.add(db_response)
+    # The answered question is no longer open
+    db.execute(
+        update(User)
+        .where(and_(User.id == user_id, User.pending_question_id == question_id))
+        .values(pending_question_id=None)
+    )
+    record_answer(db, user_id, question_id)
     db.commit()
     db.refresh(db_response)
+    user_states.answered(user_id, question_id)
     return db_response
 
+@tagged
 def update_response_feedback(db: Session, response_id: int, 
                            ai_feedback: str, score: int):
     """Update response with AI feedback and score"""
     response = db.query(UserResponse).filter(UserResponse.id == response_id).first()
     if response:
+        record_scores(db, [{"response_id": response_id, "score": score}])
         response.ai_feedback = ai_feedback
+        response.feedback_retry_at = None  # Not a fallback any more
         response.score = score
         db.commit()
         return response
     return None
 
+@tagged
 def get_user_responses(db: Session, user_id: int) -> List[UserResponse]:
-    """Get all responses from a user"""
-    return db.query(UserResponse).filter(UserResponse.user_id == user_id).all()
\ No newline at end of file
+    """Get all responses from a user (unbounded; prefer get_user_responses_page)"""
+    return db.query(UserResponse).filter(UserResponse.user_id == user_id).all()
+
+@tagged
+def get_user_responses_page(db: Session, user_id: int, limit: int = 50,
+                            before_id: Optional[int] = None) -> List[UserResponse]:
+    """
+    Get a newest-first page of a user's responses.
+    Pass the id of the last response of a page as before_id to get the next one.
+    """
+    return list(db.execute(page_query(user_id, limit, before_id)).scalars().all())
+
+@tagged
+def get_user_progress(db: Session, user_id: int) -> Optional[UserProgress]:
+    """
+    Get a user's progress (totals, average score, per-area breakdown, streaks)
+    from the user_stats aggregates, or None before their first answer
+    """
+    stats_query, areas_query = progress_queries(user_id)
+    row = db.execute(stats_query).first()
+    if row is None:
+        return None
+    return build_progress(row[0], row[1], db.execute(areas_query).scalars().all())
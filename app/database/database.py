@@ -2,19 +2,203 @@
 Database configuration and session management.
 This sets up SQLAlchemy for our SQLite database.
 """
-from sqlalchemy import create_engine
+import asyncio
+import threading
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.util import await_only
 from app.core.config import settings
+from app.core.metrics import instrument_engine
+
+WRITER_TIMEOUT_SECONDS = 30  # Wait for the SQLite writer before giving up
+
+# The sync and async writer engines each pool one connection; this lock makes
+# them one writer, so their writes queue here instead of on SQLite's file lock
+_write_lock = threading.Lock()
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def _is_memory(url: str) -> bool:
+    return ":memory:" in url or url.rstrip("/") in ("sqlite:", "sqlite+pysqlite:")
+
+def async_database_url(url: str) -> str:
+    """Swap the driver of a database URL for its asyncio counterpart"""
+    parsed = make_url(url)
+    drivers = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+    if parsed.drivername in drivers:
+        parsed = parsed.set(drivername=drivers[parsed.drivername])
+    return parsed.render_as_string(hide_password=False)
+
+def apply_sqlite_pragmas(engine, query_only: bool = False):
+    """Apply the SQLite profile from settings to every new connection"""
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not _is_memory(str(engine.url)):
+            cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+        cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA cache_size={settings.sqlite_cache_size}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+        cursor.execute(f"PRAGMA temp_store={settings.sqlite_temp_store}")
+        if query_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+async def _acquire_write_lock() -> bool:
+    """Wait for the write lock on a worker thread, without blocking the event loop"""
+    waiting = asyncio.get_running_loop().run_in_executor(None, _write_lock.acquire, True, WRITER_TIMEOUT_SECONDS)
+    try:
+        return await asyncio.shield(waiting)
+    except asyncio.CancelledError:
+        # The thread may still get the lock after the caller gave up
+        waiting.add_done_callback(lambda done: done.exception() is None and done.result() and _write_lock.release())
+        raise
+
+def share_write_lock(engine, use_async: bool = False):
+    """Hold the process-wide write lock while a connection of this writer engine is checked out"""
+    @event.listens_for(engine, "checkout")
+    def acquire(dbapi_connection, connection_record, connection_proxy):
+        # Async checkouts run in SQLAlchemy's greenlet, which can await
+        acquired = (await_only(_acquire_write_lock()) if use_async
+                    else _write_lock.acquire(timeout=WRITER_TIMEOUT_SECONDS))
+        if not acquired:
+            raise exc.TimeoutError(f"SQLite writer busy for more than {WRITER_TIMEOUT_SECONDS}s")
+        connection_record.info["write_lock"] = True
+
+    @event.listens_for(engine, "checkin")
+    def release(dbapi_connection, connection_record):
+        if connection_record.info.pop("write_lock", False):
+            _write_lock.release()
+
+def create_db_engine(url: str, read_only: bool = False, use_async: bool = False):
+    """
+    Create an engine for the given URL (an AsyncEngine when use_async is set).
+    SQLite writers get a single pooled connection so concurrent writes queue
+    in the pool instead of failing with "database is locked"; readers get a
+    regular pool of query-only connections (WAL lets them run alongside).
+    Sync and async writers also share one lock, so together they are a
+    single writer.
+    """
+    create, queue_pool = create_engine, QueuePool
+    if use_async:
+        create, queue_pool = create_async_engine, AsyncAdaptedQueuePool
+        url = async_database_url(url)
+
+    if not _is_sqlite(url):
+        db_engine = create(url, pool_pre_ping=True)
+        instrument_engine(db_engine.sync_engine if use_async else db_engine)
+        return db_engine
+
+    connect_args = {
+        "check_same_thread": False,  # Only needed for SQLite
+        "timeout": settings.sqlite_busy_timeout_ms / 1000
+    }
+    if _is_memory(url):
+        # One shared connection, otherwise every connection is a new empty database
+        db_engine = create(url, connect_args=connect_args, poolclass=StaticPool)
+    elif read_only:
+        db_engine = create(
+            url,
+            connect_args=connect_args,
+            poolclass=queue_pool,
+            pool_size=settings.sqlite_read_pool_size,
+            max_overflow=0
+        )
+    else:
+        db_engine = create(
+            url,
+            connect_args=connect_args,
+            poolclass=queue_pool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=WRITER_TIMEOUT_SECONDS
+        )
+        share_write_lock(db_engine.sync_engine if use_async else db_engine, use_async)
+    apply_sqlite_pragmas(
+        db_engine.sync_engine if use_async else db_engine,
+        query_only=read_only and not _is_memory(url)
+    )
+    instrument_engine(db_engine.sync_engine if use_async else db_engine)
+    return db_engine
+
+# Create database engine (used for writes, DDL and migrations)
+engine = create_db_engine(settings.database_url)
 
-# Create database engine
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False}  # Only needed for SQLite
-)
+# Separate reader pool for file-backed SQLite
+read_engine = engine
+if (_is_sqlite(settings.database_url) and not _is_memory(settings.database_url)
+        and settings.sqlite_split_read_write):
+    read_engine = create_db_engine(settings.database_url, read_only=True)
+
+# Raw SQL starting with one of these only reads. Any other text() statement
+# may write, so it goes to the writer; a misrouted write would fail on the
+# query_only reader connections rather than slip past the write lock.
+_READ_ONLY_SQL = ("SELECT", "EXPLAIN")
+
+
+def _writes(clause) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        words = clause.text.lstrip().split(None, 1)
+        return not words or words[0].upper() not in _READ_ONLY_SQL
+    return False
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the reader pool and writes to the writer.
+    Raw SQL counts as a read only when it starts with SELECT or EXPLAIN.
+    Once a transaction has written, it stays on the writer until it ends so
+    it can read its own uncommitted changes.
+    """
+
+    def __init__(self, *args, writer=None, reader=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writer = writer if writer is not None else engine
+        self.reader = reader if reader is not None else read_engine
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.reader is self.writer:
+            return self.writer
+        if self._flushing or _writes(clause) or self.info.get("writing"):
+            self.info["writing"] = True
+            return self.writer
+        return self.reader
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_routing(session, transaction):
+    if transaction.parent is None:
+        session.info.pop("writing", None)
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+# Async engines and session factory for request handlers (same routing rules).
+# In-memory SQLite can't be shared between drivers, so it stays sync-only.
+async_engine = async_read_engine = None
+AsyncSessionLocal = None
+if not _is_memory(settings.database_url):
+    async_engine = create_db_engine(settings.database_url, use_async=True)
+    async_read_engine = async_engine
+    if read_engine is not engine:
+        async_read_engine = create_db_engine(settings.database_url, read_only=True, use_async=True)
+    AsyncSessionLocal = async_sessionmaker(
+        sync_session_class=RoutingSession,
+        writer=async_engine.sync_engine,
+        reader=async_read_engine.sync_engine,
+        autoflush=False,
+        expire_on_commit=False  # Attribute access after commit can't lazy-load in async code
+    )
 
 # Base class for our database models
 Base = declarative_base()
@@ -28,4 +212,21 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def require_async_engine():
+    """Fail with a clear message when there is no async engine (in-memory SQLite)"""
+    if AsyncSessionLocal is None:
+        raise RuntimeError(
+            f"DATABASE_URL {settings.database_url!r} is an in-memory SQLite database, which only the sync "
+            "engine can use; the API and its background services need a file, e.g. sqlite:///./interview_bot.db"
+        )
+
+async def get_async_db():
+    """
+    Dependency function to get an async database session.
+    Endpoints should use this instead of get_db so queries don't block the event loop.
+    """
+    require_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
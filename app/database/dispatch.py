@@ -0,0 +1,241 @@
+"""
+Bulk daily question dispatch.
+This assigns a question to every active user with set-based queries
+instead of one random-question query and one commit per user.
+Questions are drawn from each user's rotation deck (see rotation.py), and
+the messages are queued in the outbox by the same commit (see outbox.py).
+The scheduler uses dispatch_due_questions, which only reads users whose
+precomputed due time has passed (see schedule.py), one dispatch partition
+at a time when several workers share the work (see partitions.py).
+"""
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, insert, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import tagged
+from app.database.catalog import question_catalog
+from app.database.crud import iter_active_users
+from app.database.models import User, TechArea, Language, QuestionDeck, QuestionSend, OutboxMessage
+from app.database.outbox import question_rows
+from app.database.partitions import partition_key
+from app.database.rotation import draw, load_decks, new_deck
+from app.database.schedule import next_due_at
+from app.database.user_state import user_states
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class DispatchAssignment:
+    """A question picked for one user in a dispatch run"""
+    user_id: int
+    whatsapp_number: str
+    preferred_language: Language
+    tech_area: TechArea
+    question_id: int
+
+
+@dataclass
+class DispatchReport:
+    """Summary of a dispatch run with per-phase timings in seconds"""
+    users: int = 0
+    assigned: int = 0
+    skipped: int = 0
+    chunks: int = 0
+    fenced: bool = False  # The partition lease was lost; nothing was written
+    timings: Dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+
+def _load_question_pools(db: Session) -> Dict[TechArea, List[int]]:
+    """Question ids grouped by tech area, taken from the question catalog"""
+    snapshot = question_catalog.snapshot(db)
+    return {area: [q.id for q in questions] for area, questions in snapshot.by_area.items()}
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def _assign(db: Session, users: List[User], pools: Dict[TechArea, List[int]],
+            decks: Dict[tuple, QuestionDeck], report: DispatchReport) -> List[DispatchAssignment]:
+    """Draw the next question from each user's deck, creating missing decks"""
+    assignments = []
+    for user in users:
+        pool = pools.get(user.tech_area)
+        if not pool:
+            report.skipped += 1
+            continue
+        deck = decks.get((user.id, user.tech_area))
+        if deck is None:
+            deck = new_deck(user.id, user.tech_area, len(pool))
+            db.add(deck)
+        assignments.append(DispatchAssignment(
+            user_id=user.id,
+            whatsapp_number=user.whatsapp_number,
+            preferred_language=user.preferred_language,
+            tech_area=user.tech_area,
+            question_id=draw(deck, pool)
+        ))
+    return assignments
+
+
+@tagged
+def dispatch_daily_questions(
+    db: Session,
+    chunk_size: int = 1000,
+    on_batch: Optional[Callable[[List[DispatchAssignment]], None]] = None
+) -> DispatchReport:
+    """
+    Assign a daily question to every active user.
+    Users are streamed in chunks; each chunk costs one deck query, batched
+    deck writes and one batched UPDATE of last_question_sent and the open
+    question, committed together with the chunk's outbox messages.
+    on_batch receives the assignments of each chunk after it is committed.
+    """
+    report = DispatchReport()
+    timings = report.timings
+
+    started = time.perf_counter()
+    pools = _load_question_pools(db)
+    timings["load_questions"] += time.perf_counter() - started
+
+    users = iter_active_users(db, chunk_size=chunk_size)
+
+    while True:
+        started = time.perf_counter()
+        chunk = next(users, None)
+        timings["load_users"] += time.perf_counter() - started
+        if chunk is None:
+            break
+
+        report.chunks += 1
+        report.users += len(chunk)
+
+        started = time.perf_counter()
+        decks = load_decks(db, [user.id for user in chunk])
+        timings["load_decks"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        assignments = _assign(db, chunk, pools, decks, report)
+        timings["assign"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        if assignments:
+            db.flush()  # Deck changes go out as batched INSERT/UPDATE statements
+            sent_at = datetime.utcnow()
+            db.execute(update(User), [
+                {"id": a.user_id, "last_question_sent": sent_at, "pending_question_id": a.question_id}
+                for a in assignments
+            ])
+            db.execute(insert(QuestionSend), [
+                {"user_id": a.user_id, "question_id": a.question_id, "sent_at": sent_at} for a in assignments
+            ])
+            db.execute(insert(OutboxMessage), question_rows(db, assignments))
+            db.commit()
+            user_states.update_users({a.user_id: {"pending_question_id": a.question_id} for a in assignments})
+        timings["update"] += time.perf_counter() - started
+        report.assigned += len(assignments)
+
+        if on_batch and assignments:
+            started = time.perf_counter()
+            on_batch(assignments)
+            timings["deliver"] += time.perf_counter() - started
+
+    logger.info(
+        "Daily dispatch: %d users, %d assigned, %d skipped in %d chunks (%s)",
+        report.users, report.assigned, report.skipped, report.chunks,
+        ", ".join(f"{phase}={seconds:.3f}s" for phase, seconds in timings.items())
+    )
+    return report
+
+
+@tagged
+def dispatch_due_questions(
+    db: Session,
+    limit: int,
+    now: Optional[datetime] = None,
+    on_batch: Optional[Callable[[List[DispatchAssignment]], None]] = None,
+    partition: Optional[int] = None,
+    fence: Optional[Callable[[Session], bool]] = None
+) -> DispatchReport:
+    """
+    Assign a question to at most `limit` active users whose due time has passed,
+    oldest first, and move each of them to their next local send time.
+    Users over the limit stay due and are picked up by the next call.
+    With `partition`, only that dispatch partition is read. `fence` runs first
+    in the write transaction; when it returns False everything is rolled back
+    and report.fenced is set, so no question is assigned or delivered.
+    Users sent a question less than dispatch_min_interval_hours ago (e.g. after
+    moving to another timezone) are only rescheduled.
+    """
+    report = DispatchReport()
+    timings = report.timings
+    now = now or datetime.utcnow()
+
+    started = time.perf_counter()
+    pools = _load_question_pools(db)
+    timings["load_questions"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    query = db.query(User).filter(and_(User.is_active == True, User.next_question_due_at <= now))
+    if partition is not None:
+        query = query.filter(partition_key == partition)
+    users = query.order_by(User.next_question_due_at).limit(limit).all()
+    timings["load_users"] += time.perf_counter() - started
+    if not users:
+        return report
+    report.chunks = 1
+    report.users = len(users)
+
+    recent = now - timedelta(hours=settings.dispatch_min_interval_hours)
+    eligible = [user for user in users
+                if user.last_question_sent is None or _naive_utc(user.last_question_sent) <= recent]
+    report.skipped += len(users) - len(eligible)
+
+    started = time.perf_counter()
+    decks = load_decks(db, [user.id for user in eligible])
+    timings["load_decks"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    if fence is not None and not fence(db):
+        db.rollback()
+        logger.warning("Dispatch partition %s was taken over, leaving its users to the new holder", partition)
+        return DispatchReport(fenced=True, timings=timings)
+    timings["fence"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    assignments = _assign(db, eligible, pools, decks, report)
+    timings["assign"] += time.perf_counter() - started
+
+    started = time.perf_counter()
+    assigned = {a.user_id: a.question_id for a in assignments}
+    db.flush()
+    # Skipped users (no questions for their area) are rescheduled too, so they don't stay due
+    db.execute(update(User), [
+        {"id": user.id, "next_question_due_at": next_due_at(user.timezone, user.id, now),
+         **({"last_question_sent": now, "pending_question_id": assigned[user.id]}
+            if user.id in assigned else {})}
+        for user in users
+    ])
+    if assignments:
+        db.execute(insert(QuestionSend), [
+            {"user_id": a.user_id, "question_id": a.question_id, "sent_at": now} for a in assignments
+        ])
+        db.execute(insert(OutboxMessage), question_rows(db, assignments))
+    db.commit()
+    user_states.update_users({user_id: {"pending_question_id": question_id}
+                              for user_id, question_id in assigned.items()})
+    timings["update"] += time.perf_counter() - started
+    report.assigned = len(assignments)
+
+    if on_batch and assignments:
+        started = time.perf_counter()
+        on_batch(assignments)
+        timings["deliver"] += time.perf_counter() - started
+    return report
@@ -0,0 +1,82 @@
+"""
+Response history access.
+Pages are keyset-paginated on (created_at, id), newest first: the next page
+starts after the last id of the previous one, so deep pages cost the same as
+the first. Exports stream NDJSON from a server-side cursor in yield_per
+batches, so memory stays flat however many rows are exported.
+"""
+import json
+from typing import AsyncIterator, Callable, Optional
+
+from sqlalchemy import and_, or_, select
+
+from app.core.config import settings
+from app.core.metrics import tagged
+from app.database.models import UserResponse
+
+EXPORT_COLUMNS = (UserResponse.id, UserResponse.user_id, UserResponse.question_id,
+                  UserResponse.response_type, UserResponse.response_text,
+                  UserResponse.ai_feedback, UserResponse.score, UserResponse.created_at)
+
+
+def before(response_id: int):
+    """Responses that come after `response_id` in newest-first (created_at, id) order"""
+    # Compared against the stored value rather than a timestamp carried in the
+    # cursor, which would not round-trip exactly through every driver
+    created_at = select(UserResponse.created_at).where(UserResponse.id == response_id).scalar_subquery()
+    # The redundant <= bound lets the (user_id, created_at) index seek to the cursor
+    return and_(UserResponse.created_at <= created_at,
+                or_(UserResponse.created_at < created_at, UserResponse.id < response_id))
+
+
+def page_query(user_id: int, limit: int, before_id: Optional[int] = None):
+    """One newest-first page of a user's responses"""
+    query = select(UserResponse).where(UserResponse.user_id == user_id)
+    if before_id is not None:
+        query = query.where(before(before_id))
+    return query.order_by(UserResponse.created_at.desc(), UserResponse.id.desc()).limit(limit)
+
+
+def export_query(user_id: Optional[int] = None, after_id: Optional[int] = None):
+    """
+    Rows to export: one user's responses oldest first, or the whole table in
+    id order (the primary key, so no sort); after_id resumes an interrupted export.
+    """
+    query = select(*EXPORT_COLUMNS)
+    if user_id is not None:
+        query = query.where(UserResponse.user_id == user_id).order_by(UserResponse.created_at, UserResponse.id)
+    else:
+        query = query.order_by(UserResponse.id)
+    if after_id is not None:
+        query = query.where(UserResponse.id > after_id)
+    return query
+
+
+def to_record(row) -> dict:
+    """JSON-ready dict of an exported row or a UserResponse"""
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "question_id": row.question_id,
+        "response_type": row.response_type,
+        "response_text": row.response_text,
+        "ai_feedback": row.ai_feedback,
+        "score": row.score,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+@tagged
+async def stream_ndjson(session_factory: Callable, query,
+                        batch_size: int = settings.history_export_batch_size) -> AsyncIterator[bytes]:
+    """
+    NDJSON lines of a query, one chunk per batch. Opens its own session,
+    since a streaming response outlives the request's dependencies.
+    """
+    async with session_factory() as db:
+        result = await db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield "".join(
+                json.dumps(to_record(row), ensure_ascii=False, separators=(",", ":")) + "\n"
+                for row in rows
+            ).encode()
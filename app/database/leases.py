@@ -0,0 +1,104 @@
+"""
+Database leases for work shared between processes.
+A lease is a row in `leases` that one owner holds until expires_at. It is
+claimed and renewed with conditional UPDATEs, so two processes can never both
+hold it, and a crashed owner's lease is taken over once it expires. Every
+claim bumps the row's token: a holder that renews with its token inside the
+transaction doing the protected work (fencing) commits that work only if
+nobody took the lease over in the meantime.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.database.models import Lease
+
+logger = logging.getLogger(__name__)
+
+_leases = Lease.__table__
+NEVER = datetime(1970, 1, 1)
+
+
+def _prefixed(prefix: str):
+    """Names starting with prefix, as a primary-key range"""
+    return and_(_leases.c.name >= prefix, _leases.c.name < prefix[:-1] + chr(ord(prefix[-1]) + 1))
+
+
+def ensure(db: Session, names: Iterable[str]):
+    """Create missing lease rows, unowned and already expired"""
+    insert_ = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    rows = [{"name": name, "owner": None, "token": 0, "expires_at": NEVER} for name in names]
+    if rows:
+        db.execute(insert_(_leases).on_conflict_do_nothing(index_elements=["name"]), rows)
+
+
+def claim(db: Session, name: str, owner: str, seconds: float,
+          now: Optional[datetime] = None) -> Optional[int]:
+    """Take a free or expired lease; returns its new token, or None if someone else holds it"""
+    now = now or datetime.utcnow()
+    taken = db.execute(
+        update(_leases)
+        .where(and_(_leases.c.name == name, or_(_leases.c.owner.is_(None), _leases.c.expires_at <= now)))
+        .values(owner=owner, token=_leases.c.token + 1, expires_at=now + timedelta(seconds=seconds))
+    ).rowcount
+    if not taken:
+        return None
+    return db.execute(select(_leases.c.token).where(_leases.c.name == name)).scalar()
+
+
+def renew(db: Session, name: str, owner: str, token: int, seconds: float,
+          now: Optional[datetime] = None) -> bool:
+    """Extend a lease still held with `token`; False once it was released or taken over"""
+    now = now or datetime.utcnow()
+    return db.execute(
+        update(_leases)
+        .where(and_(_leases.c.name == name, _leases.c.owner == owner, _leases.c.token == token))
+        .values(expires_at=now + timedelta(seconds=seconds))
+    ).rowcount == 1
+
+
+def heartbeat(db: Session, name: str, owner: str, seconds: float, now: Optional[datetime] = None):
+    """Hold a lease only this owner ever claims (e.g. one named after it) without fencing"""
+    now = now or datetime.utcnow()
+    insert_ = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    expires_at = now + timedelta(seconds=seconds)
+    db.execute(insert_(_leases).values(name=name, owner=owner, token=1, expires_at=expires_at)
+               .on_conflict_do_update(index_elements=["name"],
+                                      set_={"owner": owner, "expires_at": expires_at}))
+
+
+def release(db: Session, names: Iterable[str], owner: str):
+    """Give up leases held by owner, so others can claim them right away"""
+    names = list(names)
+    if names:
+        db.execute(update(_leases).where(and_(_leases.c.name.in_(names), _leases.c.owner == owner))
+                   .values(owner=None, expires_at=NEVER))
+
+
+def live(db: Session, prefix: str, now: Optional[datetime] = None) -> Dict[str, str]:
+    """Unexpired leases whose name starts with prefix, by name -> owner"""
+    now = now or datetime.utcnow()
+    return dict(db.execute(select(_leases.c.name, _leases.c.owner).where(and_(
+        _prefixed(prefix), _leases.c.owner.is_not(None),
+        _leases.c.expires_at > now,
+    ))).all())
+
+
+def free(db: Session, prefix: str, limit: int, now: Optional[datetime] = None) -> list:
+    """Names of released or expired leases starting with prefix"""
+    now = now or datetime.utcnow()
+    return list(db.execute(select(_leases.c.name).where(and_(
+        _prefixed(prefix),
+        or_(_leases.c.owner.is_(None), _leases.c.expires_at <= now),
+    )).order_by(_leases.c.expires_at).limit(limit)).scalars())
+
+
+def purge(db: Session, prefix: str, before: datetime) -> int:
+    """Delete leases starting with prefix that expired before `before`"""
+    return db.execute(delete(_leases).where(and_(
+        _prefixed(prefix), _leases.c.expires_at < before,
+    ))).rowcount
@@ -0,0 +1,102 @@
+"""
+Delivery status of outbound messages.
+WhatsApp posts a "sent", "delivered" and "read" (or "failed") callback for
+every message, often out of order and sometimes more than once. Each message
+is one message_statuses row, upserted from a batch of callbacks: the status
+only moves forward ("read" is never overwritten by a late "delivered") and
+the first timestamp of each status is kept, so replaying a batch is harmless.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import and_, case, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.metrics import tagged
+from app.database.models import MessageStatus
+
+logger = logging.getLogger(__name__)
+
+# A later callback replaces the status only if it ranks higher; failed is final
+RANK = {"sent": 1, "delivered": 2, "read": 3, "failed": 4}
+TIMESTAMPS = ("sent_at", "delivered_at", "read_at", "failed_at")
+
+_statuses = MessageStatus.__table__
+
+
+def status_row(message_id: Optional[str], status: Optional[str], timestamp: Optional[str] = None,
+               recipient: Optional[str] = None, error: Optional[str] = None) -> Optional[dict]:
+    """message_statuses row of one callback, None if unusable"""
+    if not message_id or status not in RANK:
+        return None
+    try:
+        at = datetime.utcfromtimestamp(int(timestamp))
+    except (TypeError, ValueError):
+        at = datetime.utcnow()
+    row = {"message_id": message_id, "recipient": recipient, "status": status,
+           "error": error if status == "failed" else None, **dict.fromkeys(TIMESTAMPS)}
+    row[f"{status}_at"] = at
+    return row
+
+
+def merge(rows: Dict[str, dict], row: dict) -> bool:
+    """Fold a callback row into rows (by message id); True if the message was already there"""
+    current = rows.get(row["message_id"])
+    if current is None:
+        rows[row["message_id"]] = row
+        return False
+    if RANK[row["status"]] > RANK[current["status"]]:
+        current["status"] = row["status"]
+    for column in TIMESTAMPS:
+        if row[column] is not None and (current[column] is None or row[column] < current[column]):
+            current[column] = row[column]
+    current["recipient"] = current["recipient"] or row["recipient"]
+    current["error"] = current["error"] or row["error"]
+    return True
+
+
+def _rank(column):
+    return case(RANK, value=column, else_=0)
+
+
+@tagged
+async def upsert(db: AsyncSession, rows: Iterable[dict], now: Optional[datetime] = None) -> int:
+    """Write coalesced rows with one executemany upsert; returns the number of rows"""
+    now = now or datetime.utcnow()
+    rows = [{**row, "created_at": now, "updated_at": now} for row in rows]
+    if not rows:
+        return 0
+    insert_ = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    stmt = insert_(_statuses)
+    new = stmt.excluded
+    await db.execute(stmt.on_conflict_do_update(index_elements=["message_id"], set_={
+        "status": case((_rank(new.status) > _rank(_statuses.c.status), new.status),
+                       else_=_statuses.c.status),
+        **{column: func.coalesce(_statuses.c[column], new[column]) for column in TIMESTAMPS},
+        "recipient": func.coalesce(_statuses.c.recipient, new.recipient),
+        "error": func.coalesce(_statuses.c.error, new.error),
+        "updated_at": new.updated_at,
+    }), rows)
+    await db.commit()
+    return len(rows)
+
+
+@tagged
+async def purge(db: AsyncSession, before: datetime, limit: int = 10000) -> int:
+    """Delete up to `limit` rows first seen before `before`"""
+    old = select(_statuses.c.message_id).where(_statuses.c.created_at < before).limit(limit)
+    deleted = (await db.execute(delete(_statuses).where(_statuses.c.message_id.in_(old)))).rowcount
+    await db.commit()
+    return deleted
+
+
+def delivery_query(start: datetime, end: datetime):
+    """Tracked, delivered, read and undelivered messages first seen in [start, end)"""
+    return select(
+        func.count(),
+        func.count(case((_statuses.c.status.in_(("delivered", "read")), 1))),
+        func.count(_statuses.c.read_at),
+        func.count(case((_statuses.c.status == "failed", 1))),
+    ).where(and_(_statuses.c.created_at >= start, _statuses.c.created_at < end))
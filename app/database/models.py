@@ -2,12 +2,16 @@
 Database models for the Interview Bot.
 These define the structure of our database tables.
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, Text, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.database.database import Base
 import enum
 
+# Users are split into this many dispatch partitions by users.id % DISPATCH_PARTITIONS.
+# It is part of an index expression, so changing it needs a migration.
+DISPATCH_PARTITIONS = 64
+
 class TechArea(enum.Enum):
     """Technical areas for questions"""
     JAVASCRIPT = "javascript"
@@ -33,9 +37,26 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_question_sent = Column(DateTime(timezone=True), nullable=True)
+    timezone = Column(String, nullable=False, default="UTC", server_default="UTC")  # IANA name
+    next_question_due_at = Column(DateTime(timezone=True), nullable=True)  # UTC, see schedule.py
+    pending_question_id = Column(Integer, ForeignKey("questions.id"), nullable=True)  # Sent, not answered yet
     
     # Relationships
     responses = relationship("UserResponse", back_populates="user")
+    
+    __table_args__ = (
+        # Active users only, for dispatch and per-area lookups
+        Index("ix_users_active_tech_area", "tech_area", "id",
+              sqlite_where=is_active == True, postgresql_where=is_active == True),
+        Index("ix_users_active_id", "id",
+              sqlite_where=is_active == True, postgresql_where=is_active == True),
+        # Due-time index read by every scheduler tick
+        Index("ix_users_active_due", "next_question_due_at",
+              sqlite_where=is_active == True, postgresql_where=is_active == True),
+        # Due-time index per dispatch partition, for schedulers running in several workers
+        Index("ix_users_active_partition_due", text(f"(id % {DISPATCH_PARTITIONS})"), "next_question_due_at",
+              sqlite_where=is_active == True, postgresql_where=is_active == True),
+    )
 
 class Question(Base):
     """Question model - stores technical interview questions"""
@@ -52,6 +73,10 @@ class Question(Base):
     
     # Relationships
     responses = relationship("UserResponse", back_populates="question")
+    
+    __table_args__ = (
+        Index("ix_questions_tech_area_difficulty", "tech_area", "difficulty"),
+    )
 
 class UserResponse(Base):
     """User response model - stores user answers and AI feedback"""
@@ -64,8 +89,181 @@ class UserResponse(Base):
     response_type = Column(String, nullable=False)  # "text" or "audio"
     ai_feedback = Column(Text, nullable=True)
     score = Column(Integer, nullable=True)  # 1-10 score from AI
+    feedback_retry_at = Column(DateTime, nullable=True)  # Fallback feedback: regrade after this
+    feedback_regrades = Column(Integer, nullable=False, server_default="0")  # Regrade passes so far
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationships
     user = relationship("User", back_populates="responses")
-    question = relationship("Question", back_populates="responses")
\ No newline at end of file
+    question = relationship("Question", back_populates="responses")
+    
+    __table_args__ = (
+        Index("ix_user_responses_user_id_created_at", "user_id", "created_at"),
+        Index("ix_user_responses_question_id", "question_id"),
+        # Day ranges read by the analytics rollup
+        Index("ix_user_responses_created_at", "created_at"),
+        # Responses still waiting for AI feedback, oldest first
+        Index("ix_user_responses_pending_feedback", "created_at",
+              sqlite_where=ai_feedback.is_(None), postgresql_where=ai_feedback.is_(None)),
+        # Fallback feedback waiting to be regraded
+        Index("ix_user_responses_feedback_retry", "feedback_retry_at",
+              sqlite_where=feedback_retry_at.is_not(None), postgresql_where=feedback_retry_at.is_not(None)),
+    )
+
+class UserStats(Base):
+    """Per-user progress aggregates, kept up to date with every response (see stats.py)"""
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    responses = Column(Integer, nullable=False, default=0)
+    scored = Column(Integer, nullable=False, default=0)  # Responses that have a score
+    score_sum = Column(Integer, nullable=False, default=0)
+    current_streak = Column(Integer, nullable=False, default=0)  # Consecutive local days with an answer
+    best_streak = Column(Integer, nullable=False, default=0)
+    last_answered_day = Column(Date, nullable=True)  # In the user's timezone
+    last_answered_at = Column(DateTime(timezone=True), nullable=True)
+
+class UserAreaStats(Base):
+    """Per-user, per-tech-area response counts and score totals"""
+    __tablename__ = "user_area_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tech_area = Column(Enum(TechArea), primary_key=True)
+    responses = Column(Integer, nullable=False, default=0)
+    scored = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+
+class QuestionSend(Base):
+    """Question send log - one row per question dispatched to a user (append-only)"""
+    __tablename__ = "question_sends"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    sent_at = Column(DateTime, nullable=False, index=True)  # UTC
+
+class DailyStats(Base):
+    """Daily analytics rollup (UTC days), computed by rollup.py"""
+    __tablename__ = "daily_stats"
+    
+    day = Column(Date, primary_key=True)
+    sends = Column(Integer, nullable=False, default=0)
+    recipients = Column(Integer, nullable=False, default=0)  # Distinct users sent a question
+    responders = Column(Integer, nullable=False, default=0)  # Recipients who answered by the next day
+    answers = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)  # Distinct users who answered (DAU)
+    scored = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+    # Delivery status callbacks of the messages first seen that day (message_statuses)
+    tracked = Column(Integer, nullable=False, default=0, server_default="0")
+    delivered = Column(Integer, nullable=False, default=0, server_default="0")
+    read = Column(Integer, nullable=False, default=0, server_default="0")
+    undelivered = Column(Integer, nullable=False, default=0, server_default="0")
+    computed_at = Column(DateTime, nullable=False)
+
+class DailyBreakdown(Base):
+    """Daily rollup per tech area or language (dimension = "tech_area" or "language")"""
+    __tablename__ = "daily_breakdowns"
+    
+    day = Column(Date, primary_key=True)
+    dimension = Column(String, primary_key=True)
+    value = Column(String, primary_key=True)
+    sends = Column(Integer, nullable=False, default=0)
+    recipients = Column(Integer, nullable=False, default=0)
+    responders = Column(Integer, nullable=False, default=0)
+    answers = Column(Integer, nullable=False, default=0)
+    active_users = Column(Integer, nullable=False, default=0)
+    scored = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Integer, nullable=False, default=0)
+
+class RollupWatermark(Base):
+    """How far each rollup job has processed the raw tables"""
+    __tablename__ = "rollup_watermarks"
+    
+    name = Column(String, primary_key=True)
+    watermark = Column(DateTime, nullable=False)  # UTC; data before it has been rolled up
+    updated_at = Column(DateTime, nullable=False)
+
+class OutboxMessage(Base):
+    """Outbox model - outbound WhatsApp messages, written with the change that causes them (see outbox.py)"""
+    __tablename__ = "outbox"
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    recipient = Column(String, nullable=False)  # WhatsApp number
+    kind = Column(String, nullable=False)  # e.g. "question"
+    payload = Column(Text, nullable=False)  # Rendered Cloud API message payload (JSON)
+    status = Column(String, nullable=False, default="pending")  # "pending", "sent" or "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, nullable=False)  # UTC; next attempt, pushed forward while claimed
+    created_at = Column(DateTime, nullable=False, index=True)
+    sent_at = Column(DateTime, nullable=True)
+    message_id = Column(String, nullable=True)  # WhatsApp message id once accepted
+    last_error = Column(Text, nullable=True)
+    
+    __table_args__ = (
+        # Claim order of the drain loop
+        Index("ix_outbox_pending", "available_at",
+              sqlite_where=text("status = 'pending'"), postgresql_where=text("status = 'pending'")),
+    )
+
+class MessageStatus(Base):
+    """Message status model - latest delivery status of an outbound WhatsApp message (see message_status.py)"""
+    __tablename__ = "message_statuses"
+    
+    message_id = Column(String, primary_key=True)  # WhatsApp message id (wamid)
+    recipient = Column(String, nullable=True)  # recipient_id from the callback
+    status = Column(String, nullable=False)  # Furthest of "sent", "delivered", "read"; or "failed"
+    sent_at = Column(DateTime, nullable=True)  # UTC, callback timestamps
+    delivered_at = Column(DateTime, nullable=True)
+    read_at = Column(DateTime, nullable=True)
+    failed_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)  # First error of a failed message, e.g. "131026: Message undeliverable"
+    created_at = Column(DateTime, nullable=False, index=True)  # UTC, first flush; rollup day of the message
+    updated_at = Column(DateTime, nullable=False)
+
+class Lease(Base):
+    """Lease model - a named piece of work held by one process until expires_at (see leases.py)"""
+    __tablename__ = "leases"
+    
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=True)  # None when released
+    token = Column(Integer, nullable=False, default=0)  # Bumped by every claim, for fencing
+    expires_at = Column(DateTime, nullable=False)  # UTC
+
+class ProcessedMessage(Base):
+    """Processed message model - WhatsApp message IDs already handled (webhook dedup)"""
+    __tablename__ = "processed_messages"
+    
+    message_id = Column(String, primary_key=True)
+    received_at = Column(DateTime, nullable=False, index=True)
+
+
+class QuestionDeck(Base):
+    """Question deck model - per-user rotation through the questions of a tech area"""
+    __tablename__ = "question_decks"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tech_area = Column(Enum(TechArea), primary_key=True)
+    # The deck is the permutation i -> (multiplier * i + offset) % deck_size
+    # over the area's question ids, so only a few integers are stored
+    deck_size = Column(Integer, nullable=False)
+    multiplier = Column(Integer, nullable=False)
+    offset = Column(Integer, nullable=False)
+    cursor = Column(Integer, nullable=False, default=0)
+    recent_question_ids = Column(Text, nullable=False, default="")  # Comma-separated, oldest first
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class FeedbackCacheEntry(Base):
+    """Feedback cache model - AI feedback keyed by question, language and normalized answer"""
+    __tablename__ = "feedback_cache"
+    
+    cache_key = Column(String(64), primary_key=True)  # sha256 hex
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    language = Column(Enum(Language), nullable=False)
+    ai_feedback = Column(Text, nullable=False)
+    score = Column(Integer, nullable=True)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, index=True)
+    last_hit_at = Column(DateTime, nullable=False, index=True)
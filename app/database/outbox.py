@@ -0,0 +1,148 @@
+"""
+Transactional outbox for outbound WhatsApp messages.
+Code that decides to send a message inserts an outbox row in the same
+transaction as the state change (last_question_sent, question_sends, the
+open question), with the payload already rendered in the user's language.
+The drain loop (services/outbox_drainer.py) claims pending rows in batches by
+pushing their available_at forward, sends them and records the outcome with
+bulk UPDATEs. A crash before the commit loses nothing and sends nothing; a
+crash after a send but before its row is marked sends it again once the claim
+expires, so delivery is at least once.
+"""
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, bindparam, delete, func, insert, literal_column, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.metrics import tagged
+from app.database.catalog import question_catalog
+from app.database.models import User, Question, OutboxMessage, Language
+
+logger = logging.getLogger(__name__)
+
+PENDING, SENT, FAILED = "pending", "sent", "failed"
+
+QUESTION_INTRO = {
+    Language.ENGLISH: "Today's interview question:",
+    Language.SPANISH: "Pregunta de entrevista de hoy:",
+    Language.PORTUGUESE: "Pergunta de entrevista de hoje:",
+}
+
+_outbox = OutboxMessage.__table__
+# A literal, so SQLite can match the partial index ix_outbox_pending
+_pending = _outbox.c.status == literal_column(f"'{PENDING}'")
+
+
+def text_payload(body: str) -> str:
+    """Cloud API payload of a plain text message, as stored in outbox.payload"""
+    return json.dumps({"type": "text", "text": {"body": body}}, ensure_ascii=False)
+
+
+def question_message(language: Language, text: str) -> str:
+    return f"{QUESTION_INTRO[language]}\n\n{text}"
+
+
+def localized_text(language: Language, text_en: str, text_es: Optional[str], text_pt: Optional[str]) -> str:
+    """Question text in a language, falling back to English"""
+    if language == Language.SPANISH and text_es:
+        return text_es
+    if language == Language.PORTUGUESE and text_pt:
+        return text_pt
+    return text_en
+
+
+def _question_row(user_id: int, recipient: str, language: Language, text: str, now: datetime) -> dict:
+    return {"user_id": user_id, "recipient": recipient, "kind": "question",
+            "payload": text_payload(question_message(language, text)),
+            "status": PENDING, "attempts": 0, "available_at": now, "created_at": now}
+
+
+def question_rows(db: Session, assignments: Iterable) -> List[dict]:
+    """Outbox rows for dispatch assignments, rendered from the question catalog"""
+    # Outbox times are wall-clock even when dispatch runs at another `now` (backfills, benchmarks)
+    now = datetime.utcnow()
+    return [_question_row(a.user_id, a.whatsapp_number, a.preferred_language,
+                          question_catalog.text(db, a.question_id, a.preferred_language), now)
+            for a in assignments]
+
+
+def _texts_query(question_id: int):
+    return select(Question.question_text_en, Question.question_text_es,
+                  Question.question_text_pt).where(Question.id == question_id)
+
+
+def enqueue_question(db: Session, user: User, question_id: int):
+    """Queue a question message for one user; the caller commits it with the send"""
+    texts = db.execute(_texts_query(question_id)).one()
+    db.execute(insert(OutboxMessage), [_question_row(
+        user.id, user.whatsapp_number, user.preferred_language,
+        localized_text(user.preferred_language, *texts), datetime.utcnow())])
+
+
+async def aenqueue_question(db: AsyncSession, user: User, question_id: int):
+    """Async version of enqueue_question()"""
+    texts = (await db.execute(_texts_query(question_id))).one()
+    await db.execute(insert(OutboxMessage), [_question_row(
+        user.id, user.whatsapp_number, user.preferred_language,
+        localized_text(user.preferred_language, *texts), datetime.utcnow())])
+
+
+@tagged
+async def claim(db: AsyncSession, limit: int, claim_seconds: float,
+                now: Optional[datetime] = None) -> list:
+    """
+    Claim up to `limit` due rows, oldest first, for claim_seconds: their
+    available_at moves past the claim so no other drainer takes them, and
+    their attempts count goes up. Returns (id, recipient, payload, attempts) rows.
+    """
+    now = now or datetime.utcnow()
+    due = (select(_outbox.c.id).where(and_(_pending, _outbox.c.available_at <= now))
+           .order_by(_outbox.c.available_at).limit(limit).with_for_update(skip_locked=True))
+    # The repeated conditions make a row that another drainer claimed first drop out
+    rows = (await db.execute(
+        update(_outbox)
+        .where(and_(_outbox.c.id.in_(due), _pending, _outbox.c.available_at <= now))
+        .values(available_at=now + timedelta(seconds=claim_seconds), attempts=_outbox.c.attempts + 1)
+        .returning(_outbox.c.id, _outbox.c.recipient, _outbox.c.payload, _outbox.c.attempts)
+    )).all()
+    await db.commit()
+    return rows
+
+
+_COMPLETE = (
+    update(_outbox).where(_outbox.c.id == bindparam("row_id")).values(
+        status=bindparam("new_status"), attempts=bindparam("new_attempts"),
+        available_at=bindparam("next_at"), sent_at=bindparam("delivered_at"),
+        message_id=bindparam("whatsapp_id"), last_error=bindparam("error"),
+    )
+)
+
+
+@tagged
+async def complete(db: AsyncSession, outcomes: List[dict]):
+    """
+    Record the outcome of sent rows with one executemany UPDATE. Each outcome
+    has row_id, new_status, new_attempts, next_at, delivered_at, whatsapp_id and error.
+    """
+    if outcomes:
+        await db.execute(_COMPLETE, outcomes)
+        await db.commit()
+
+
+@tagged
+async def pending_count(db: AsyncSession) -> int:
+    return (await db.execute(select(func.count()).select_from(_outbox).where(_pending))).scalar()
+
+
+@tagged
+async def purge(db: AsyncSession, before: datetime, limit: int = 10000) -> int:
+    """Delete up to `limit` sent or failed rows created before `before`"""
+    old = (select(_outbox.c.id).where(and_(_outbox.c.created_at < before, _outbox.c.status != PENDING))
+           .limit(limit))
+    deleted = (await db.execute(delete(_outbox).where(_outbox.c.id.in_(old)))).rowcount
+    await db.commit()
+    return deleted
@@ -0,0 +1,104 @@
+"""
+Dispatch partitions shared between workers.
+Active users are split into DISPATCH_PARTITIONS partitions by users.id, and
+every partition is a lease (see leases.py). Each scheduler process keeps a
+worker lease alive as a heartbeat and, every tick, holds about
+partitions / live workers of the partition leases: it releases the extra ones
+when workers join and claims free or expired ones when workers leave or die.
+Only the holder of a partition dispatches its users, and it commits each
+dispatch together with a renewal of its lease token, so a process that lost
+its lease mid-tick (after a long pause) writes and sends nothing.
+"""
+import logging
+import math
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import literal_column
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database import leases
+from app.database.models import User, DISPATCH_PARTITIONS
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = "dispatch:partition:"
+WORKER_PREFIX = "dispatch:worker:"
+
+# Same expression as ix_users_active_partition_due; the modulus must be a literal for the index to match
+partition_key = User.id % literal_column(str(DISPATCH_PARTITIONS))
+
+
+def default_owner() -> str:
+    """Identity of this process in the leases table"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class PartitionLeases:
+    """The dispatch partitions held by one process"""
+
+    def __init__(self, owner: Optional[str] = None,
+                 lease_seconds: float = settings.dispatch_lease_seconds,
+                 partitions: int = DISPATCH_PARTITIONS):
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self.partitions = partitions
+        self.held: Dict[int, int] = {}  # partition -> lease token
+        self.workers = 0
+        self._ensured = False
+
+    def rebalance(self, db: Session, now: Optional[datetime] = None) -> List[int]:
+        """Heartbeat, renew held partitions and move towards a fair share; returns the held partitions"""
+        now = now or datetime.utcnow()
+        if not self._ensured:
+            leases.ensure(db, (f"{PARTITION_PREFIX}{p}" for p in range(self.partitions)))
+            self._ensured = True
+        leases.heartbeat(db, f"{WORKER_PREFIX}{self.owner}", self.owner, self.lease_seconds, now)
+
+        lost = [partition for partition, token in self.held.items()
+                if not leases.renew(db, f"{PARTITION_PREFIX}{partition}", self.owner, token,
+                                    self.lease_seconds, now)]
+        if lost:
+            logger.warning("Lost %d dispatch partition(s) to other workers: %s", len(lost), lost)
+            for partition in lost:
+                del self.held[partition]
+
+        self.workers = max(1, len(leases.live(db, WORKER_PREFIX, now)))
+        target = math.ceil(self.partitions / self.workers)
+        if len(self.held) > target:
+            extra = sorted(self.held)[target:]
+            leases.release(db, (f"{PARTITION_PREFIX}{p}" for p in extra), self.owner)
+            for partition in extra:
+                del self.held[partition]
+        elif len(self.held) < target:
+            for name in leases.free(db, PARTITION_PREFIX, target - len(self.held), now):
+                token = leases.claim(db, name, self.owner, self.lease_seconds, now)
+                if token is not None:
+                    self.held[int(name[len(PARTITION_PREFIX):])] = token
+
+        # Worker leases of processes gone for a day are only noise
+        leases.purge(db, WORKER_PREFIX, now - timedelta(days=1))
+        db.commit()
+        return sorted(self.held)
+
+    def fence(self, partition: int) -> Callable[[Session], bool]:
+        """Check for dispatch_due_questions: renews the partition lease inside its transaction"""
+        def check(db: Session) -> bool:
+            token = self.held.get(partition)
+            if token is not None and leases.renew(db, f"{PARTITION_PREFIX}{partition}", self.owner,
+                                                  token, self.lease_seconds):
+                return True
+            self.held.pop(partition, None)
+            return False
+        return check
+
+    def release_all(self, db: Session):
+        """Hand every held partition back (on shutdown)"""
+        leases.release(db, [f"{PARTITION_PREFIX}{p}" for p in self.held]
+                       + [f"{WORKER_PREFIX}{self.owner}"], self.owner)
+        db.commit()
+        self.held.clear()
@@ -0,0 +1,199 @@
+"""
+Daily analytics rollups.
+roll_up() recomputes whole UTC days into daily_stats and daily_breakdowns,
+from the day of the last watermark (minus rollup_late_data_minutes, so
+scores written after the previous run are picked up, and at least from the
+day before, whose sends can still be answered) through today. Each
+day is read with range queries on indexed timestamps, so a run costs the
+data since the watermark rather than the size of the raw tables. Reports
+read only the rollup tables. Delivery counters count the messages whose
+first status callback arrived that day, so receipts arriving more than a
+day later only show up after a backfill (rollup_stats.py --since).
+"""
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, delete, distinct, exists, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import tagged
+from app.database.message_status import delivery_query
+from app.database.models import (User, Question, UserResponse, QuestionSend, DailyStats,
+                                 DailyBreakdown, RollupWatermark)
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "daily_stats"
+DIMENSIONS = ("tech_area", "language")
+COUNTERS = ("sends", "recipients", "responders", "answers", "active_users", "scored", "score_sum")
+DELIVERY = ("tracked", "delivered", "read", "undelivered")  # daily_stats only
+
+
+def _bounds(day: date) -> Tuple[datetime, datetime]:
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def _sends_query(day: date, dimension: Optional[str] = None):
+    start, end = _bounds(day)
+    # A recipient responded if they answered after the send, by the end of the next day
+    answered = exists().where(and_(
+        UserResponse.user_id == QuestionSend.user_id,
+        UserResponse.created_at >= QuestionSend.sent_at,
+        UserResponse.created_at < end + timedelta(days=1),
+    ))
+    columns = [func.count(QuestionSend.id), func.count(distinct(QuestionSend.user_id)),
+               func.count(distinct(case((answered, QuestionSend.user_id))))]
+    query = select(*columns).where(and_(QuestionSend.sent_at >= start, QuestionSend.sent_at < end))
+    if dimension == "tech_area":
+        query = query.add_columns(Question.tech_area).join(
+            Question, Question.id == QuestionSend.question_id).group_by(Question.tech_area)
+    elif dimension == "language":
+        query = query.add_columns(User.preferred_language).join(
+            User, User.id == QuestionSend.user_id).group_by(User.preferred_language)
+    return query
+
+
+def _answers_query(day: date, dimension: Optional[str] = None):
+    start, end = _bounds(day)
+    columns = [func.count(UserResponse.id), func.count(distinct(UserResponse.user_id)),
+               func.count(UserResponse.score), func.coalesce(func.sum(UserResponse.score), 0)]
+    query = select(*columns).where(and_(UserResponse.created_at >= start, UserResponse.created_at < end))
+    if dimension == "tech_area":
+        query = query.add_columns(Question.tech_area).join(
+            Question, Question.id == UserResponse.question_id).group_by(Question.tech_area)
+    elif dimension == "language":
+        query = query.add_columns(User.preferred_language).join(
+            User, User.id == UserResponse.user_id).group_by(User.preferred_language)
+    return query
+
+
+def _empty() -> dict:
+    return dict.fromkeys(COUNTERS, 0)
+
+
+def aggregate_day(db: Session, day: date) -> Tuple[dict, List[dict]]:
+    """daily_stats row and daily_breakdowns rows of one UTC day, from the raw tables"""
+    totals = _empty()
+    totals["sends"], totals["recipients"], totals["responders"] = db.execute(_sends_query(day)).one()
+    totals["answers"], totals["active_users"], totals["scored"], totals["score_sum"] = \
+        db.execute(_answers_query(day)).one()
+    totals.update(zip(DELIVERY, db.execute(delivery_query(*_bounds(day))).one()))
+
+    breakdowns: Dict[Tuple[str, str], dict] = {}
+    for dimension in DIMENSIONS:
+        for sends, recipients, responders, value in db.execute(_sends_query(day, dimension)):
+            row = breakdowns.setdefault((dimension, value.value), _empty())
+            row["sends"], row["recipients"], row["responders"] = sends, recipients, responders
+        for answers, active_users, scored, score_sum, value in db.execute(_answers_query(day, dimension)):
+            row = breakdowns.setdefault((dimension, value.value), _empty())
+            row["answers"], row["active_users"], row["scored"], row["score_sum"] = \
+                answers, active_users, scored, score_sum
+    return (
+        {"day": day, **totals},
+        [{"day": day, "dimension": dimension, "value": value, **counters}
+         for (dimension, value), counters in breakdowns.items()],
+    )
+
+
+def get_watermark(db: Session, name: str = WATERMARK) -> Optional[datetime]:
+    return db.execute(select(RollupWatermark.watermark).where(RollupWatermark.name == name)).scalar()
+
+
+def _first_day(db: Session) -> Optional[date]:
+    """Day of the oldest raw row (both minimums are index lookups)"""
+    oldest = [value for value in (
+        db.execute(select(func.min(QuestionSend.sent_at))).scalar(),
+        db.execute(select(func.min(UserResponse.created_at))).scalar(),
+    ) if value is not None]
+    return min(oldest).date() if oldest else None
+
+
+@tagged
+def roll_up(db: Session, now: Optional[datetime] = None, since: Optional[date] = None) -> dict:
+    """
+    Recompute the days from the watermark (or `since`) through today.
+    Each day is aggregated before its rows are replaced, so the write
+    transaction is short; the watermark moves only after every day is
+    written, and a failed run is simply repeated by the next one.
+    """
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    if since is None:
+        watermark = get_watermark(db)
+        if watermark is not None:
+            since = min((watermark - timedelta(minutes=settings.rollup_late_data_minutes)).date(),
+                        watermark.date() - timedelta(days=1))
+        else:
+            since = _first_day(db) or now.date()
+
+    day, days = since, 0
+    while day <= now.date():
+        stats, breakdowns = aggregate_day(db, day)
+        db.execute(delete(DailyBreakdown).where(DailyBreakdown.day == day))
+        db.execute(delete(DailyStats).where(DailyStats.day == day))
+        db.execute(insert(DailyStats), [{**stats, "computed_at": now}])
+        if breakdowns:
+            db.execute(insert(DailyBreakdown), breakdowns)
+        db.commit()
+        day += timedelta(days=1)
+        days += 1
+
+    mark = db.get(RollupWatermark, WATERMARK)
+    if mark is None:
+        db.add(RollupWatermark(name=WATERMARK, watermark=now, updated_at=datetime.utcnow()))
+    else:
+        mark.watermark, mark.updated_at = now, datetime.utcnow()
+    db.commit()
+
+    seconds = time.perf_counter() - started
+    logger.info("Rolled up %d day(s) from %s in %.2fs", days, since, seconds)
+    return {"from": since.isoformat(), "days": days, "watermark": now.isoformat(), "seconds": round(seconds, 3)}
+
+
+def _rates(row) -> dict:
+    counters = {name: getattr(row, name) for name in COUNTERS}
+    return {
+        **counters,
+        "response_rate": round(row.responders / row.recipients, 4) if row.recipients else None,
+        "average_score": round(row.score_sum / row.scored, 2) if row.scored else None,
+    }
+
+
+def _delivery_rates(row) -> dict:
+    return {
+        **{name: getattr(row, name) for name in DELIVERY},
+        "delivery_rate": round(row.delivered / row.tracked, 4) if row.tracked else None,
+        "read_rate": round(row.read / row.tracked, 4) if row.tracked else None,
+    }
+
+
+@tagged
+def daily_report(db: Session, days: int = 14, end: Optional[date] = None) -> dict:
+    """
+    The last `days` rolled-up days up to `end`, newest first.
+    response_rate is the share of users sent a question that day who answered
+    by the end of the next day; active_users (DAU) counts everyone who answered.
+    delivery_rate and read_rate are shares of the messages with status callbacks.
+    """
+    end = end or datetime.utcnow().date()
+    start = end - timedelta(days=days - 1)
+    breakdowns: Dict[date, dict] = {}
+    for row in db.execute(select(DailyBreakdown).where(
+            and_(DailyBreakdown.day >= start, DailyBreakdown.day <= end))).scalars():
+        breakdowns.setdefault(row.day, {name: {} for name in DIMENSIONS})[row.dimension][row.value] = _rates(row)
+
+    rows = db.execute(select(DailyStats).where(and_(DailyStats.day >= start, DailyStats.day <= end))
+                      .order_by(DailyStats.day.desc())).scalars()
+    watermark = get_watermark(db)
+    return {
+        "watermark": watermark.isoformat() if watermark else None,
+        "days": [
+            {"day": row.day.isoformat(), **_rates(row), **_delivery_rates(row),
+             **{f"by_{name}": breakdowns.get(row.day, {}).get(name, {}) for name in DIMENSIONS}}
+            for row in rows
+        ],
+    }
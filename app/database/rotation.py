@@ -0,0 +1,93 @@
+"""
+Per-user question rotation.
+Each user walks a shuffled deck of their tech area's questions, so the next
+unseen question is found in O(1) instead of sorting the area by random()
+and filtering out answered questions with NOT IN.
+"""
+import math
+import random
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.catalog import question_catalog
+from app.database.models import QuestionDeck, TechArea
+
+
+def _shuffle(deck: QuestionDeck, size: int):
+    """Start a new permutation of `size` questions"""
+    multiplier = 1
+    if size > 2:
+        multiplier = random.randrange(1, size)
+        while math.gcd(multiplier, size) != 1:
+            multiplier = random.randrange(1, size)
+    deck.deck_size = size
+    deck.multiplier = multiplier
+    deck.offset = random.randrange(size) if size else 0
+    deck.cursor = 0
+
+
+def new_deck(user_id: int, tech_area: TechArea, size: int) -> QuestionDeck:
+    """Create an unsaved deck for a user and tech area"""
+    deck = QuestionDeck(user_id=user_id, tech_area=tech_area, recent_question_ids="")
+    _shuffle(deck, size)
+    return deck
+
+
+def draw(deck: QuestionDeck, pool: Sequence[int],
+         window: Optional[int] = None) -> Optional[int]:
+    """
+    Advance the deck and return the next question id from `pool`.
+    `pool` is the area's question ids in a stable order. Questions among the
+    last `window` sent are skipped, and an exhausted deck is reshuffled.
+    """
+    size = len(pool)
+    if not size:
+        return None
+    if deck.deck_size != size:
+        # Questions were added or removed: start a new permutation
+        _shuffle(deck, size)
+
+    window = settings.question_no_repeat_window if window is None else window
+    window = min(window, size - 1)
+    recent = [int(i) for i in deck.recent_question_ids.split(",") if i] if deck.recent_question_ids else []
+    recent = recent[-window:] if window > 0 else []
+    recent_set = set(recent)
+
+    # At most `window` positions can be skipped before an eligible question
+    for _ in range(size + window + 1):
+        if deck.cursor >= size:
+            _shuffle(deck, size)
+        question_id = pool[(deck.multiplier * deck.cursor + deck.offset) % size]
+        deck.cursor += 1
+        if question_id not in recent_set:
+            break
+
+    if window > 0:
+        recent = (recent + [question_id])[-window:]
+    deck.recent_question_ids = ",".join(str(i) for i in recent)
+    return question_id
+
+
+def area_pool(db: Session, tech_area: TechArea) -> List[int]:
+    """Question ids of a tech area in catalog (id) order"""
+    return [q.id for q in question_catalog.by_area(db, tech_area)]
+
+
+def load_decks(db: Session, user_ids: Iterable[int]) -> Dict[tuple, QuestionDeck]:
+    """Load the decks of many users in one query, keyed by (user_id, tech_area)"""
+    decks = db.query(QuestionDeck).filter(QuestionDeck.user_id.in_(list(user_ids)))
+    return {(deck.user_id, deck.tech_area): deck for deck in decks}
+
+
+def next_question_id(db: Session, user_id: int, tech_area: TechArea) -> Optional[int]:
+    """Draw the next question for a user, creating their deck if needed (not committed)"""
+    pool = area_pool(db, tech_area)
+    if not pool:
+        return None
+    deck = db.get(QuestionDeck, (user_id, tech_area))
+    if deck is None:
+        deck = new_deck(user_id, tech_area, len(pool))
+        db.add(deck)
+    return draw(deck, pool)
@@ -0,0 +1,98 @@
+"""
+Per-user due times for the daily question.
+Every user is due at daily_question_hour in their own timezone, plus a
+stable offset inside the dispatch window so one local 9 AM doesn't become a
+single spike. Due times are precomputed into users.next_question_due_at, so
+a scheduler tick only reads the users that are due now.
+"""
+import logging
+from datetime import datetime, time, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Sequence
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import and_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import tagged
+from app.database.models import User
+from app.database.partitions import partition_key
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    """ZoneInfo for an IANA name, falling back to the default timezone"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning("Unknown timezone %r, using %s", name, settings.default_timezone)
+        return ZoneInfo(settings.default_timezone)
+
+
+def is_valid_timezone(name: str) -> bool:
+    """Whether name is a known IANA timezone"""
+    try:
+        ZoneInfo(name)
+        return True
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+
+
+def window_offset(user_id: int, window_seconds: int) -> int:
+    """Stable, evenly spread offset in [0, window_seconds) for a user"""
+    if window_seconds <= 0:
+        return 0
+    return (user_id * 2654435761) % (2 ** 32) * window_seconds // (2 ** 32)
+
+
+def next_due_at(timezone_name: str, user_id: int, after: datetime,
+                hour: Optional[int] = None, window_minutes: Optional[int] = None) -> datetime:
+    """
+    Next send time strictly after `after` (naive UTC), as naive UTC:
+    the user's next local `hour`:00 plus their offset inside the window.
+    """
+    hour = settings.daily_question_hour if hour is None else hour
+    window = (settings.dispatch_window_minutes if window_minutes is None else window_minutes) * 60
+    zone = get_zone(timezone_name)
+    offset = timedelta(seconds=window_offset(user_id, window))
+
+    local_day = after.replace(tzinfo=timezone.utc).astimezone(zone).date()
+    for days in range(0, 3):
+        local = datetime.combine(local_day + timedelta(days=days), time(hour), tzinfo=zone)
+        due = (local.astimezone(timezone.utc) + offset).replace(tzinfo=None)
+        if due > after:
+            return due
+    raise AssertionError("unreachable: a local hour recurs within two days")
+
+
+@tagged
+def schedule_missing(db: Session, now: Optional[datetime] = None, chunk_size: int = 1000,
+                     partitions: Optional[Sequence[int]] = None) -> int:
+    """
+    Fill next_question_due_at for active users that don't have one yet
+    (new registrations, imports, rows from before this column existed),
+    optionally only in some dispatch partitions.
+    """
+    now = now or datetime.utcnow()
+    scheduled = 0
+    while True:
+        query = db.query(User.id, User.timezone).filter(and_(
+            User.is_active == True, User.next_question_due_at.is_(None)
+        ))
+        if partitions is not None:
+            query = query.filter(partition_key.in_(partitions))
+        rows = query.limit(chunk_size).all()
+        if not rows:
+            break
+        db.execute(update(User), [
+            {"id": user_id, "next_question_due_at": next_due_at(tz, user_id, now)}
+            for user_id, tz in rows
+        ])
+        db.commit()
+        scheduled += len(rows)
+    if scheduled:
+        logger.info("Scheduled first daily question for %d users", scheduled)
+    return scheduled
@@ -0,0 +1,251 @@
+"""
+Per-user progress aggregates.
+user_stats and user_area_stats hold running counts, score totals and answer
+streaks, updated by the same transaction that writes a response or its
+score, so progress messages read one row per user instead of every response.
+Streaks count consecutive days in the user's own timezone.
+rebuild_user_stats recomputes everything from user_responses (backfill_stats.py).
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import and_, bindparam, case, delete, func, insert, select, update, Integer
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import tagged
+from app.database.models import User, Question, UserResponse, UserStats, UserAreaStats, TechArea
+from app.database.schedule import get_zone
+
+logger = logging.getLogger(__name__)
+
+_stats = UserStats.__table__
+_area_stats = UserAreaStats.__table__
+_responses = UserResponse.__table__
+
+
+class AreaProgress(NamedTuple):
+    responses: int
+    scored: int
+    average_score: Optional[float]
+
+
+class UserProgress(NamedTuple):
+    """A user's progress as shown to them"""
+    responses: int
+    scored: int
+    average_score: Optional[float]
+    by_area: Dict[TechArea, AreaProgress]
+    current_streak: int  # 0 once a local day has passed without an answer
+    best_streak: int
+    last_answered_at: Optional[datetime]
+
+
+def _average(score_sum: int, scored: int) -> Optional[float]:
+    return round(score_sum / scored, 2) if scored else None
+
+
+def local_day(moment: datetime, timezone_name: str) -> date:
+    """Calendar day of a UTC timestamp (naive = UTC) in a timezone"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(get_zone(timezone_name)).date()
+
+
+def _upsert(dialect_name: str):
+    return postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+
+
+def answered_statements(dialect_name: str, user_id: int, question_id: int,
+                        answered_at: datetime, day: date) -> list:
+    """Upserts counting one new response answered on local `day`"""
+    insert_ = _upsert(dialect_name)
+    # Same day keeps the streak, the next day extends it, a gap restarts it.
+    # An older day (clock skew) leaves the streak alone.
+    current = case(
+        (_stats.c.last_answered_day >= day, _stats.c.current_streak),
+        (_stats.c.last_answered_day == day - timedelta(days=1), _stats.c.current_streak + 1),
+        else_=1,
+    )
+    user_stmt = insert_(_stats).values(
+        user_id=user_id, responses=1, scored=0, score_sum=0, current_streak=1, best_streak=1,
+        last_answered_day=day, last_answered_at=answered_at,
+    ).on_conflict_do_update(index_elements=["user_id"], set_={
+        "responses": _stats.c.responses + 1,
+        "current_streak": current,
+        "best_streak": case((current > _stats.c.best_streak, current), else_=_stats.c.best_streak),
+        "last_answered_day": case((_stats.c.last_answered_day >= day, _stats.c.last_answered_day), else_=day),
+        "last_answered_at": answered_at,
+    })
+    area_stmt = insert_(_area_stats).values(
+        user_id=user_id,
+        tech_area=select(Question.tech_area).where(Question.id == question_id).scalar_subquery(),
+        responses=1, scored=0, score_sum=0,
+    ).on_conflict_do_update(index_elements=["user_id", "tech_area"], set_={
+        "responses": _area_stats.c.responses + 1,
+    })
+    return [user_stmt, area_stmt]
+
+
+def _score_statements() -> list:
+    """
+    UPDATEs applying a response's score change, run with executemany params
+    {"response_id", "score"} before the response row itself is updated, since
+    they read its old score.
+    """
+    response_id = bindparam("response_id", type_=Integer)
+    score = bindparam("score", type_=Integer)
+    old_score = select(_responses.c.score).where(_responses.c.id == response_id).scalar_subquery()
+    owner = select(_responses.c.user_id).where(_responses.c.id == response_id).scalar_subquery()
+    area = (select(Question.tech_area)
+            .join(_responses, _responses.c.question_id == Question.id)
+            .where(_responses.c.id == response_id).scalar_subquery())
+    scored_delta = case((score.is_not(None), 1), else_=0) - case((old_score.is_not(None), 1), else_=0)
+    sum_delta = func.coalesce(score, 0) - func.coalesce(old_score, 0)
+    return [
+        update(_stats).where(_stats.c.user_id == owner).values(
+            scored=_stats.c.scored + scored_delta, score_sum=_stats.c.score_sum + sum_delta),
+        update(_area_stats).where(and_(_area_stats.c.user_id == owner, _area_stats.c.tech_area == area)).values(
+            scored=_area_stats.c.scored + scored_delta, score_sum=_area_stats.c.score_sum + sum_delta),
+    ]
+
+
+SCORE_STATEMENTS = _score_statements()
+
+
+def _timezone_query(user_id: int):
+    return select(User.timezone).where(User.id == user_id)
+
+
+def record_answer(db: Session, user_id: int, question_id: int, answered_at: Optional[datetime] = None):
+    """Count a new response; the caller commits it together with the response"""
+    answered_at = answered_at or datetime.utcnow()
+    timezone_name = db.execute(_timezone_query(user_id)).scalar() or settings.default_timezone
+    for stmt in answered_statements(db.get_bind().dialect.name, user_id, question_id,
+                                    answered_at, local_day(answered_at, timezone_name)):
+        db.execute(stmt)
+
+
+async def arecord_answer(db: AsyncSession, user_id: int, question_id: int,
+                         answered_at: Optional[datetime] = None):
+    """Async version of record_answer()"""
+    answered_at = answered_at or datetime.utcnow()
+    timezone_name = (await db.execute(_timezone_query(user_id))).scalar() or settings.default_timezone
+    dialect_name = (await db.connection()).dialect.name
+    for stmt in answered_statements(dialect_name, user_id, question_id,
+                                    answered_at, local_day(answered_at, timezone_name)):
+        await db.execute(stmt)
+
+
+def record_scores(db: Session, scores: List[dict]):
+    """Apply score changes ({"response_id", "score"}); call before updating the responses"""
+    if scores:
+        for stmt in SCORE_STATEMENTS:
+            db.execute(stmt, scores)
+
+
+async def arecord_scores(db: AsyncSession, scores: List[dict]):
+    """Async version of record_scores()"""
+    if scores:
+        for stmt in SCORE_STATEMENTS:
+            await db.execute(stmt, scores)
+
+
+def build_progress(row, timezone_name: str, areas: Iterable, today: Optional[date] = None) -> UserProgress:
+    """UserProgress from a user_stats row and the user's user_area_stats rows"""
+    today = today or local_day(datetime.utcnow(), timezone_name)
+    # The stored streak ends on the last answered day; it is broken once yesterday passes without one
+    alive = row.last_answered_day is not None and row.last_answered_day >= today - timedelta(days=1)
+    return UserProgress(
+        responses=row.responses,
+        scored=row.scored,
+        average_score=_average(row.score_sum, row.scored),
+        by_area={a.tech_area: AreaProgress(a.responses, a.scored, _average(a.score_sum, a.scored))
+                 for a in areas},
+        current_streak=row.current_streak if alive else 0,
+        best_streak=row.best_streak,
+        last_answered_at=row.last_answered_at,
+    )
+
+
+def progress_queries(user_id: int):
+    """Queries for a user's aggregates (with their timezone) and per-area rows"""
+    return (
+        select(UserStats, User.timezone).join(User, User.id == UserStats.user_id).where(UserStats.user_id == user_id),
+        select(UserAreaStats).where(UserAreaStats.user_id == user_id),
+    )
+
+
+def _aggregate(user_id: int, timezone_name: str, responses) -> tuple:
+    """user_stats and user_area_stats rows for one user's responses, oldest first"""
+    stats = {"user_id": user_id, "responses": 0, "scored": 0, "score_sum": 0, "current_streak": 0,
+             "best_streak": 0, "last_answered_day": None, "last_answered_at": None}
+    areas: Dict[TechArea, dict] = {}
+    for created_at, score, tech_area in responses:
+        area = areas.setdefault(tech_area, {"user_id": user_id, "tech_area": tech_area,
+                                            "responses": 0, "scored": 0, "score_sum": 0})
+        for totals in (stats, area):
+            totals["responses"] += 1
+            if score is not None:
+                totals["scored"] += 1
+                totals["score_sum"] += score
+        if created_at is None:
+            continue
+        day = local_day(created_at, timezone_name)
+        last = stats["last_answered_day"]
+        if last is None or day > last:
+            stats["current_streak"] = stats["current_streak"] + 1 if last == day - timedelta(days=1) else 1
+            stats["best_streak"] = max(stats["best_streak"], stats["current_streak"])
+            stats["last_answered_day"] = day
+        stats["last_answered_at"] = created_at
+    return stats, list(areas.values())
+
+
+@tagged
+def rebuild_user_stats(db: Session, chunk_size: int = 500) -> int:
+    """
+    Recompute the aggregates of every user from user_responses, in user-id chunks.
+    Each chunk deletes its old rows first, so it holds the write lock while it
+    reads and concurrent answers can't fall between the read and the write.
+    Returns the number of users with responses.
+    """
+    rebuilt = 0
+    last_id = 0
+    while True:
+        users = db.execute(
+            select(User.id, User.timezone).where(User.id > last_id).order_by(User.id).limit(chunk_size)
+        ).all()
+        if not users:
+            break
+        first_id, last_id = users[0].id, users[-1].id
+        db.execute(delete(UserStats).where(and_(UserStats.user_id >= first_id,
+                                                UserStats.user_id <= last_id)))
+        db.execute(delete(UserAreaStats).where(and_(UserAreaStats.user_id >= first_id,
+                                                    UserAreaStats.user_id <= last_id)))
+
+        by_user: Dict[int, list] = {}
+        rows = db.execute(
+            select(UserResponse.user_id, UserResponse.created_at, UserResponse.score, Question.tech_area)
+            .join(Question, Question.id == UserResponse.question_id)
+            .where(and_(UserResponse.user_id >= first_id, UserResponse.user_id <= last_id))
+            .order_by(UserResponse.user_id, UserResponse.created_at)
+        )
+        for user_id, created_at, score, tech_area in rows:
+            by_user.setdefault(user_id, []).append((created_at, score, tech_area))
+
+        stats_rows, area_rows = [], []
+        for user_id, timezone_name in users:
+            if user_id in by_user:
+                stats, areas = _aggregate(user_id, timezone_name, by_user[user_id])
+                stats_rows.append(stats)
+                area_rows.extend(areas)
+        if stats_rows:
+            db.execute(insert(UserStats), stats_rows)
+            db.execute(insert(UserAreaStats), area_rows)
+        db.commit()
+        rebuilt += len(stats_rows)
+    logger.info("Rebuilt progress aggregates for %d users", rebuilt)
+    return rebuilt
@@ -0,0 +1,169 @@
+"""
+Process-wide cache of conversation state for inbound message routing.
+Every inbound message needs the sender's user row and their open question;
+active users send several messages per session, so that state is cached by
+WhatsApp number. The CRUD write paths update or drop entries as they commit
+(write-through), and a TTL bounds staleness from writes in other processes.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import db_operation
+from app.database.models import User, TechArea, Language
+
+logger = logging.getLogger(__name__)
+
+
+class UserState(NamedTuple):
+    """Read-only routing state of one user"""
+    user_id: int
+    whatsapp_number: str
+    preferred_language: Language
+    tech_area: TechArea
+    pending_question_id: Optional[int]
+    is_active: bool
+
+
+_COLUMNS = (User.id, User.whatsapp_number, User.preferred_language, User.tech_area,
+            User.pending_question_id, User.is_active)
+
+# Cached for unknown numbers too, so strangers messaging the bot don't cost a query each time
+_UNKNOWN = None
+
+
+class UserStateCache:
+    """Bounded LRU with TTL, keyed by WhatsApp number"""
+
+    def __init__(self, max_entries: int = 50000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Optional[UserState]]]" = OrderedDict()
+        self._numbers: Dict[int, str] = {}  # user_id -> number, for writes that only know the id
+        self._lock = threading.Lock()
+        self._generation = 0  # Bumped by every write so a read racing with it isn't cached
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, number: str):
+        """(True, state) on a fresh hit, (False, generation) otherwise"""
+        with self._lock:
+            entry = self._entries.get(number)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(number)
+                self.hits += 1
+                return True, entry[1]
+            self.misses += 1
+            return False, self._generation
+
+    def _store(self, number: str, state: Optional[UserState], generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[number] = (time.monotonic() + self.ttl_seconds, state)
+            self._entries.move_to_end(number)
+            if state is not None:
+                self._numbers[state.user_id] = number
+            while len(self._entries) > self.max_entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                if evicted is not None:
+                    self._numbers.pop(evicted.user_id, None)
+
+    def get(self, db: Session, whatsapp_number: str) -> Optional[UserState]:
+        """Routing state for a number, or None if it isn't registered"""
+        found, state = self._lookup(whatsapp_number)
+        if found:
+            return state
+        generation = state
+        with db_operation("user_state.get"):
+            row = db.execute(select(*_COLUMNS).where(User.whatsapp_number == whatsapp_number).limit(1)).first()
+        state = UserState(*row) if row else _UNKNOWN
+        self._store(whatsapp_number, state, generation)
+        return state
+
+    async def aget(self, db: AsyncSession, whatsapp_number: str) -> Optional[UserState]:
+        """Async version of get()"""
+        found, state = self._lookup(whatsapp_number)
+        if found:
+            return state
+        generation = state
+        with db_operation("user_state.get"):
+            row = (await db.execute(
+                select(*_COLUMNS).where(User.whatsapp_number == whatsapp_number).limit(1))).first()
+        state = UserState(*row) if row else _UNKNOWN
+        self._store(whatsapp_number, state, generation)
+        return state
+
+    def invalidate(self, whatsapp_number: str):
+        """Drop a number; the next lookup reads the database"""
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(whatsapp_number, None)
+            if entry is not None:
+                self.invalidations += 1
+                if entry[1] is not None:
+                    self._numbers.pop(entry[1].user_id, None)
+
+    def invalidate_user(self, user_id: int):
+        """Drop a user by id"""
+        with self._lock:
+            self._generation += 1
+            number = self._numbers.get(user_id)
+        if number is not None:
+            self.invalidate(number)
+
+    def update_users(self, changes_by_user: Dict[int, dict]):
+        """Write-through: apply committed changes to cached entries, keeping their TTL"""
+        with self._lock:
+            self._generation += 1
+            for user_id, changes in changes_by_user.items():
+                number = self._numbers.get(user_id)
+                entry = self._entries.get(number) if number is not None else None
+                if entry is not None and entry[1] is not None:
+                    self._entries[number] = (entry[0], entry[1]._replace(**changes))
+
+    def update_user(self, user_id: int, **changes):
+        """Write-through for a single user"""
+        self.update_users({user_id: changes})
+
+    def answered(self, user_id: int, question_id: int):
+        """Close the cached open question if it is the one just answered"""
+        with self._lock:
+            self._generation += 1
+            number = self._numbers.get(user_id)
+            entry = self._entries.get(number) if number is not None else None
+            if entry is not None and entry[1] is not None and entry[1].pending_question_id == question_id:
+                self._entries[number] = (entry[0], entry[1]._replace(pending_question_id=None))
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._numbers.clear()
+
+    def stats(self) -> dict:
+        """Size and hit ratio"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+# Global cache instance
+user_states = UserStateCache(
+    max_entries=settings.user_state_cache_max_entries,
+    ttl_seconds=settings.user_state_cache_ttl_seconds,
+)
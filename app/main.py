@@ -3,19 +3,35 @@ Main FastAPI application entry point.
 This is where we configure our API server and include all routes.
 """
 import logging
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import webhooks, users
+from fastapi.responses import JSONResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from sqlalchemy import select
+from app.api import analytics, webhooks, users
 from app.core.config import settings
-from app.database.database import engine
+from app.core.logs import RequestIdMiddleware, configure_logging
+from app.core.metrics import DB_PROBE_SECONDS, MetricsMiddleware, db_operation, track_queue
+from app.database.database import AsyncSessionLocal, engine, require_async_engine
 from app.database.models import Base
+from app.services.ai_feedback import get_feedback_engine
+from app.services.audio import get_audio_pipeline
+from app.services.outbox_drainer import get_outbox_drainer
+from app.services.scheduler import get_question_scheduler
+from app.services.whatsapp import close_whatsapp_sender
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Configure logging: records are queued here and written by a background thread
+configure_logging(
+    level=settings.log_level,
+    fmt=settings.log_format,
+    queue_size=settings.log_queue_size,
+    sample_rates=settings.log_sample_rates
 )
 
+# Request handlers and background services use the async engine
+require_async_engine()
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
@@ -35,9 +51,51 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Every log record of a request carries its ID (X-Request-ID, echoed back)
+app.add_middleware(RequestIdMiddleware)
+
+# Outermost, so the recorded latency covers every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Include API routes
 app.include_router(webhooks.router, prefix="/webhook", tags=["WhatsApp"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
+
+@app.on_event("startup")
+async def startup():
+    """Start webhook workers, the status ingestor and the optional feedback engine, audio pipeline, outbox drainer and question scheduler"""
+    await webhooks.webhook_queue.start()
+    track_queue("webhook", webhooks.webhook_queue.depth)
+    await webhooks.status_ingestor.start()
+    track_queue("status", webhooks.status_ingestor.depth)
+    if settings.ai_feedback_enabled:
+        await get_feedback_engine().start()
+        track_queue("ai_feedback", get_feedback_engine().depth)
+    if settings.audio_transcription_enabled:
+        await get_audio_pipeline().start()
+        track_queue("audio", get_audio_pipeline().depth)
+    if settings.outbox_enabled:
+        await get_outbox_drainer().start()
+        track_queue("outbox", lambda: get_outbox_drainer().backlog)
+    if settings.scheduler_enabled:
+        await get_question_scheduler().start()
+        track_queue("scheduler_backlog", lambda: get_question_scheduler().backlog)
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop scheduling and sending, drain queued webhooks and statuses, stop grading and transcription, release connections"""
+    if settings.scheduler_enabled:
+        await get_question_scheduler().stop()
+    if settings.outbox_enabled:
+        await get_outbox_drainer().stop()
+    await webhooks.webhook_queue.stop()
+    await webhooks.status_ingestor.stop()
+    if settings.audio_transcription_enabled:
+        await get_audio_pipeline().stop()
+    if settings.ai_feedback_enabled:
+        await get_feedback_engine().stop()
+    await close_whatsapp_sender()
 
 @app.get("/")
 async def root():
@@ -46,9 +104,28 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Detailed health check"""
-    return {
-        "status": "healthy",
-        "database": "connected",  # We'll implement this check later
-        "whatsapp_api": "configured"
-    }
\ No newline at end of file
+    """Detailed health check with a timed database probe"""
+    started = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            with db_operation("health.probe"):
+                await db.execute(select(1))  # A read: the reader pool, never the write lock
+        database = {"status": "connected"}
+    except Exception as e:
+        logging.getLogger(__name__).error("Health check database probe failed: %s", e)
+        database = {"status": "unavailable", "error": type(e).__name__}
+    elapsed = time.perf_counter() - started
+    DB_PROBE_SECONDS.set(elapsed)
+    database["latency_ms"] = round(elapsed * 1000, 3)
+
+    healthy = database["status"] == "connected"
+    return JSONResponse(status_code=200 if healthy else 503, content={
+        "status": "healthy" if healthy else "unhealthy",
+        "database": database,
+        "whatsapp_api": "configured" if settings.whatsapp_access_token else "missing token"
+    })
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for this process"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1 @@
+# Business and integration services package
\ No newline at end of file
@@ -0,0 +1,462 @@
+"""
+AI feedback engine.
+This grades pending user responses with a pluggable provider (OpenAI, or a
+fake one for local runs and CI). Pending rows are pulled in micro-batches,
+graded with bounded concurrency in earliest-deadline-first order against the
+feedback SLA, and written back with batched UPDATEs. A response that keeps
+failing gets fallback feedback and is graded again later
+(settings.ai_regrade_after_seconds), up to settings.ai_max_regrades times.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Deque, Dict, List, Optional, Protocol, Set
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.metrics import db_operation, outbound_call, percentile
+from app.database.database import AsyncSessionLocal, require_async_engine
+from app.database.models import User, Question, UserResponse, Language
+from app.database.stats import arecord_scores
+from app.services.feedback_cache import FeedbackCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_FEEDBACK = {
+    Language.ENGLISH: "Thanks for your answer! We couldn't analyze it right now, but keep practicing.",
+    Language.SPANISH: "¡Gracias por tu respuesta! No pudimos analizarla ahora, pero sigue practicando.",
+    Language.PORTUGUESE: "Obrigado pela sua resposta! Não conseguimos analisá-la agora, mas continue praticando.",
+}
+
+
+@dataclass(order=True)
+class GradingItem:
+    """A pending response, ordered by its feedback deadline"""
+    deadline: float
+    response_id: int
+    user_id: int = field(compare=False)
+    question_id: int = field(compare=False)
+    question_text: str = field(compare=False)
+    expected_concepts: Optional[str] = field(compare=False)
+    response_text: str = field(compare=False)
+    language: Language = field(compare=False)
+    created_at: float = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+    cache_key: Optional[str] = field(default=None, compare=False)
+    regrades: int = field(default=0, compare=False)  # Earlier passes that ended in fallback feedback
+    regrade: bool = field(default=False, compare=False)  # Has fallback feedback, not counted against the SLA
+
+
+@dataclass
+class GradingResult:
+    """Feedback text and a 1-10 score"""
+    feedback: str
+    score: Optional[int]
+    fallback: bool = False  # The provider failed; grade again later
+
+
+class FeedbackProvider(Protocol):
+    """Anything that can grade an answer"""
+
+    async def grade(self, item: GradingItem) -> GradingResult:
+        ...
+
+
+class OpenAIFeedbackProvider:
+    """Grades answers with the OpenAI chat completions API"""
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None,
+                 timeout: float = 30.0):
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=api_key or settings.openai_api_key,
+                                  timeout=timeout, max_retries=2)
+        self.model = model or settings.openai_model
+
+    async def grade(self, item: GradingItem) -> GradingResult:
+        prompt = (
+            f"Interview question: {item.question_text}\n"
+            f"Key concepts: {item.expected_concepts or 'n/a'}\n"
+            f"Candidate answer: {item.response_text}\n\n"
+            f"Reply in language '{item.language.value}' with JSON: "
+            '{"feedback": "<2-4 sentences>", "score": <integer 1-10>}'
+        )
+        completion = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are a friendly technical interviewer grading short answers."},
+                {"role": "user", "content": prompt},
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.2,
+        )
+        data = json.loads(completion.choices[0].message.content)
+        score = min(10, max(1, int(data["score"])))
+        return GradingResult(feedback=str(data["feedback"]).strip(), score=score)
+
+
+class FakeFeedbackProvider:
+    """Local stand-in with artificial latency, for development, CI and benchmarks"""
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, failure_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+
+    async def grade(self, item: GradingItem) -> GradingResult:
+        self.calls += 1
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        if random.random() < self.failure_rate:
+            raise RuntimeError("Fake provider failure")
+        score = min(10, max(1, len(item.response_text.split()) // 3))
+        return GradingResult(feedback=f"[fake] Reviewed answer to question {item.question_id}.", score=score)
+
+
+def build_provider() -> FeedbackProvider:
+    """Provider selected by settings.ai_feedback_provider"""
+    if settings.ai_feedback_provider == "fake":
+        return FakeFeedbackProvider()
+    return OpenAIFeedbackProvider()
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    """Epoch seconds; naive datetimes from SQLite are UTC"""
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class FeedbackEngine:
+    """
+    Background grading pipeline.
+    A feeder task keeps an EDF heap topped up from the database, worker tasks
+    grade the earliest deadline first, and a flusher task persists results.
+    """
+
+    def __init__(self, provider: FeedbackProvider, session_factory: Optional[Callable] = None,
+                 cache: Optional[FeedbackCache] = None,
+                 max_concurrency: int = settings.ai_max_concurrency,
+                 batch_size: int = settings.ai_batch_size,
+                 sla_seconds: float = settings.ai_feedback_sla_seconds,
+                 poll_interval: float = 1.0, flush_interval: float = 0.25,
+                 max_attempts: int = 3,
+                 regrade_after_seconds: float = settings.ai_regrade_after_seconds,
+                 max_regrades: int = settings.ai_max_regrades):
+        self.provider = provider
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.sla_seconds = sla_seconds
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.regrade_after_seconds = regrade_after_seconds
+        self.max_regrades = max_regrades
+
+        self._heap: List[GradingItem] = []
+        self._known: Set[int] = set()  # Queued, in flight or awaiting flush
+        self._followers: Dict[str, List[GradingItem]] = {}  # Same answer as an item being graded
+        self._results: List[dict] = []
+        self._completed: List[GradingItem] = []
+        self._cond: Optional[asyncio.Condition] = None
+        self._flush_now: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight = 0
+        self._last_fetch = -1
+
+        self.graded = 0
+        self.failed_calls = 0
+        self.fallbacks = 0
+        self.regraded = 0
+        self.deadline_missed = 0
+        self.batches_written = 0
+        self.deduplicated = 0
+        self._latencies: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def depth(self) -> int:
+        """Responses fetched and waiting for a grading worker"""
+        return len(self._heap)
+
+    def _session(self):
+        return self.session_factory()
+
+    async def start(self):
+        """Spawn the feeder, workers and flusher"""
+        if self.running:
+            return
+        if self.session_factory is None:
+            require_async_engine()  # Raises instead of failing on every cycle
+        self._cond = asyncio.Condition()
+        self._flush_now = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._feeder(), name="feedback-feeder"),
+                       asyncio.create_task(self._flusher(), name="feedback-flusher")]
+        self._tasks += [asyncio.create_task(self._worker(), name=f"feedback-worker-{i}")
+                        for i in range(self.max_concurrency)]
+        logger.info("Feedback engine started (%d workers, batch %d, SLA %ss)",
+                    self.max_concurrency, self.batch_size, self.sla_seconds)
+
+    async def stop(self):
+        """Cancel the tasks and write any finished results"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._flush()
+
+    async def run_until_idle(self, timeout: Optional[float] = None):
+        """Start, grade everything pending, then stop (CLI, CI and benchmarks)"""
+        await self.start()
+        started = time.monotonic()
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                if self._last_fetch == 0 and not self._known:
+                    return
+                if timeout is not None and time.monotonic() - started > timeout:
+                    logger.warning("Feedback engine stopped with %d responses pending", len(self._known))
+                    return
+        finally:
+            await self.stop()
+
+    def _pending_queries(self, limit: int):
+        """New responses without feedback, then fallback feedback due for a regrade"""
+        columns = (UserResponse.id, UserResponse.user_id, UserResponse.question_id,
+                   UserResponse.response_text, UserResponse.created_at, UserResponse.feedback_regrades,
+                   Question.question_text_en, Question.expected_concepts, User.preferred_language)
+
+        def query(condition, order):
+            stmt = (select(*columns)
+                    .join(Question, Question.id == UserResponse.question_id)
+                    .join(User, User.id == UserResponse.user_id)
+                    .where(condition).order_by(order).limit(limit))
+            return stmt.where(UserResponse.id.not_in(self._known)) if self._known else stmt
+
+        return (query(UserResponse.ai_feedback.is_(None), UserResponse.created_at),
+                query(UserResponse.feedback_retry_at <= datetime.utcnow(), UserResponse.feedback_retry_at))
+
+    async def fetch_pending(self, limit: int) -> List[GradingItem]:
+        """Oldest responses without feedback that aren't already being handled, then due regrades"""
+        new_query, regrade_query = self._pending_queries(limit)
+        async with self._session() as db:
+            with db_operation("ai_feedback.fetch_pending"):
+                rows = (await db.execute(new_query)).all()
+                regrades = []
+                if len(rows) < limit:
+                    regrades = (await db.execute(regrade_query.limit(limit - len(rows)))).all()
+
+        items = []
+        now = time.time()
+        for row, regrade in [(row, False) for row in rows] + [(row, True) for row in regrades]:
+            created_at = _timestamp(row.created_at)
+            items.append(GradingItem(
+                # A regrade is already late; it queues behind answers still within the SLA
+                deadline=(now if regrade else created_at) + self.sla_seconds,
+                response_id=row.id,
+                user_id=row.user_id,
+                question_id=row.question_id,
+                question_text=row.question_text_en,
+                expected_concepts=row.expected_concepts,
+                response_text=row.response_text,
+                language=row.preferred_language,
+                created_at=created_at,
+                regrades=row.feedback_regrades,
+                regrade=regrade,
+            ))
+        return items
+
+    async def _feeder(self):
+        while True:
+            try:
+                # Keep about two micro-batches ahead of the workers
+                room = 2 * self.batch_size - len(self._heap)
+                if room >= self.batch_size:
+                    items = await self.fetch_pending(self.batch_size)
+                    self._last_fetch = len(items)
+                    if items:
+                        await self._admit(items)
+                        if len(items) == self.batch_size:
+                            continue  # More may be waiting; fetch again right away
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Feedback feeder failed to fetch pending responses")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _admit(self, items: List[GradingItem]):
+        """Answer cache hits right away, park repeated answers, queue the rest"""
+        for item in items:
+            self._known.add(item.response_id)
+
+        queue = items
+        if self.cache is not None:
+            for item in items:
+                item.cache_key = cache_key(item.question_id, item.language, item.response_text)
+            async with self._session() as db:
+                cached = await self.cache.lookup(db, {item.cache_key for item in items})
+            queue = []
+            for item in items:
+                if item.cache_key in cached:
+                    feedback, score = cached[item.cache_key]
+                    self._complete(item, GradingResult(feedback=feedback, score=score))
+                elif item.cache_key in self._followers:
+                    self._followers[item.cache_key].append(item)
+                else:
+                    self._followers[item.cache_key] = []
+                    queue.append(item)
+
+        if queue:
+            async with self._cond:
+                for item in queue:
+                    heapq.heappush(self._heap, item)
+                self._cond.notify(len(queue))
+
+    def _complete(self, item: GradingItem, result: GradingResult):
+        """Buffer a result for the next batched write"""
+        regrades = item.regrades + (1 if item.regrade else 0)
+        retry_at = None
+        if result.fallback and regrades < self.max_regrades:
+            retry_at = datetime.utcnow() + timedelta(seconds=self.regrade_after_seconds)
+        elif item.regrade and not result.fallback:
+            self.regraded += 1
+        self._results.append({"id": item.response_id, "ai_feedback": result.feedback,
+                              "score": result.score, "feedback_retry_at": retry_at,
+                              "feedback_regrades": regrades})
+        self._completed.append(item)
+        if len(self._results) >= self.batch_size:
+            self._flush_now.set()
+
+    async def _worker(self):
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: self._heap)
+                item = heapq.heappop(self._heap)
+            self._in_flight += 1
+            try:
+                with outbound_call("ai_feedback"):
+                    result = await self.provider.grade(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed_calls += 1
+                item.attempts += 1
+                if item.attempts < self.max_attempts:
+                    logger.warning("Grading response %s failed (%s), retrying", item.response_id, e)
+                    async with self._cond:
+                        heapq.heappush(self._heap, item)  # Same deadline keeps its priority
+                        self._cond.notify()
+                    continue
+                logger.error("Grading response %s failed, using fallback feedback", item.response_id)
+                self.fallbacks += 1
+                result = GradingResult(feedback=FALLBACK_FEEDBACK[item.language], score=None, fallback=True)
+            else:
+                if self.cache is not None:
+                    self.cache.put(item.cache_key, item.question_id, item.language,
+                                   result.feedback, result.score)
+            finally:
+                self._in_flight -= 1
+
+            self._complete(item, result)
+            for follower in self._followers.pop(item.cache_key, []):
+                self.deduplicated += 1
+                self._complete(follower, result)
+
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self._flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Feedback flusher failed to write results")
+
+    async def _flush(self):
+        """Write finished results with one executemany UPDATE"""
+        if not self._results:
+            return
+        results, self._results = self._results, []
+        completed, self._completed = self._completed, []
+        try:
+            async with self._session() as db:
+                with db_operation("ai_feedback.flush"):
+                    # Aggregates first: they read the scores being replaced
+                    await arecord_scores(db, [{"response_id": r["id"], "score": r["score"]} for r in results])
+                    await db.execute(update(UserResponse), results)
+                    if self.cache is not None:
+                        await self.cache.flush(db)
+                    await db.commit()
+        except Exception:
+            # Put them back so the next flush retries
+            self._results = results + self._results
+            self._completed = completed + self._completed
+            raise
+
+        now = time.time()
+        self.batches_written += 1
+        self.graded += len(results)
+        for item in completed:
+            self._known.discard(item.response_id)
+            if item.regrade:
+                continue
+            self._latencies.append(now - item.created_at)
+            if now > item.deadline:
+                self.deadline_missed += 1
+
+    def stats(self) -> dict:
+        """Throughput counters, SLA misses and end-to-end latency (seconds)"""
+        return {
+            "queued": self.depth(),
+            "in_flight": self._in_flight,
+            "graded": self.graded,
+            "failed_calls": self.failed_calls,
+            "fallbacks": self.fallbacks,
+            "regraded": self.regraded,
+            "deadline_missed": self.deadline_missed,
+            "batches_written": self.batches_written,
+            "deduplicated": self.deduplicated,
+            "saved_calls": self.deduplicated + (self.cache.stats()["saved_calls"] if self.cache else 0),
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "latency_seconds": {
+                "p50": percentile(self._latencies, 50, scale=1),
+                "p95": percentile(self._latencies, 95, scale=1),
+                "max": percentile(self._latencies, 100, scale=1),
+            },
+        }
+
+
+_engine: Optional[FeedbackEngine] = None
+
+
+def get_feedback_engine() -> FeedbackEngine:
+    """Process-wide engine using the configured provider"""
+    global _engine
+    if _engine is None:
+        cache = None
+        if settings.feedback_cache_enabled:
+            cache = FeedbackCache(
+                max_entries=settings.feedback_cache_max_entries,
+                ttl_seconds=settings.feedback_cache_ttl_seconds,
+                persist=settings.feedback_cache_persist,
+                max_rows=settings.feedback_cache_max_rows
+            )
+        _engine = FeedbackEngine(build_provider(), cache=cache)
+    return _engine
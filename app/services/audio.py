@@ -0,0 +1,444 @@
+"""
+Voice answer pipeline.
+WhatsApp voice notes are streamed to spooled temp files in chunks, then
+decoded, resampled and transcribed in a process pool fed by a bounded queue,
+so neither memory nor the event loop depends on how many notes arrive at once.
+Transcription is a pluggable backend (OpenAI Whisper, or a stub for local runs).
+"""
+import array
+import asyncio
+import io
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import warnings
+import wave
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import Deque, Dict, Optional, Protocol, Union
+
+from app.core.config import settings
+from app.core.metrics import outbound_call, percentile
+
+logger = logging.getLogger(__name__)
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    try:
+        import audioop  # C resampler; removed from the stdlib in Python 3.13
+    except ImportError:
+        audioop = None
+
+STAGES = ("queue_wait", "download", "decode", "resample", "transcribe", "total")
+
+
+class AudioError(Exception):
+    """Raised when a voice note can't be decoded or transcribed"""
+
+
+class SpooledMedia:
+    """
+    Write sink that keeps small media in memory and rolls larger media over
+    to a named temp file, so worker processes can open it by path.
+    """
+
+    def __init__(self, max_memory: int = 1048576, directory: Optional[str] = None):
+        self.max_memory = max_memory
+        self.directory = directory
+        self.size = 0
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file = None
+
+    @property
+    def on_disk(self) -> bool:
+        return self._file is not None
+
+    def write(self, chunk: bytes) -> int:
+        self.size += len(chunk)
+        if self._file is None and self.size > self.max_memory:
+            self._file = tempfile.NamedTemporaryFile(
+                prefix="voice-", suffix=".media", dir=self.directory, delete=False)
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        if self._file is not None:
+            return self._file.write(chunk)
+        return self._buffer.write(chunk)
+
+    def source(self) -> Union[bytes, str]:
+        """What a worker process gets: the bytes if small, otherwise the file path"""
+        if self._file is not None:
+            self._file.flush()
+            return self._file.name
+        return self._buffer.getvalue()
+
+    def close(self):
+        """Drop the buffer and delete the temp file"""
+        if self._file is not None:
+            self._file.close()
+            try:
+                os.unlink(self._file.name)
+            except FileNotFoundError:
+                pass
+            self._file = None
+        self._buffer = None
+
+
+# Decoding and resampling (run inside the worker processes)
+
+def _to_mono_16bit(frames: bytes, channels: int, sample_width: int) -> bytes:
+    if sample_width != 2:
+        raise AudioError(f"Unsupported WAV sample width: {sample_width * 8} bits")
+    if channels == 1:
+        return frames
+    samples = array.array("h", frames)
+    mono = array.array("h", (
+        sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)))
+    return mono.tobytes()
+
+
+def decode_audio(source: Union[bytes, str], sample_rate: int) -> tuple:
+    """
+    Decode a voice note to mono 16-bit PCM; returns (pcm, rate).
+    WAV is read directly; anything else (WhatsApp sends OGG/Opus) goes through
+    ffmpeg, which also resamples to sample_rate on the way out.
+    """
+    if isinstance(source, bytes):
+        header = source[:4]
+    else:
+        with open(source, "rb") as f:
+            header = f.read(4)
+
+    if header == b"RIFF":
+        with wave.open(io.BytesIO(source) if isinstance(source, bytes) else source, "rb") as wav:
+            frames = wav.readframes(wav.getnframes())
+            return _to_mono_16bit(frames, wav.getnchannels(), wav.getsampwidth()), wav.getframerate()
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise AudioError("ffmpeg is required to decode non-WAV audio")
+    command = [ffmpeg, "-nostdin", "-v", "error", "-i",
+               "pipe:0" if isinstance(source, bytes) else source,
+               "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "pipe:1"]
+    process = subprocess.run(command, input=source if isinstance(source, bytes) else None,
+                             capture_output=True, timeout=120)
+    if process.returncode != 0:
+        raise AudioError(f"ffmpeg failed: {process.stderr.decode(errors='replace')[:200]}")
+    return process.stdout, sample_rate
+
+
+def resample_pcm(pcm: bytes, source_rate: int, target_rate: int) -> bytes:
+    """Resample mono 16-bit PCM (audioop when available, else linear interpolation)"""
+    if source_rate == target_rate or not pcm:
+        return pcm
+    if audioop is not None:
+        return audioop.ratecv(pcm, 2, 1, source_rate, target_rate, None)[0]
+    samples = array.array("h", pcm)
+    count = max(1, int(len(samples) * target_rate / source_rate))
+    step = (len(samples) - 1) / max(1, count - 1)
+    last = len(samples) - 1
+    out = array.array("h", bytes(2 * count))
+    for i in range(count):
+        position = i * step
+        left = int(position)
+        right = min(left + 1, last)
+        fraction = position - left
+        out[i] = int(samples[left] + (samples[right] - samples[left]) * fraction)
+    return out.tobytes()
+
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Wrap mono 16-bit PCM in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+# Transcription backends
+
+class TranscriptionBackend(Protocol):
+    """Anything that can turn 16-bit mono PCM into text"""
+
+    def transcribe(self, pcm: bytes, sample_rate: int, language: Optional[str]) -> str:
+        ...
+
+
+class OpenAITranscriptionBackend:
+    """Transcribes with the OpenAI audio transcription API (Whisper)"""
+
+    def __init__(self, api_key: Optional[str] = None, model: Optional[str] = None,
+                 timeout: float = 60.0):
+        from openai import OpenAI
+
+        self.client = OpenAI(api_key=api_key or settings.openai_api_key,
+                             timeout=timeout, max_retries=2)
+        self.model = model or settings.transcription_model
+
+    def transcribe(self, pcm: bytes, sample_rate: int, language: Optional[str]) -> str:
+        options = {"language": language} if language else {}
+        result = self.client.audio.transcriptions.create(
+            model=self.model, file=("answer.wav", pcm_to_wav(pcm, sample_rate)), **options)
+        return result.text.strip()
+
+
+class StubTranscriptionBackend:
+    """Local stand-in: burns CPU in proportion to the audio length, no network"""
+
+    def __init__(self, cost_per_audio_second: float = 0.002):
+        self.cost_per_audio_second = cost_per_audio_second
+
+    def transcribe(self, pcm: bytes, sample_rate: int, language: Optional[str]) -> str:
+        seconds = len(pcm) / 2 / sample_rate
+        deadline = time.perf_counter() + seconds * self.cost_per_audio_second
+        while time.perf_counter() < deadline:
+            pass
+        return f"[stub transcript of {seconds:.1f}s of audio]"
+
+
+TRANSCRIPTION_BACKENDS = {
+    "openai": OpenAITranscriptionBackend,
+    "stub": StubTranscriptionBackend,
+}
+
+
+def build_backend(name: str, **options) -> TranscriptionBackend:
+    """Backend registered under name"""
+    if name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return TRANSCRIPTION_BACKENDS[name](**options)
+
+
+# Worker process side
+
+_worker_backend: Optional[TranscriptionBackend] = None
+
+
+def _init_worker(backend_name: str, backend_options: dict):
+    """Build the backend once per worker process"""
+    global _worker_backend
+    _worker_backend = build_backend(backend_name, **backend_options)
+
+
+def process_audio(source: Union[bytes, str], sample_rate: int, language: Optional[str]) -> dict:
+    """Decode, resample and transcribe one voice note; runs in a worker process"""
+    timings = {}
+    started = time.perf_counter()
+    pcm, rate = decode_audio(source, sample_rate)
+    timings["decode"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    pcm = resample_pcm(pcm, rate, sample_rate)
+    timings["resample"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    text = _worker_backend.transcribe(pcm, sample_rate, language)
+    timings["transcribe"] = time.perf_counter() - started
+
+    return {"text": text, "duration": len(pcm) / 2 / sample_rate, "timings": timings}
+
+
+# Event loop side
+
+@dataclass
+class TranscriptionResult:
+    """Transcript of one voice note with per-stage timings in seconds"""
+    text: str
+    duration: float
+    size: int
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class _Job:
+    enqueued_at: float
+    future: asyncio.Future
+    media_id: Optional[str] = None
+    source: Optional[Union[bytes, str]] = None
+    language: Optional[str] = None
+
+
+class AudioPipeline:
+    """
+    Bounded queue in front of a process pool.
+    A few dispatcher tasks per worker process download voice notes while
+    earlier ones are being transcribed; callers await the transcript.
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = 100, backend: str = "openai",
+                 backend_options: Optional[dict] = None, sample_rate: int = 16000,
+                 chunk_size: int = 65536, max_bytes: int = 16777216,
+                 spool_max_memory: int = 1048576, spool_dir: Optional[str] = None,
+                 downloader=None, sample_size: int = 1000):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.spool_max_memory = spool_max_memory
+        self.spool_dir = spool_dir
+        self._downloader = downloader
+        self._queue: Optional[asyncio.Queue] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.spooled_to_disk = 0
+        self._samples: Dict[str, Deque[float]] = {
+            stage: deque(maxlen=sample_size) for stage in STAGES}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Start the worker processes and the dispatcher tasks"""
+        if self.running:
+            return
+        # spawn, not fork: the parent has an event loop and DB threads running
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=get_context("spawn"),
+            initializer=_init_worker, initargs=(self.backend, self.backend_options))
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [
+            asyncio.create_task(self._dispatcher(i), name=f"audio-dispatcher-{i}")
+            for i in range(self.workers * 2)
+        ]
+        logger.info("Audio pipeline started with %d processes (backend=%s, queue=%d)",
+                    self.workers, self.backend, self.queue_size)
+
+    async def stop(self, drain_timeout: float = 30.0):
+        """Finish queued voice notes, then shut the pool down"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Audio pipeline stopped with %d voice notes pending", self.depth())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+
+    async def _submit(self, job: _Job) -> TranscriptionResult:
+        await self.start()
+        self.submitted += 1
+        await self._queue.put(job)  # Blocks the caller while the queue is full
+        return await job.future
+
+    async def transcribe_media(self, media_id: str, language: Optional[str] = None) -> TranscriptionResult:
+        """Download a WhatsApp media object and transcribe it"""
+        future = asyncio.get_running_loop().create_future()
+        return await self._submit(_Job(time.perf_counter(), future, media_id=media_id, language=language))
+
+    async def transcribe_source(self, source: Union[bytes, str],
+                                language: Optional[str] = None) -> TranscriptionResult:
+        """Transcribe audio that is already local (bytes or a file path)"""
+        future = asyncio.get_running_loop().create_future()
+        return await self._submit(_Job(time.perf_counter(), future, source=source, language=language))
+
+    def _get_downloader(self):
+        if self._downloader is None:
+            from app.services.whatsapp import get_whatsapp_sender
+
+            self._downloader = get_whatsapp_sender()
+        return self._downloader
+
+    async def _dispatcher(self, index: int):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            started = time.perf_counter()
+            timings = {"queue_wait": started - job.enqueued_at}
+            spool = None
+            try:
+                source, size = job.source, 0
+                if job.media_id is not None:
+                    spool = SpooledMedia(self.spool_max_memory, self.spool_dir)
+                    info = await self._get_downloader().download_media(
+                        job.media_id, spool, chunk_size=self.chunk_size, max_bytes=self.max_bytes)
+                    size = info.size
+                    if spool.on_disk:
+                        self.spooled_to_disk += 1
+                    source = spool.source()
+                    timings["download"] = time.perf_counter() - started
+
+                with outbound_call("transcription"):
+                    output = await loop.run_in_executor(
+                        self._pool, process_audio, source, self.sample_rate, job.language)
+                timings.update(output["timings"])
+                timings["total"] = time.perf_counter() - job.enqueued_at
+                for stage, seconds in timings.items():
+                    self._samples[stage].append(seconds)
+                self.completed += 1
+                if not job.future.done():
+                    job.future.set_result(TranscriptionResult(
+                        text=output["text"], duration=output["duration"], size=size, timings=timings))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.warning("Audio dispatcher %d failed on %s: %s",
+                               index, job.media_id or "local audio", e)
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                if spool is not None:
+                    spool.close()
+                self._queue.task_done()
+
+    def metrics(self) -> dict:
+        """Counters, queue depth and per-stage latency percentiles"""
+        return {
+            "depth": self.depth(),
+            "queue_size": self.queue_size,
+            "workers": self.workers,
+            "backend": self.backend,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "spooled_to_disk": self.spooled_to_disk,
+            "stages_ms": {
+                stage: {
+                    "p50": percentile(samples, 50),
+                    "p95": percentile(samples, 95),
+                    "p99": percentile(samples, 99),
+                }
+                for stage, samples in self._samples.items()
+            },
+        }
+
+
+_pipeline: Optional[AudioPipeline] = None
+
+
+def get_audio_pipeline() -> AudioPipeline:
+    """Process-wide pipeline using the configured backend"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = AudioPipeline(
+            workers=settings.audio_workers,
+            queue_size=settings.audio_queue_size,
+            backend=settings.transcription_backend,
+            sample_rate=settings.audio_sample_rate,
+            chunk_size=settings.media_chunk_size,
+            max_bytes=settings.media_max_bytes,
+            spool_max_memory=settings.media_spool_max_memory,
+            spool_dir=settings.media_spool_dir,
+        )
+    return _pipeline
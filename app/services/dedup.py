@@ -0,0 +1,128 @@
+"""
+Deduplication of redelivered WhatsApp messages.
+An in-memory LRU with TTL answers most lookups; an optional table in the
+SQLite database keeps message IDs across restarts.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert
+
+from app.database.database import SessionLocal
+from app.database.models import ProcessedMessage
+
+logger = logging.getLogger(__name__)
+
+
+class MessageDeduplicator:
+    """Check-and-record store keyed by WhatsApp message ID"""
+
+    def __init__(self, max_entries: int = 100000, ttl_seconds: float = 86400,
+                 persist: bool = False, prune_every: int = 1000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self.prune_every = prune_every
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._persisted_since_prune = 0
+        self._prune_lock = threading.Lock()  # Database lookups run on executor threads
+        self.hits = 0
+        self.misses = 0
+        self.persisted_hits = 0
+
+    def _seen_in_memory(self, message_id: str) -> bool:
+        """Look up and record a message ID in the LRU; True if already seen"""
+        now = time.monotonic()
+        expires_at = self._entries.get(message_id)
+        if expires_at is not None and expires_at > now:
+            self._entries.move_to_end(message_id)
+            return True
+
+        self._entries[message_id] = now + self.ttl_seconds
+        self._entries.move_to_end(message_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return False
+
+    def _seen_in_database(self, message_id: str) -> bool:
+        """Insert the message ID unless present; True if it was already stored"""
+        db = SessionLocal()
+        try:
+            result = db.execute(
+                insert(ProcessedMessage)
+                .values(message_id=message_id, received_at=datetime.utcnow())
+                .on_conflict_do_nothing(index_elements=["message_id"])
+            )
+            with self._prune_lock:
+                self._persisted_since_prune += 1
+                prune = self._persisted_since_prune >= self.prune_every
+                if prune:
+                    self._persisted_since_prune = 0
+            if prune:
+                cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+                db.execute(delete(ProcessedMessage).where(ProcessedMessage.received_at < cutoff))
+            db.commit()
+            return result.rowcount == 0
+        finally:
+            db.close()
+
+    def _forget_in_database(self, message_id: str):
+        db = SessionLocal()
+        try:
+            db.execute(delete(ProcessedMessage).where(ProcessedMessage.message_id == message_id))
+            db.commit()
+        finally:
+            db.close()
+
+    async def is_duplicate(self, message_id: Optional[str]) -> bool:
+        """
+        Record a message ID and report whether it was processed before.
+        The ID is claimed right away so a concurrent redelivery is dropped;
+        call forget() if handling the message then fails.
+        """
+        if not message_id:
+            return False
+        if self._seen_in_memory(message_id):
+            self.hits += 1
+            return True
+        if self.persist:
+            try:
+                if await asyncio.get_running_loop().run_in_executor(
+                        None, self._seen_in_database, message_id):
+                    self.hits += 1
+                    self.persisted_hits += 1
+                    return True
+            except Exception as e:
+                # Dedup is best effort: fall through and process the message
+                logger.error("Dedup store error: %s", e)
+        self.misses += 1
+        return False
+
+    async def forget(self, message_id: Optional[str]):
+        """Un-record a message ID whose handling failed, so Meta's redelivery is processed"""
+        if not message_id:
+            return
+        self._entries.pop(message_id, None)
+        if self.persist:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._forget_in_database, message_id)
+            except Exception as e:
+                logger.error("Dedup store error: %s", e)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current memory footprint"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "persisted_hits": self.persisted_hits,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,183 @@
+"""
+Content-addressed cache for AI feedback.
+Many users send near-identical short answers to the same question, so
+feedback is keyed by question, language and a hash of the normalized answer.
+An in-memory LRU sits in front of the feedback_cache table. Hits on either
+tier are counted and written back with each flush, so last_hit_at tracks
+real use and pruning drops the least recently used rows.
+"""
+import hashlib
+import logging
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import FeedbackCacheEntry, Language
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_answer(text: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def cache_key(question_id: int, language: Language, response_text: str) -> str:
+    """sha256 of question id, language and normalized answer"""
+    payload = f"{question_id}\x1f{language.value}\x1f{normalize_answer(response_text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# (feedback, score)
+CachedFeedback = Tuple[str, Optional[int]]
+
+_entries = FeedbackCacheEntry.__table__
+
+_RECORD_HITS = (
+    update(_entries).where(_entries.c.cache_key == bindparam("hit_key")).values(
+        hits=_entries.c.hits + bindparam("new_hits"), last_hit_at=bindparam("hit_at"),
+    )
+)
+
+
+class FeedbackCache:
+    """Two-tier feedback cache with TTL and LRU eviction"""
+
+    def __init__(self, max_entries: int = 50000, ttl_seconds: float = 2592000,
+                 persist: bool = True, max_rows: int = 500000, prune_every: int = 100):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._memory: "OrderedDict[str, Tuple[float, CachedFeedback]]" = OrderedDict()
+        self._pending: Dict[str, dict] = {}  # New entries waiting to be persisted
+        self._pending_hits: Dict[str, int] = {}  # Hit counts (either tier) to record
+        self._flushes = 0
+
+        self.memory_hits = 0
+        self.persisted_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, value: CachedFeedback):
+        self._memory[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _from_memory(self, key: str) -> Optional[CachedFeedback]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _record_hit(self, key: str):
+        if self.persist:
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+
+    async def lookup(self, db: AsyncSession, keys: Iterable[str]) -> Dict[str, CachedFeedback]:
+        """Resolve many keys: memory first, then one query for the rest"""
+        found: Dict[str, CachedFeedback] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self._from_memory(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+                self._record_hit(key)
+                self.memory_hits += 1
+
+        if missing and self.persist:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            rows = await db.execute(
+                select(FeedbackCacheEntry.cache_key, FeedbackCacheEntry.ai_feedback,
+                       FeedbackCacheEntry.score)
+                .where(FeedbackCacheEntry.cache_key.in_(missing),
+                       FeedbackCacheEntry.created_at >= cutoff)
+            )
+            for key, feedback, score in rows:
+                found[key] = (feedback, score)
+                self._remember(key, (feedback, score))
+                self._record_hit(key)
+                self.persisted_hits += 1
+
+        self.misses += sum(1 for key in missing if key not in found)
+        return found
+
+    def put(self, key: str, question_id: int, language: Language, feedback: str, score: Optional[int]):
+        """Store fresh feedback; persisted on the next flush"""
+        self._remember(key, (feedback, score))
+        if self.persist:
+            now = datetime.utcnow()
+            self._pending[key] = {
+                "cache_key": key, "question_id": question_id, "language": language,
+                "ai_feedback": feedback, "score": score, "hits": 0,
+                "created_at": now, "last_hit_at": now,
+            }
+
+    async def flush(self, db: AsyncSession):
+        """Persist new entries and hit counts in the caller's transaction"""
+        if not self.persist or not (self._pending or self._pending_hits):
+            return
+        pending, self._pending = self._pending, {}
+        pending_hits, self._pending_hits = self._pending_hits, {}
+
+        if pending:
+            dialect = (await db.connection()).dialect.name
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            await db.execute(
+                insert(FeedbackCacheEntry).on_conflict_do_nothing(index_elements=["cache_key"]),
+                list(pending.values())
+            )
+        if pending_hits:
+            now = datetime.utcnow()
+            await db.execute(_RECORD_HITS, [
+                {"hit_key": key, "new_hits": hits, "hit_at": now} for key, hits in pending_hits.items()
+            ])
+
+        self._flushes += 1
+        if self._flushes % self.prune_every == 0:
+            await self.prune(db)
+
+    async def prune(self, db: AsyncSession):
+        """Drop expired rows, then the least recently used beyond max_rows"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+        await db.execute(delete(FeedbackCacheEntry).where(FeedbackCacheEntry.created_at < cutoff))
+        oldest_kept = await db.execute(
+            select(FeedbackCacheEntry.last_hit_at)
+            .order_by(FeedbackCacheEntry.last_hit_at.desc())
+            .offset(self.max_rows).limit(1)
+        )
+        threshold = oldest_kept.scalar()
+        if threshold is not None:
+            await db.execute(delete(FeedbackCacheEntry).where(FeedbackCacheEntry.last_hit_at <= threshold))
+
+    def stats(self) -> dict:
+        """Hit ratio and LLM calls saved"""
+        hits = self.memory_hits + self.persisted_hits
+        lookups = hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "persisted_hits": self.persisted_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "saved_calls": hits,
+        }
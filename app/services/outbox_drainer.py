@@ -0,0 +1,216 @@
+"""
+Outbox drain loop.
+Claims pending outbox rows in batches, sends each batch concurrently through
+the pooled WhatsApp sender (its token bucket paces the requests) and records
+every outcome with one bulk UPDATE. Retries go back through the table with
+exponential backoff instead of being held in memory. A 429 pauses claiming
+for Retry-After (or a growing backoff) and puts the throttled rows back
+without counting an attempt, so rate limiting turns into rows waiting in
+the outbox rather than failed sends. Several processes can drain at once;
+a claim is a conditional UPDATE, so each row goes to one of them.
+"""
+import asyncio
+import json
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.core.logs import masked
+from app.database import outbox
+from app.database.database import AsyncSessionLocal, require_async_engine
+from app.services.whatsapp import RETRYABLE_STATUS, SendResult, get_whatsapp_sender
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDrainer:
+    """Background task delivering outbox rows"""
+
+    def __init__(self, session_factory: Optional[Callable] = None, sender=None,
+                 batch_size: int = settings.outbox_batch_size,
+                 poll_interval: float = settings.outbox_poll_seconds,
+                 claim_seconds: float = settings.outbox_claim_seconds,
+                 max_attempts: int = settings.outbox_max_attempts,
+                 retention_days: int = settings.outbox_retention_days,
+                 backoff_base: float = 2.0, backoff_max: float = 600.0):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self._sender = sender
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.claim_seconds = claim_seconds
+        self.max_attempts = max_attempts
+        self.retention_days = retention_days
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._throttled_until = 0.0  # time.monotonic()
+        self._throttle_delay = 0.0
+        self._last_purge = 0.0
+
+        self.batches = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.throttled = 0
+        self.backlog = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    @property
+    def sender(self):
+        return self._sender or get_whatsapp_sender()
+
+    async def start(self):
+        if self.running:
+            return
+        if self.session_factory is None:
+            require_async_engine()  # Raises instead of failing on every cycle
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="outbox-drainer")
+        logger.info("Outbox drainer started (batch %d, poll %.1fs)", self.batch_size, self.poll_interval)
+
+    async def stop(self):
+        """Finish the batch in flight (so its rows aren't sent twice), then stop"""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=self.claim_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("Outbox drainer stopped mid-batch; its rows are retried once their claim expires")
+        self._task = None
+
+    def wake(self):
+        """Drain right away instead of at the next poll (e.g. after queueing messages)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _outcome(self, row, result: SendResult, now: datetime, resume_at: datetime) -> dict:
+        """Column values recording one send result (see outbox.complete)"""
+        outcome = {"row_id": row.id, "new_status": outbox.PENDING, "new_attempts": row.attempts,
+                   "next_at": now, "delivered_at": None, "whatsapp_id": None, "error": result.error}
+        if result.ok:
+            self.sent += 1
+            outcome.update(new_status=outbox.SENT, delivered_at=now, whatsapp_id=result.message_id)
+        elif result.status_code == 429:
+            # Rate limited, not failed: wait with the rest of the backlog and keep the attempt
+            self.throttled += 1
+            outcome.update(new_attempts=row.attempts - 1, next_at=resume_at)
+        elif (result.status_code is None or result.status_code in RETRYABLE_STATUS) \
+                and row.attempts < self.max_attempts:
+            self.retried += 1
+            outcome.update(next_at=now + timedelta(seconds=self._backoff(row.attempts)))
+        else:
+            self.failed += 1
+            outcome.update(new_status=outbox.FAILED)
+            logger.warning("Outbox message %d to %s failed after %d attempts: %s",
+                           row.id, masked(row.recipient), row.attempts, result.error)
+        return outcome
+
+    async def drain_once(self) -> int:
+        """Claim, send and record one batch; returns the number of rows claimed"""
+        async with self.session_factory() as db:
+            rows = await outbox.claim(db, self.batch_size, self.claim_seconds)
+        if not rows:
+            return 0
+
+        sender = self.sender
+        results = [
+            result if isinstance(result, SendResult)
+            else SendResult(to=row.recipient, ok=False, error=f"{type(result).__name__}: {result}")
+            for row, result in zip(rows, await asyncio.gather(*(
+                sender.send_payload(row.recipient, json.loads(row.payload), retries=0) for row in rows
+            ), return_exceptions=True))
+        ]
+
+        throttles = [r.retry_after or 0.0 for r in results if r.status_code == 429]
+        if throttles:
+            self._throttle_delay = min(max(self._throttle_delay * 2, 1.0, *throttles), self.backoff_max)
+            self._throttled_until = time.monotonic() + self._throttle_delay
+            logger.warning("WhatsApp rate limit on %d of %d sends, pausing the outbox for %.1fs",
+                           len(throttles), len(rows), self._throttle_delay)
+        else:
+            self._throttle_delay = 0.0
+
+        now = datetime.utcnow()
+        resume_at = now + timedelta(seconds=self._throttle_delay)
+        async with self.session_factory() as db:
+            await outbox.complete(db, [self._outcome(row, result, now, resume_at)
+                                       for row, result in zip(rows, results)])
+        self.batches += 1
+        return len(rows)
+
+    async def _maintain(self):
+        """Refresh the backlog gauge and, hourly, delete old delivered rows"""
+        async with self.session_factory() as db:
+            self.backlog = await outbox.pending_count(db)
+            if time.monotonic() - self._last_purge > 3600:
+                self._last_purge = time.monotonic()
+                deleted = await outbox.purge(db, datetime.utcnow() - timedelta(days=self.retention_days))
+                if deleted:
+                    logger.info("Purged %d old outbox rows", deleted)
+
+    async def _run(self):
+        while not self._stopping:
+            paused = self._throttled_until - time.monotonic()
+            if paused <= 0:
+                try:
+                    if await self.drain_once() == self.batch_size:
+                        continue  # More may be waiting
+                    await self._maintain()
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Outbox drain cycle failed")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(paused, self.poll_interval))
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_until_idle(self, timeout: Optional[float] = None):
+        """Drain everything that is due now, then return (CLI, CI and benchmarks)"""
+        started = time.monotonic()
+        while timeout is None or time.monotonic() - started < timeout:
+            paused = self._throttled_until - time.monotonic()
+            if paused > 0:
+                await asyncio.sleep(paused)
+            elif not await self.drain_once():
+                return
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "batches": self.batches,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "throttled": self.throttled,
+            "backlog": self.backlog,
+            "paused_seconds": round(max(0.0, self._throttled_until - time.monotonic()), 1),
+        }
+
+
+_drainer: Optional[OutboxDrainer] = None
+
+
+def get_outbox_drainer() -> OutboxDrainer:
+    """Process-wide drainer using the configured batch size and poll interval"""
+    global _drainer
+    if _drainer is None:
+        _drainer = OutboxDrainer()
+    return _drainer
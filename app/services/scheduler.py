@@ -0,0 +1,164 @@
+"""
+Daily question scheduler.
+An APScheduler interval job ticks every dispatch_tick_seconds. Each tick reads
+only the users whose precomputed due time has passed (users are due at their
+local daily_question_hour, spread over dispatch_window_minutes), takes at most
+dispatch_max_per_second * tick of them and queues their questions in the
+outbox, so a crowded local 9 AM turns into a short queue instead of a spike.
+The outbox drainer (outbox_drainer.py) sends them.
+Every uvicorn worker runs its own scheduler: each tick first rebalances the
+dispatch partitions this process holds (see partitions.py) and only
+dispatches those, so workers never queue the same user a question and the
+dispatch rate grows with the number of workers (the limit is per process).
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from sqlalchemy import and_, func
+
+from app.core.config import settings
+from app.core.metrics import db_operation
+from app.database.database import SessionLocal
+from app.database.dispatch import DispatchReport, dispatch_due_questions
+from app.database.models import User
+from app.database.partitions import PartitionLeases
+from app.database.schedule import schedule_missing
+from app.services.outbox_drainer import get_outbox_drainer
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionScheduler:
+    """Ticks on an AsyncIOScheduler and queues due questions at a bounded rate"""
+
+    def __init__(self, session_factory: Callable = SessionLocal,
+                 tick_seconds: int = settings.dispatch_tick_seconds,
+                 max_per_second: float = settings.dispatch_max_per_second,
+                 partitions: Optional[PartitionLeases] = None):
+        self.session_factory = session_factory
+        self.tick_seconds = tick_seconds
+        self.max_per_second = max_per_second
+        self.partitions = partitions or PartitionLeases()
+        self._scheduler: Optional[AsyncIOScheduler] = None
+        self.ticks = 0
+        self.queued = 0
+        self.backlog = 0
+        self.last_tick: Optional[dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self._scheduler is not None
+
+    @property
+    def budget(self) -> int:
+        """Most users a single tick may dispatch"""
+        return max(1, int(self.max_per_second * self.tick_seconds))
+
+    async def start(self):
+        """Start ticking right away, then every tick_seconds"""
+        if self.running:
+            return
+        self._scheduler = AsyncIOScheduler(timezone="UTC")
+        self._scheduler.add_job(
+            self.tick, "interval", seconds=self.tick_seconds, id="dispatch-due-questions",
+            next_run_time=datetime.now(timezone.utc), max_instances=1, coalesce=True,
+        )
+        self._scheduler.start()
+        logger.info("Question scheduler started (tick=%ds, max %.1f sends/s)",
+                    self.tick_seconds, self.max_per_second)
+
+    async def stop(self):
+        if self.running:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+            await asyncio.to_thread(self._release)
+
+    def _release(self):
+        db = self.session_factory()
+        try:
+            self.partitions.release_all(db)
+        finally:
+            db.close()
+
+    def _dispatch(self, now: datetime) -> DispatchReport:
+        """Sync part of a tick: claim partitions, schedule new users, assign and queue due questions"""
+        report = DispatchReport()
+        db = self.session_factory()
+        try:
+            with db_operation("scheduler.rebalance"):
+                held = self.partitions.rebalance(db)
+            schedule_missing(db, now, partitions=held)
+
+            # The tick budget is split over the held partitions, starting at a different one every
+            # tick; what a partition leaves unused goes to the ones after it
+            budget = self.budget
+            start = self.ticks % len(held) if held else 0
+            for index, partition in enumerate(held[start:] + held[:start]):
+                if budget <= 0:
+                    break
+                share = math.ceil(budget / (len(held) - index))
+                part = dispatch_due_questions(db, limit=share, now=now, partition=partition,
+                                              fence=self.partitions.fence(partition))
+                budget -= part.users
+                report.users += part.users
+                report.assigned += part.assigned
+                report.skipped += part.skipped
+                report.chunks += part.chunks
+                for phase, seconds in part.timings.items():
+                    report.timings[phase] += seconds
+            with db_operation("scheduler.backlog"):
+                self.backlog = db.query(func.count(User.id)).filter(and_(
+                    User.is_active == True, User.next_question_due_at <= now
+                )).scalar()
+            return report
+        finally:
+            db.close()
+
+    async def tick(self):
+        """One scheduler tick"""
+        started = time.perf_counter()
+        report = await asyncio.to_thread(self._dispatch, datetime.utcnow())
+        self.ticks += 1
+        self.queued += report.assigned
+        if report.assigned:
+            get_outbox_drainer().wake()
+        self.last_tick = {
+            "users": report.users,
+            "assigned": report.assigned,
+            "skipped": report.skipped,
+            "backlog": self.backlog,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        if report.users:
+            logger.info("Scheduler tick: %d due users, %d queued, %d still due",
+                        report.users, report.assigned, self.backlog)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "tick_seconds": self.tick_seconds,
+            "max_per_second": self.max_per_second,
+            "ticks": self.ticks,
+            "queued": self.queued,
+            "backlog": self.backlog,
+            "worker": self.partitions.owner,
+            "workers": self.partitions.workers,
+            "partitions": sorted(self.partitions.held),
+            "last_tick": self.last_tick,
+        }
+
+
+_scheduler: Optional[QuestionScheduler] = None
+
+
+def get_question_scheduler() -> QuestionScheduler:
+    """Process-wide scheduler using the configured tick and rate"""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = QuestionScheduler()
+    return _scheduler
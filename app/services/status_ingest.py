@@ -0,0 +1,168 @@
+"""
+Fast path for WhatsApp delivery status callbacks.
+Status callbacks ("sent", "delivered", "read", "failed") outnumber user
+messages about 3 to 1 and need no per-event work, so the webhook endpoint
+hands them here instead of to the webhook queue. They are coalesced in
+memory to one row per message ID and written every status_flush_ms with a
+single bulk upsert (see app/database/message_status.py).
+A crash loses at most one flush interval of statuses, which only costs
+some precision in the delivery and read rates.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from app.core.config import settings
+from app.database import message_status
+from app.database.database import AsyncSessionLocal, require_async_engine
+from app.services.webhook_decoder import StatusEvent
+
+logger = logging.getLogger(__name__)
+
+
+class StatusIngestor:
+    """In-memory buffer of status callbacks flushed to message_statuses on a timer"""
+
+    def __init__(self, session_factory: Optional[Callable] = None,
+                 flush_ms: int = settings.status_flush_ms,
+                 max_pending: int = settings.status_max_pending,
+                 retention_days: int = settings.status_retention_days):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.flush_ms = flush_ms
+        self.max_pending = max_pending
+        self.retention_days = retention_days
+        self._pending: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._last_purge = 0.0
+
+        self.received = 0
+        self.coalesced = 0
+        self.ignored = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.written = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def depth(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        if self.running:
+            return
+        if self.session_factory is None:
+            require_async_engine()  # Raises instead of failing on every cycle
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="status-ingestor")
+        logger.info("Status ingestor started (flush every %d ms)", self.flush_ms)
+
+    async def stop(self):
+        """Stop the timer and write what is buffered"""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._task
+        self._task = None
+
+    def add(self, statuses: Iterable[StatusEvent]) -> bool:
+        """
+        Buffer status callbacks. Returns False, buffering nothing, while the
+        buffer is full (the database is down or too slow) so the caller can
+        ask Meta to redeliver.
+        """
+        if len(self._pending) >= self.max_pending:
+            self.rejected += 1
+            self._flush_soon()
+            return False
+        for status in statuses:
+            row = message_status.status_row(status.message_id, status.status, status.timestamp,
+                                            status.recipient_id, status.error)
+            if row is None:
+                self.ignored += 1
+                continue
+            self.received += 1
+            if message_status.merge(self._pending, row):
+                self.coalesced += 1
+        if len(self._pending) >= self.max_pending // 2:
+            self._flush_soon()
+        return True
+
+    def _flush_soon(self):
+        """Flush now rather than at the next timer tick"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Write the buffered rows; on failure they go back into the buffer"""
+        if not self._pending:
+            return 0
+        rows, self._pending = self._pending, {}
+        started = time.perf_counter()
+        try:
+            async with self.session_factory() as db:
+                written = await message_status.upsert(db, rows.values())
+        except Exception:
+            self.flush_errors += 1
+            for row in rows.values():
+                message_status.merge(self._pending, row)  # Callbacks that arrived meanwhile stay merged
+            raise
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.written += written
+        self.last_flush_ms = round(elapsed_ms, 3)
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        return written
+
+    async def _purge(self):
+        """Hourly, delete rows older than the retention"""
+        if time.monotonic() - self._last_purge < 3600:
+            return
+        self._last_purge = time.monotonic()
+        async with self.session_factory() as db:
+            deleted = await message_status.purge(db, datetime.utcnow() - timedelta(days=self.retention_days))
+        if deleted:
+            logger.info("Purged %d old message statuses", deleted)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+                await self._purge()
+            except Exception:
+                logger.exception("Status flush failed, %d messages kept for the next one", self.depth())
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Final status flush failed, %d messages dropped", self.depth())
+
+    def metrics(self) -> dict:
+        """Buffer size, counters and flush timings"""
+        return {
+            "pending": self.depth(),
+            "max_pending": self.max_pending,
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "ignored": self.ignored,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "written": self.written,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+        }
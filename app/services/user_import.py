@@ -0,0 +1,333 @@
+"""
+Bulk user import.
+This streams CSV or NDJSON rows, validates them in chunks and upserts them
+on whatsapp_number with one multi-row INSERT ... ON CONFLICT per chunk.
+Memory use depends on the chunk size, not on the size of the file.
+"""
+import codecs
+import csv
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from sqlalchemy import case, null
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.database.models import User, TechArea, Language
+from app.database.schedule import is_valid_timezone
+from app.database.user_state import user_states
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "ndjson")
+TRUE_VALUES = {"1", "true", "yes", "y", "sim", "si"}
+MAX_RECORD_LINES = 50  # Longest multi-line CSV record; past this an open quote is a stray
+
+
+def normalize_number(value: str) -> str:
+    """WhatsApp number as stored and looked up: "+" and digits only (raises ValueError without digits)"""
+    digits = "".join(ch for ch in value if ch.isdigit())
+    if not digits:
+        raise ValueError("WhatsApp number must contain digits")
+    return f"+{digits}"
+
+
+class UserImportRow(BaseModel):
+    """One row of an import file"""
+    whatsapp_number: str = Field(..., min_length=8, max_length=20)
+    name: str = Field(..., min_length=1)
+    preferred_language: Language
+    tech_area: TechArea
+    agreed_to_messages: bool
+    timezone: str = Field(default_factory=lambda: settings.default_timezone)
+
+    @field_validator("whatsapp_number")
+    @classmethod
+    def normalize_number(cls, value: str) -> str:
+        return normalize_number(value)
+
+    @field_validator("timezone", mode="before")
+    @classmethod
+    def known_timezone(cls, value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return settings.default_timezone
+        if not is_valid_timezone(str(value).strip()):
+            raise ValueError(f"Unknown timezone: {value}")
+        return str(value).strip()
+
+    @field_validator("agreed_to_messages", mode="before")
+    @classmethod
+    def parse_consent(cls, value):
+        if isinstance(value, str):
+            return value.strip().lower() in TRUE_VALUES
+        return value
+
+
+@dataclass
+class ImportReport:
+    """Summary of an import; only the first max_errors row errors are kept"""
+    rows: int = 0
+    upserted: int = 0
+    failed: int = 0
+    chunks: int = 0
+    errors: List[Dict] = field(default_factory=list)
+    max_errors: int = 1000
+
+    def add_error(self, row: int, error: str):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": error})
+
+    def as_dict(self) -> dict:
+        return {
+            "rows": self.rows,
+            "upserted": self.upserted,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+class RowParser:
+    """
+    Turns text lines into (row_number, raw dict) pairs for one format.
+    A CSV record is complete when csv.reader can read it from the buffered
+    lines without asking for more, so a quoted field may span lines; the row
+    number is the line the record starts on. A quote that is still open after
+    MAX_RECORD_LINES lines is taken to be a stray: its first line becomes a
+    row error and the lines after it are read again as records of their own.
+    """
+
+    def __init__(self, fmt: str):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.fmt = fmt
+        self.header: Optional[List[str]] = None
+        self.line_number = 0
+        self._lines: List[str] = []  # Lines of the CSV record being read
+        self._start = 0  # Line number the buffered record starts on
+
+    def parse(self, line: str) -> List[Tuple[int, object]]:
+        """Parse one line; returns the rows it completes (none for headers, blank lines and unfinished CSV records)"""
+        self.line_number += 1
+        line = line.rstrip("\r\n")
+        if self.fmt == "ndjson":
+            if not line.strip():
+                return []
+            try:
+                return [(self.line_number, json.loads(line))]
+            except ValueError as e:
+                return [(self.line_number, ValueError(f"Invalid JSON: {e}"))]
+        return self._feed(self.line_number, line)
+
+    def finish(self) -> List[Tuple[int, object]]:
+        """Call at the end of the input: the rows of a CSV record left open by a stray quote"""
+        rows = []
+        while self._lines:
+            rows.extend(self._resync("Unterminated quoted field"))
+        return rows
+
+    def _feed(self, line_number: int, line: str) -> List[Tuple[int, object]]:
+        if not self._lines:
+            if not line.strip():
+                return []
+            self._start = line_number
+        self._lines.append(line + "\n")
+        try:
+            values = self._read()
+        except csv.Error as e:  # e.g. a field over csv.field_size_limit()
+            return self._resync(str(e))
+        if values is not None:
+            return self._record(values)
+        if len(self._lines) >= MAX_RECORD_LINES:
+            return self._resync(f"Unterminated quoted field (no closing quote within {MAX_RECORD_LINES} lines)")
+        return []  # Inside a quoted field, which continues on the next line
+
+    def _read(self) -> Optional[List[str]]:
+        """Values of the buffered record, or None while a quoted field is still open"""
+        wanted_more = []
+
+        def lines():
+            yield from self._lines
+            wanted_more.append(True)
+
+        values = next(csv.reader(lines()), [])
+        return None if wanted_more else values
+
+    def _resync(self, error: str) -> List[Tuple[int, object]]:
+        """Report the buffered record's first line and read the lines after it again"""
+        start, lines = self._start, self._lines[1:]
+        self._lines = []
+        rows = [(start, ValueError(error))]
+        for line_number, line in enumerate(lines, start + 1):
+            rows.extend(self._feed(line_number, line.rstrip("\n")))
+        return rows
+
+    def _record(self, values: List[str]) -> List[Tuple[int, object]]:
+        row_number = self._start
+        self._lines = []
+        if self.header is None:
+            self.header = [name.strip().lower() for name in values]
+            return []
+        if len(values) != len(self.header):
+            return [(row_number, ValueError(
+                f"Expected {len(self.header)} columns, got {len(values)}"))]
+        return [(row_number, dict(zip(self.header, values)))]
+
+
+def validate_chunk(raw_rows: List[Tuple[int, object]],
+                   report: ImportReport) -> Dict[str, Tuple[int, dict]]:
+    """Validate raw rows; returns {number: (row_number, upsert values)} and records errors"""
+    values: Dict[str, Tuple[int, dict]] = {}
+    for row_number, raw in raw_rows:
+        report.rows += 1
+        if isinstance(raw, Exception):
+            report.add_error(row_number, str(raw))
+            continue
+        if not isinstance(raw, dict):
+            report.add_error(row_number, "Row must be an object")
+            continue
+        try:
+            row = UserImportRow(**raw)
+        except ValidationError as e:
+            report.add_error(row_number, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()))
+            continue
+        if not row.agreed_to_messages:
+            report.add_error(row_number, "User must agree to receive messages")
+            continue
+        # Last occurrence wins when a number repeats inside a chunk
+        values[row.whatsapp_number] = (row_number, {
+            "whatsapp_number": row.whatsapp_number,
+            "name": row.name,
+            "preferred_language": row.preferred_language,
+            "tech_area": row.tech_area,
+            "timezone": row.timezone,
+            "is_active": True,
+        })
+    return values
+
+
+def upsert_statement(dialect_name: str):
+    """INSERT ... ON CONFLICT (whatsapp_number) DO UPDATE for the dialect"""
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(User)
+    # is_active is left alone on conflict so re-imports don't undo a STOP
+    return stmt.on_conflict_do_update(
+        index_elements=[User.whatsapp_number],
+        set_={
+            "name": stmt.excluded.name,
+            "preferred_language": stmt.excluded.preferred_language,
+            "tech_area": stmt.excluded.tech_area,
+            "timezone": stmt.excluded.timezone,
+            # A new timezone means a new local send time; the scheduler recomputes it
+            "next_question_due_at": case(
+                (User.timezone != stmt.excluded.timezone, null()),
+                else_=User.next_question_due_at,
+            ),
+        },
+    )
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parsed(lines: Iterable[str], parser: RowParser) -> Iterator[Tuple[int, object]]:
+    for line in lines:
+        yield from parser.parse(line)
+    yield from parser.finish()
+
+
+def import_users(db: Session, lines: Iterable[str], fmt: str = "csv",
+                 chunk_size: int = 1000) -> ImportReport:
+    """Import users from text lines (e.g. an open file) with a sync session"""
+    report = ImportReport()
+    stmt = upsert_statement(db.get_bind().dialect.name)
+    for raw_rows in _chunks(_parsed(lines, RowParser(fmt)), chunk_size):
+        report.chunks += 1
+        values = validate_chunk(raw_rows, report)
+        if not values:
+            continue
+        try:
+            db.execute(stmt, [row for _, row in values.values()])
+            db.commit()
+            _invalidate_states(values)
+            report.upserted += len(values)
+        except SQLAlchemyError as e:
+            db.rollback()
+            _chunk_failed(report, values, e)
+    return report
+
+
+def _invalidate_states(values: Dict[str, Tuple[int, dict]]):
+    """Upserted numbers may be cached with old details (or as unknown)"""
+    for number in values:
+        user_states.invalidate(number)
+
+
+def _chunk_failed(report: ImportReport, values: Dict[str, Tuple[int, dict]], error: Exception):
+    logger.error("Import chunk %d failed: %s", report.chunks, error)
+    for row_number, _ in values.values():
+        report.add_error(row_number, "Database error while saving chunk")
+
+
+async def aiter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream into text lines without buffering the whole body"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def import_users_async(db: AsyncSession, chunks: AsyncIterator[bytes], fmt: str = "csv",
+                             chunk_size: int = 1000) -> ImportReport:
+    """Import users from a streamed request body with an async session"""
+    report = ImportReport()
+    stmt = upsert_statement((await db.connection()).dialect.name)
+    parser = RowParser(fmt)
+    raw_rows = []
+
+    async def flush():
+        report.chunks += 1
+        values = validate_chunk(raw_rows, report)
+        raw_rows.clear()
+        if not values:
+            return
+        try:
+            await db.execute(stmt, [row for _, row in values.values()])
+            await db.commit()
+            _invalidate_states(values)
+            report.upserted += len(values)
+        except SQLAlchemyError as e:
+            await db.rollback()
+            _chunk_failed(report, values, e)
+
+    async for line in aiter_lines(chunks):
+        raw_rows.extend(parser.parse(line))
+        if len(raw_rows) >= chunk_size:
+            await flush()
+    raw_rows.extend(parser.finish())
+    if raw_rows:
+        await flush()
+    return report
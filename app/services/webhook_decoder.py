@@ -0,0 +1,114 @@
+"""
+Decoder for Meta webhook payloads.
+The raw request body is read once: the X-Hub-Signature-256 HMAC is checked
+over that buffer and the same bytes go to the JSON parser (orjson when
+installed, which parses bytes without decoding them to str first). Only the
+fields the bot routes on are kept, in slotted event objects, so the payload
+dict is dropped as soon as it is decoded and queued work stays small.
+"""
+import hashlib
+import hmac
+import json
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # Optional: the stdlib parser is slower but equivalent
+    orjson = None
+    _loads = json.loads
+
+MEDIA_TYPES = ("audio", "image", "video", "document", "sticker")
+
+
+class WebhookDecodeError(ValueError):
+    """Raised for a body that isn't a Meta webhook payload (the message is the HTTP 400 detail)"""
+
+
+@dataclass(slots=True)
+class InboundMessage:
+    """A user message: text, button reply or media"""
+    message_id: Optional[str]
+    sender: str  # wa_id, without the +
+    type: str
+    timestamp: Optional[str] = None
+    text: Optional[str] = None
+    media_id: Optional[str] = None
+
+
+@dataclass(slots=True)
+class StatusEvent:
+    """A delivery status callback for an outbound message"""
+    message_id: Optional[str]
+    status: Optional[str]
+    timestamp: Optional[str] = None
+    recipient_id: Optional[str] = None
+    error: Optional[str] = None  # "code: title" of the first error, for failed messages
+
+
+@dataclass(slots=True)
+class WebhookBatch:
+    """The events of one webhook payload"""
+    messages: List[InboundMessage] = field(default_factory=list)
+    statuses: List[StatusEvent] = field(default_factory=list)
+
+
+def verify_signature(body: bytes, header: Optional[str], secret: str) -> bool:
+    """Check Meta's X-Hub-Signature-256 header ("sha256=<hex HMAC of the body>")"""
+    if not header or not header.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, header[7:])
+
+
+def _message(message: dict) -> InboundMessage:
+    kind = message.get("type")
+    kind = kind if isinstance(kind, str) else ""
+    event = InboundMessage(message_id=message.get("id"), sender=message.get("from") or "",
+                           type=kind, timestamp=message.get("timestamp"))
+    content = message.get(kind)
+    if not isinstance(content, dict):
+        return event
+    if kind == "text":
+        event.text = content.get("body")
+    elif kind == "button":
+        event.text = content.get("text")
+    elif kind in MEDIA_TYPES:
+        event.media_id = content.get("id")
+    return event
+
+
+def _status(status: dict) -> StatusEvent:
+    event = StatusEvent(message_id=status.get("id"), status=status.get("status"),
+                        timestamp=status.get("timestamp"), recipient_id=status.get("recipient_id"))
+    errors = status.get("errors")
+    if errors and isinstance(errors, list) and isinstance(errors[0], dict):
+        event.error = f"{errors[0].get('code')}: {errors[0].get('title')}"
+    return event
+
+
+def decode(body: bytes) -> WebhookBatch:
+    """Events of a raw webhook body; malformed entries, changes and items are skipped"""
+    try:
+        payload = _loads(body)
+    except ValueError:  # orjson.JSONDecodeError and json.JSONDecodeError are both ValueErrors
+        raise WebhookDecodeError("Invalid JSON payload")
+    if not isinstance(payload, dict) or not isinstance(payload.get("entry"), list):
+        raise WebhookDecodeError("Invalid webhook payload")
+
+    batch = WebhookBatch()
+    for entry in payload["entry"]:
+        changes = entry.get("changes") if isinstance(entry, dict) else None
+        for change in changes if isinstance(changes, list) else ():
+            value = change.get("value") if isinstance(change, dict) else None
+            if not isinstance(value, dict):
+                continue
+            messages, statuses = value.get("messages"), value.get("statuses")
+            for message in messages if isinstance(messages, list) else ():
+                if isinstance(message, dict):
+                    batch.messages.append(_message(message))
+            for status in statuses if isinstance(statuses, list) else ():
+                if isinstance(status, dict):
+                    batch.statuses.append(_status(status))
+    return batch
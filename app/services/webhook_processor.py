@@ -0,0 +1,92 @@
+"""
+Processing of queued WhatsApp webhook payloads.
+This runs inside the webhook queue workers, off the request path.
+"""
+import logging
+from typing import List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logs import masked
+from app.database.database import AsyncSessionLocal
+from app.database.user_state import UserState, user_states
+from app.services.audio import AudioError, get_audio_pipeline
+from app.services.dedup import MessageDeduplicator
+from app.services.webhook_decoder import InboundMessage
+from app.services.whatsapp import MediaTooLarge
+
+logger = logging.getLogger(__name__)
+
+# WhatsApp redelivers webhooks, so every message ID is checked once here
+deduplicator = MessageDeduplicator(
+    max_entries=settings.webhook_dedup_max_entries,
+    ttl_seconds=settings.webhook_dedup_ttl_seconds,
+    persist=settings.webhook_dedup_persist
+)
+
+async def process_messages(messages: List[InboundMessage]):
+    """Handle the messages of one webhook payload taken from the queue"""
+    for message in messages:
+        if await deduplicator.is_duplicate(message.message_id):
+            logger.debug("Skipping duplicate message %s", message.message_id)
+            continue
+        try:
+            await process_message(message)
+        except Exception:
+            # The payload was acknowledged before it was queued, so Meta won't retry it:
+            # log and move on to the rest of the payload. Forgetting the id means a later
+            # redelivery of this message, if one ever comes, is handled rather than skipped.
+            logger.exception("Processing message %s failed", message.message_id)
+            await deduplicator.forget(message.message_id)
+
+
+async def process_message(message: InboundMessage):
+    """Handle one new (not redelivered) message"""
+    logger.info("Processing message %s from %s", message.message_id, masked(message.sender))
+
+    state = await lookup_sender(message.sender)
+    if state is None or not state.is_active:
+        logger.info("Ignoring message %s from an unregistered or inactive number",
+                    message.message_id)
+        return
+
+    text = message.text
+    if message.type == "audio":
+        text = await transcribe_voice_note(message, state.preferred_language.value)
+        if text is None:
+            return
+
+    # TODO: Process incoming messages
+    # - Handle STOP command for unsubscription
+    # - Process user responses to questions
+    # - Send to AI for analysis
+
+
+async def lookup_sender(wa_id: str) -> Optional[UserState]:
+    """Cached routing state of the sender (WhatsApp sends numbers without the +)"""
+    number = wa_id if wa_id.startswith("+") else f"+{wa_id}"
+    async with AsyncSessionLocal() as db:
+        return await user_states.aget(db, number)
+
+
+async def transcribe_voice_note(message: InboundMessage, language: Optional[str] = None) -> Optional[str]:
+    """Transcript of a voice note message, or None when it can't be transcribed"""
+    if not settings.audio_transcription_enabled:
+        logger.info("Voice note %s received but transcription is disabled", message.message_id)
+        return None
+    if not message.media_id:
+        logger.warning("Voice note %s has no media id", message.message_id)
+        return None
+    try:
+        result = await get_audio_pipeline().transcribe_media(message.media_id, language)
+    except (AudioError, MediaTooLarge, httpx.HTTPError) as e:
+        logger.warning("Could not transcribe voice note %s: %s", message.message_id, e)
+        return None
+    except Exception:
+        # A broken worker pool, a malformed media response or a timeout: skip this note, not the payload
+        logger.exception("Transcribing voice note %s failed", message.message_id)
+        return None
+    logger.info("Transcribed voice note %s (%.1fs of audio) in %.0f ms", message.message_id,
+                result.duration, result.timings["total"] * 1000)
+    return result.text
@@ -0,0 +1,124 @@
+"""
+In-process work queue for incoming webhooks.
+The webhook endpoint only enqueues payloads; a pool of worker tasks
+drains the queue so Meta gets its 200 response immediately.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Optional
+
+from app.core.logs import request_id
+from app.core.metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Any], Awaitable[None]]
+
+
+class WebhookQueue:
+    """Bounded asyncio queue with a fixed pool of worker tasks"""
+
+    def __init__(self, handler: Handler, maxsize: int = 10000, workers: int = 4,
+                 enqueue_timeout: float = 0.05, sample_size: int = 1000):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.workers = workers
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._wait_samples: Deque[float] = deque(maxlen=sample_size)
+        self._handle_samples: Deque[float] = deque(maxlen=sample_size)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Create the queue and spawn the workers"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"webhook-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Webhook queue started with %d workers (maxsize=%d)",
+                    self.workers, self.maxsize)
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Let the workers finish queued payloads, then cancel them"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Webhook queue stopped with %d payloads pending", self.depth())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def put(self, payload: Any) -> bool:
+        """
+        Enqueue a payload, waiting at most enqueue_timeout for a free slot.
+        Returns False when the queue stays full so the caller can push back.
+        """
+        item = (time.perf_counter(), request_id.get(), payload)
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(item), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+        self.enqueued += 1
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            enqueued_at, rid, payload = await self._queue.get()
+            started = time.perf_counter()
+            self._wait_samples.append(started - enqueued_at)
+            token = request_id.set(rid)  # Log records of the payload carry its request's ID
+            try:
+                await self.handler(payload)
+                self.processed += 1
+            except Exception:
+                self.failed += 1
+                logger.exception("Webhook worker %d failed to process payload", index)
+            finally:
+                request_id.reset(token)
+                self._handle_samples.append(time.perf_counter() - started)
+                self._queue.task_done()
+
+    def metrics(self) -> dict:
+        """Queue depth, counters and recent latency percentiles"""
+        return {
+            "depth": self.depth(),
+            "maxsize": self.maxsize,
+            "workers": self.workers,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "queue_wait_ms": {
+                "p50": percentile(self._wait_samples, 50),
+                "p95": percentile(self._wait_samples, 95),
+                "p99": percentile(self._wait_samples, 99),
+            },
+            "processing_ms": {
+                "p50": percentile(self._handle_samples, 50),
+                "p95": percentile(self._handle_samples, 95),
+                "p99": percentile(self._handle_samples, 99),
+            },
+        }
@@ -0,0 +1,288 @@
+"""
+Outbound WhatsApp Cloud API client.
+This sends messages over a single pooled HTTP/2 connection with bounded
+concurrency, a token-bucket rate limit and retries with exponential backoff.
+"""
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterable, List, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.core.logs import masked
+from app.core.metrics import observe_outbound, outbound_call
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _seconds(retry_after: Optional[str]) -> Optional[float]:
+    """Retry-After header in seconds (the HTTP-date form is ignored)"""
+    try:
+        return float(retry_after) if retry_after else None
+    except ValueError:
+        return None
+
+
+def _message_id(response: httpx.Response) -> Optional[str]:
+    """ID of the sent message, None if a 2xx body isn't the expected JSON (the send still succeeded)"""
+    try:
+        messages = response.json().get("messages") or [{}]
+        return messages[0].get("id")
+    except (ValueError, AttributeError, IndexError, TypeError):
+        logger.warning("Unexpected WhatsApp response body: %s", response.text[:200])
+        return None
+
+
+class TokenBucket:
+    """Async token bucket: refills `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class SendResult:
+    """Outcome of a single outbound message"""
+    to: str
+    ok: bool
+    status_code: Optional[int] = None
+    message_id: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    retry_after: Optional[float] = None  # Seconds, from the last response's Retry-After
+
+
+@dataclass
+class BatchReport:
+    """Outcome of a batch of outbound messages"""
+    sent: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    failures: List[SendResult] = field(default_factory=list)
+
+
+@dataclass
+class MediaInfo:
+    """Metadata of a downloaded media object"""
+    media_id: str
+    mime_type: str
+    declared_size: Optional[int] = None
+    size: int = 0
+
+
+class MediaTooLarge(Exception):
+    """Raised when a media download goes over its size limit"""
+
+
+class WhatsAppSender:
+    """
+    Reusable async sender for the WhatsApp Cloud API.
+    Use it as an async context manager, or call start() / close() explicitly.
+    """
+
+    def __init__(
+        self,
+        access_token: str = settings.whatsapp_access_token,
+        phone_number_id: str = settings.whatsapp_phone_number_id,
+        base_url: str = settings.whatsapp_api_url,
+        max_concurrency: int = settings.whatsapp_max_concurrency,
+        rate_limit_per_second: float = settings.whatsapp_rate_limit_per_second,
+        max_retries: int = settings.whatsapp_max_retries,
+        timeout: float = settings.whatsapp_request_timeout,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.phone_number_id = phone_number_id
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._headers = {"Authorization": f"Bearer {access_token}"}
+        self._timeout = timeout
+        self._http2 = http2
+        self._transport = transport
+        self._bucket = TokenBucket(rate_limit_per_second)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        """Open the pooled HTTP client"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self._headers,
+                http2=self._http2,
+                timeout=self._timeout,
+                transport=self._transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=60.0,
+                ),
+            )
+
+    async def close(self):
+        """Close the pooled HTTP client"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Delay before the next attempt, honouring Retry-After when present"""
+        seconds = _seconds(retry_after)
+        if seconds is not None:
+            return min(seconds, self.backoff_max)
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)  # Jitter spreads retries out
+
+    async def send_payload(self, to: str, payload: dict, retries: Optional[int] = None) -> SendResult:
+        """
+        Send a raw message payload, retrying on 429 / 5xx and network errors.
+        retries overrides max_retries (the outbox drain loop retries through the table instead,
+        and logs the failures itself).
+        """
+        await self.start()
+        level = logging.WARNING if retries is None else logging.DEBUG
+        retries = self.max_retries if retries is None else retries
+        body = {"messaging_product": "whatsapp", "to": to, **payload}
+        result = SendResult(to=to, ok=False)
+
+        async with self._semaphore:
+            for attempt in range(retries + 1):
+                await self._bucket.acquire()
+                result.attempts = attempt + 1
+                retry_after = None
+                started = time.perf_counter()
+                try:
+                    response = await self._client.post(f"/{self.phone_number_id}/messages", json=body)
+                except httpx.TransportError as e:
+                    observe_outbound("whatsapp", time.perf_counter() - started, type(e).__name__)
+                    result.status_code = None
+                    result.error = f"{type(e).__name__}: {e}"
+                else:
+                    observe_outbound("whatsapp", time.perf_counter() - started,
+                                     None if response.is_success else str(response.status_code))
+                    result.status_code = response.status_code
+                    if response.is_success:
+                        result.ok = True
+                        result.error = None
+                        result.message_id = _message_id(response)
+                        return result
+                    result.error = response.text[:200]
+                    if response.status_code not in RETRYABLE_STATUS:
+                        break
+                    retry_after = response.headers.get("Retry-After")
+                    result.retry_after = _seconds(retry_after)
+
+                if attempt < retries:
+                    await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        logger.log(level, "WhatsApp send to %s failed after %d attempts: %s",
+                   masked(to), result.attempts, result.error)
+        return result
+
+    async def download_media(self, media_id: str, sink: BinaryIO, chunk_size: int = 65536,
+                             max_bytes: Optional[int] = None) -> MediaInfo:
+        """
+        Stream an inbound media object (e.g. a voice note) into sink in chunks.
+        Raises MediaTooLarge once more than max_bytes have arrived.
+        """
+        await self.start()
+        with outbound_call("whatsapp_media"):
+            response = await self._client.get(f"/{media_id}")
+            response.raise_for_status()
+            meta = response.json()
+            info = MediaInfo(media_id=media_id, mime_type=meta.get("mime_type", ""),
+                             declared_size=meta.get("file_size"))
+            if max_bytes is not None and (info.declared_size or 0) > max_bytes:
+                raise MediaTooLarge(f"Media {media_id} is {info.declared_size} bytes (limit {max_bytes})")
+
+            async with self._client.stream("GET", meta["url"]) as download:
+                download.raise_for_status()
+                async for chunk in download.aiter_bytes(chunk_size):
+                    info.size += len(chunk)
+                    if max_bytes is not None and info.size > max_bytes:
+                        raise MediaTooLarge(f"Media {media_id} exceeded {max_bytes} bytes")
+                    sink.write(chunk)
+        return info
+
+    async def send_text(self, to: str, text: str) -> SendResult:
+        """Send a plain text message"""
+        return await self.send_payload(to, {"type": "text", "text": {"body": text}})
+
+    async def send_many(self, messages: Iterable[Tuple[str, str]]) -> BatchReport:
+        """
+        Send (to, text) pairs concurrently.
+        A fixed pool of workers pulls from the iterable, so a large batch
+        never creates more than max_concurrency tasks at once.
+        """
+        report = BatchReport()
+        source = iter(messages)
+        started = time.perf_counter()
+
+        async def worker():
+            for to, text in source:
+                result = await self.send_text(to, text)
+                if result.ok:
+                    report.sent += 1
+                else:
+                    report.failed += 1
+                    report.failures.append(result)
+
+        await self.start()
+        await asyncio.gather(*(worker() for _ in range(self.max_concurrency)))
+        report.elapsed = time.perf_counter() - started
+        logger.info("WhatsApp batch: %d sent, %d failed in %.2fs",
+                    report.sent, report.failed, report.elapsed)
+        return report
+
+
+_sender: Optional[WhatsAppSender] = None
+
+
+def get_whatsapp_sender() -> WhatsAppSender:
+    """Get the process-wide sender (its client is opened lazily)"""
+    global _sender
+    if _sender is None:
+        _sender = WhatsAppSender()
+    return _sender
+
+
+async def close_whatsapp_sender():
+    """Close the process-wide sender, called on application shutdown"""
+    global _sender
+    if _sender is not None:
+        await _sender.close()
+        _sender = None
@@ -0,0 +1,28 @@
+"""
+Script to rebuild the per-user progress aggregates (user_stats, user_area_stats)
+from user_responses. Run it once after migrating, or whenever the aggregates
+need to be recomputed; it is safe to run while the bot is answering.
+
+Usage: python backfill_stats.py [--chunk-size 500]
+"""
+import argparse
+import time
+
+from app.database.database import SessionLocal
+from app.database.stats import rebuild_user_stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild per-user progress aggregates")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Users per transaction")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        users = rebuild_user_stats(db, chunk_size=args.chunk_size)
+        print(f"✅ Rebuilt progress for {users} users in {time.perf_counter() - started:.1f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Benchmarks for the bot's hot paths
@@ -0,0 +1,114 @@
+"""
+Benchmark: AI feedback engine against the fake provider.
+Seeds pending responses, grades them all with FakeFeedbackProvider (artificial
+latency, optional failures) and reports throughput, SLA misses, how many
+batched UPDATEs were needed and how many calls the feedback cache saved.
+Runs offline.
+
+Usage: python -m benchmarks.ai_feedback_engine [--responses 2000] [--concurrency 64] [--latency 0.3] [--no-cache]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import RoutingSession, create_db_engine
+from app.database.models import Base, User, Question, UserResponse, TechArea, Language
+from app.services.ai_feedback import FakeFeedbackProvider, FeedbackEngine
+from app.services.feedback_cache import FeedbackCache
+
+
+# Variations of the same short answer, as users actually type them
+ANSWERS = [
+    "list is mutable, tuple is immutable",
+    "List is mutable; tuple is immutable.",
+    "  list is MUTABLE tuple is immutable!! ",
+    "Lists can be changed after creation but tuples cannot, so tuples are hashable",
+]
+
+
+def seed(url: str, responses: int, unique_ratio: float):
+    engine = create_db_engine(url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Question(tech_area=TechArea.PYTHON, difficulty="easy", question_text_en="What is a tuple?"))
+    db.add_all(
+        User(whatsapp_number=f"+55119{i:08d}", name=f"User {i}",
+             preferred_language=list(Language)[i % 3], tech_area=TechArea.PYTHON)
+        for i in range(max(1, responses // 4))
+    )
+    db.flush()
+    db.add_all(
+        UserResponse(user_id=1 + i % max(1, responses // 4), question_id=1,
+                     response_text=(f"My own answer number {i}" if i < responses * unique_ratio
+                                    else ANSWERS[i % len(ANSWERS)]),
+                     response_type="text")
+        for i in range(responses)
+    )
+    db.commit()
+    db.close()
+    engine.dispose()
+
+
+async def main_async(args):
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'feedback_bench.db')}"
+    seed(url, args.responses, args.unique_ratio)
+
+    writer = create_db_engine(url, use_async=True)
+    reader = create_db_engine(url, read_only=True, use_async=True)
+    factory = async_sessionmaker(sync_session_class=RoutingSession, writer=writer.sync_engine,
+                                 reader=reader.sync_engine, expire_on_commit=False)
+
+    provider = FakeFeedbackProvider(latency=args.latency, jitter=args.latency / 3,
+                                    failure_rate=args.failure_rate)
+    cache = None if args.no_cache else FeedbackCache()
+    engine = FeedbackEngine(provider, session_factory=factory, cache=cache,
+                            max_concurrency=args.concurrency,
+                            batch_size=args.batch_size, poll_interval=0.2)
+
+    started = time.perf_counter()
+    await engine.run_until_idle(timeout=args.timeout)
+    elapsed = time.perf_counter() - started
+
+    async with factory() as db:
+        pending = (await db.execute(
+            select(func.count()).select_from(UserResponse).where(UserResponse.ai_feedback.is_(None))
+        )).scalar()
+
+    await writer.dispose()
+    await reader.dispose()
+
+    print(json.dumps({
+        "responses": args.responses,
+        "concurrency": args.concurrency,
+        "provider_latency_s": args.latency,
+        "seconds": round(elapsed, 3),
+        "graded_per_second": round(engine.graded / elapsed, 1),
+        "provider_calls": provider.calls,
+        "still_pending": pending,
+        **engine.stats(),
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake provider latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.02)
+    parser.add_argument("--unique-ratio", type=float, default=0.5,
+                        help="share of answers that are unique; the rest repeat a few common answers")
+    parser.add_argument("--no-cache", action="store_true", help="disable the feedback cache")
+    parser.add_argument("--timeout", type=float, default=600)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark: sync Session vs AsyncSession inside async handlers.
+Runs many concurrent "inbound answer" handlers (user lookup, response
+insert, then a short awaited outbound call) on one event loop. The sync
+variant calls crud.py directly from async code, as the endpoints used to;
+the async variant uses async_crud.py. Reports throughput and event-loop lag.
+
+Usage: python -m benchmarks.async_db_concurrency [--requests 2000] [--concurrency 100]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.core.metrics import percentile
+from app.database import async_crud, crud
+from app.database.database import RoutingSession, create_db_engine
+from app.database.models import Base, User, Question, TechArea, Language
+
+
+async def monitor_loop_lag(lags, stop: asyncio.Event, interval: float = 0.005):
+    """Measure how late a periodic timer fires; blocking calls show up as lag"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def drive(handler, requests: int, concurrency: int, users: int, io_delay: float) -> dict:
+    latencies, lags = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(lags, stop))
+
+    async def one(n: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await handler(f"+55119{n % users:08d}")
+            await asyncio.sleep(io_delay)  # Outbound WhatsApp / AI call
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(requests)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+
+    return {
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "max_loop_lag_ms": round(max(lags, default=0) * 1000, 3),
+        "p99_loop_lag_ms": percentile(lags, 99),
+    }
+
+
+def setup_database(users: int) -> str:
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'async_bench.db')}"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Question(tech_area=TechArea.PYTHON, difficulty="easy", question_text_en="What is a tuple?"))
+    db.add_all(
+        User(whatsapp_number=f"+55119{i:08d}", name=f"User {i}",
+             preferred_language=Language.ENGLISH, tech_area=TechArea.PYTHON)
+        for i in range(users)
+    )
+    db.commit()
+    db.close()
+    engine.dispose()
+    return url
+
+
+async def main_async(args):
+    url = setup_database(args.users)
+
+    writer, reader = create_db_engine(url), create_db_engine(url, read_only=True)
+    sync_factory = sessionmaker(class_=RoutingSession, writer=writer, reader=reader, autoflush=False)
+
+    async def sync_handler(number: str):
+        db = sync_factory()
+        try:
+            user = crud.get_user_by_whatsapp(db, number)
+            crud.create_user_response(db, user.id, 1, "An immutable sequence")
+        finally:
+            db.close()
+
+    async_writer = create_db_engine(url, use_async=True)
+    async_reader = create_db_engine(url, read_only=True, use_async=True)
+    async_factory = async_sessionmaker(
+        sync_session_class=RoutingSession, writer=async_writer.sync_engine,
+        reader=async_reader.sync_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def async_handler(number: str):
+        async with async_factory() as db:
+            user = await async_crud.get_user_by_whatsapp(db, number)
+            await async_crud.create_user_response(db, user.id, 1, "An immutable sequence")
+
+    results = {}
+    for name, handler in (("sync_session", sync_handler), ("async_session", async_handler)):
+        results[name] = await drive(handler, args.requests, args.concurrency, args.users, args.io_delay)
+
+    writer.dispose()
+    reader.dispose()
+    await async_writer.dispose()
+    await async_reader.dispose()
+
+    print(json.dumps({"requests": args.requests, "concurrency": args.concurrency, **results}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--io-delay", type=float, default=0.02, help="seconds of awaited I/O per request")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
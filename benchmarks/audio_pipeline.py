@@ -0,0 +1,168 @@
+"""
+Benchmark: voice note handling, buffered inline vs the streaming pipeline.
+A burst of synthetic WAV voice notes is served by a local mock of the
+WhatsApp media API. The buffered variant reads each note into memory and
+decodes/resamples/transcribes it on the event loop, as a naive handler would;
+the pipeline variant uses AudioPipeline with the stub transcription backend.
+Reports throughput, event-loop lag, peak RSS of the API process and
+per-stage timings. The pipeline runs first, since peak RSS only grows.
+Runs offline.
+
+Usage: python -m benchmarks.audio_pipeline [--notes 40] [--seconds 30] [--workers 2]
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import resource
+import time
+import wave
+
+import httpx
+
+from app.core.metrics import percentile
+from app.services.audio import AudioPipeline, _init_worker, process_audio
+from app.services.whatsapp import WhatsAppSender
+
+CHUNK = 65536
+
+
+def synthetic_note(seconds: float, rate: int) -> bytes:
+    """Mono 16-bit WAV with a wobbling tone, roughly speech-sized"""
+    frames = bytearray()
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        frames += int(8000 * math.sin(2 * math.pi * (180 + 40 * math.sin(3 * t)) * t)).to_bytes(
+            2, "little", signed=True)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+class ChunkedBody(httpx.AsyncByteStream):
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+
+    async def __aiter__(self):
+        for offset in range(0, len(self.data), CHUNK):
+            yield bytes(self.data[offset:offset + CHUNK])
+            await asyncio.sleep(0)
+
+
+def media_transport(note: bytes) -> httpx.MockTransport:
+    """Graph API media lookup plus the signed download URL"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "media.local":
+            return httpx.Response(200, stream=ChunkedBody(note))
+        media_id = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json={
+            "url": f"https://media.local/{media_id}", "mime_type": "audio/wav", "file_size": len(note)})
+
+    return httpx.MockTransport(handler)
+
+
+async def monitor_loop_lag(lags, stop: asyncio.Event, interval: float = 0.005):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def measure(run, notes: int) -> dict:
+    lags = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(lags, stop))
+    started = time.perf_counter()
+    latencies = await run()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_task
+    return {
+        "seconds": round(elapsed, 3),
+        "notes_per_second": round(notes / elapsed, 2),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "max_loop_lag_ms": round(max(lags, default=0) * 1000, 3),
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+async def main_async(args):
+    note = synthetic_note(args.seconds, args.rate)
+    sender = WhatsAppSender(access_token="bench", phone_number_id="1", base_url="https://graph.local",
+                            http2=False, transport=media_transport(note))
+    await sender.start()
+    results = {}
+
+    # Pipeline: spooled downloads, process pool behind a bounded queue
+    pipeline = AudioPipeline(workers=args.workers, queue_size=args.queue_size, backend="stub",
+                             backend_options={"cost_per_audio_second": args.stub_cost}, downloader=sender, spool_max_memory=args.spool_max_memory)
+    await pipeline.start()
+    await pipeline.transcribe_source(synthetic_note(0.5, args.rate))  # Warm up the worker processes
+
+    async def streamed():
+        latencies = []
+
+        async def one(n):
+            started = time.perf_counter()
+            await pipeline.transcribe_media(f"media-{n}")
+            latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one(n) for n in range(args.notes)))
+        return latencies
+
+    results["pipeline"] = await measure(streamed, args.notes)
+    metrics = pipeline.metrics()
+    results["pipeline"]["spooled_to_disk"] = metrics["spooled_to_disk"]
+    results["pipeline"]["stages_p50_ms"] = {stage: v["p50"] for stage, v in metrics["stages_ms"].items()}
+    await pipeline.stop()
+
+    # Buffered: whole note in memory, CPU work on the event loop
+    _init_worker("stub", {"cost_per_audio_second": args.stub_cost})
+
+    async def buffered():
+        latencies = []
+
+        async def one(n):
+            started = time.perf_counter()
+            meta = (await sender._client.get(f"/media-{n}")).json()
+            data = (await sender._client.get(meta["url"])).content
+            process_audio(data, 16000, None)
+            latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one(n) for n in range(args.notes)))
+        return latencies
+
+    results["buffered_inline"] = await measure(buffered, args.notes)
+    await sender.close()
+
+    print(json.dumps({
+        "notes": args.notes,
+        "note_seconds": args.seconds,
+        "note_bytes": len(note),
+        "workers": args.workers,
+        **results,
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--notes", type=int, default=40)
+    parser.add_argument("--seconds", type=float, default=30.0, help="length of each voice note")
+    parser.add_argument("--rate", type=int, default=48000, help="sample rate of the notes")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=100)
+    parser.add_argument("--stub-cost", type=float, default=0.02,
+                        help="stub transcription CPU seconds per audio second")
+    parser.add_argument("--spool-max-memory", type=int, default=1048576)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
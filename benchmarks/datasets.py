@@ -0,0 +1,137 @@
+"""
+Synthetic datasets for benchmarks.
+Builds a SQLite database of configurable size (users, questions, responses)
+from a fixed seed, so two runs with the same arguments produce the same rows.
+Rows are written with chunked executemany INSERTs in a single transaction per
+table; 10M responses take a few minutes and about 1 GB of disk.
+
+Usage: python -m benchmarks.datasets path/to/bench.db [--users 100000] [--questions 5000] [--responses 10000000]
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.database.database import create_db_engine
+from app.database.models import Base, User, Question, UserResponse, TechArea, Language
+
+TIMEZONES = ["America/Sao_Paulo", "America/Mexico_City", "America/New_York", "Europe/Madrid",
+             "Europe/Lisbon", "UTC", "Asia/Kolkata", "America/Los_Angeles"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+ANSWER_WORDS = ("list tuple mutable immutable closure scope hoisting hash map array stack queue "
+                "recursion complexity linear logarithmic pointer reference value copy thread "
+                "async await promise callback generator iterator index cache").split()
+
+
+def phone_number(i: int) -> str:
+    """Deterministic WhatsApp number of synthetic user i (1-based)"""
+    return f"+55119{i:08d}"
+
+
+def _chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _answer(rng: random.Random) -> str:
+    return " ".join(rng.choice(ANSWER_WORDS) for _ in range(rng.randint(4, 40)))
+
+
+def generate(url: str, users: int, questions: int, responses: int, seed: int = 42,
+             feedback_ratio: float = 0.95, chunk_size: int = 20000) -> dict:
+    """Create the schema and fill it; returns row counts and timings"""
+    rng = random.Random(seed)
+    engine = create_db_engine(url)
+    Base.metadata.create_all(engine)
+    areas = list(TechArea)
+    languages = list(Language)
+    now = datetime.utcnow()
+    timings = {}
+
+    with engine.begin() as conn:
+        started = time.perf_counter()
+        for chunk in _chunks((
+            {
+                "tech_area": areas[i % len(areas)],
+                "difficulty": DIFFICULTIES[i % len(DIFFICULTIES)],
+                "question_text_en": f"Synthetic question {i}: explain {rng.choice(ANSWER_WORDS)}.",
+                "question_text_es": f"Pregunta sintética {i}",
+                "question_text_pt": f"Pergunta sintética {i}",
+                "expected_concepts": ", ".join(rng.sample(ANSWER_WORDS, 4)),
+                "created_at": now,
+            }
+            for i in range(questions)
+        ), chunk_size):
+            conn.execute(insert(Question), chunk)
+        timings["questions"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for chunk in _chunks((
+            {
+                "whatsapp_number": phone_number(i),
+                "name": f"User {i}",
+                "preferred_language": languages[i % len(languages)],
+                "tech_area": areas[i % len(areas)],
+                "timezone": TIMEZONES[i % len(TIMEZONES)],
+                "is_active": rng.random() > 0.05,
+                "created_at": now - timedelta(days=rng.randint(0, 365)),
+            }
+            for i in range(1, users + 1)
+        ), chunk_size):
+            conn.execute(insert(User), chunk)
+        timings["users"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for chunk in _chunks((
+            {
+                "user_id": rng.randint(1, users),
+                "question_id": rng.randint(1, questions),
+                "response_text": _answer(rng),
+                "response_type": "audio" if rng.random() < 0.1 else "text",
+                "ai_feedback": "Synthetic feedback." if rng.random() < feedback_ratio else None,
+                "score": rng.randint(1, 10),
+                "created_at": now - timedelta(seconds=responses - i),
+            }
+            for i in range(responses)
+        ), chunk_size):
+            conn.execute(insert(UserResponse), chunk)
+        timings["responses"] = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+    engine.dispose()
+    return {
+        "users": users,
+        "questions": questions,
+        "responses": responses,
+        "seed": seed,
+        "seconds": {name: round(value, 3) for name, value in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="SQLite file to create (must not exist)")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=5000)
+    parser.add_argument("--responses", type=int, default=10000000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    print(json.dumps(generate(f"sqlite:///{os.path.abspath(args.path)}", args.users,
+                              args.questions, args.responses, args.seed), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Benchmark: load suite for the bot's hot paths.
+Builds (or reuses) a seeded synthetic database, then runs four scenarios
+against it and prints one JSON report with p50/p95/p99 and throughput:
+
+  webhook   POST /webhook/whatsapp with Meta-format payloads (text messages
+            from registered and unknown numbers, delivery statuses, Meta
+            redeliveries) at a fixed target RPS. Statuses take the coalescing
+            fast path and are flushed in bulk. Open loop: requests start on
+            schedule whether or not earlier ones finished, and latency is
+            measured from the scheduled start, so queueing isn't hidden.
+  dispatch  the full daily dispatch, then scheduler-sized dispatch_due_questions
+            ticks, then the outbox drain loop sending everything they queued
+            through a stubbed WhatsApp API.
+  crud      the per-message CRUD calls on random users.
+  feedback  the AI feedback engine grading pending responses with the fake provider.
+
+Runs offline: WhatsApp is an httpx.MockTransport, OpenAI is FakeFeedbackProvider,
+and the app is served in-process over ASGITransport unless --url points at a
+running server. --baseline compares p99s with an earlier --output file and
+exits 1 on regressions.
+
+Usage: python -m benchmarks.load_suite [--db bench.db] [--users 10000] [--questions 500] [--responses 200000] [--rps 200] [--duration 10] [--output report.json] [--baseline old.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from app.core.metrics import percentile
+
+SCENARIOS = ("webhook", "dispatch", "crud", "feedback")
+
+
+def summarize(samples, elapsed: float) -> dict:
+    """Latency percentiles and throughput of a list of durations (seconds)"""
+    return {
+        "count": len(samples),
+        "latency_ms": {"p50": percentile(samples, 50), "p95": percentile(samples, 95),
+                       "p99": percentile(samples, 99)},
+        "throughput_per_s": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def whatsapp_stub() -> httpx.MockTransport:
+    """WhatsApp Cloud API stand-in that accepts every message"""
+    counter = {"sent": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        counter["sent"] += 1
+        return httpx.Response(200, json={"messaging_product": "whatsapp",
+                                         "messages": [{"id": f"wamid.stub{counter['sent']}"}]})
+    return httpx.MockTransport(handler)
+
+
+class PayloadFactory:
+    """Seeded Meta webhook payloads for the synthetic users"""
+
+    def __init__(self, users: int, seed: int, status_ratio: float, unknown_ratio: float,
+                 duplicate_ratio: float):
+        self.rng = random.Random(seed)
+        self.users = users
+        self.status_ratio = status_ratio
+        self.unknown_ratio = unknown_ratio
+        self.duplicate_ratio = duplicate_ratio
+        self.sequence = 0
+        self.recent = []
+
+    def _envelope(self, value: dict) -> dict:
+        return {
+            "object": "whatsapp_business_account",
+            "entry": [{
+                "id": "102290129340398",
+                "changes": [{
+                    "field": "messages",
+                    "value": {
+                        "messaging_product": "whatsapp",
+                        "metadata": {"display_phone_number": "15550783881",
+                                     "phone_number_id": "106540352242922"},
+                        **value,
+                    },
+                }],
+            }],
+        }
+
+    def next(self) -> dict:
+        from benchmarks.datasets import ANSWER_WORDS, phone_number
+
+        rng = self.rng
+        if self.recent and rng.random() < self.duplicate_ratio:
+            return rng.choice(self.recent)  # Meta redelivering a payload
+        self.sequence += 1
+        timestamp = str(int(time.time()))
+        if rng.random() < self.unknown_ratio:
+            wa_id = f"4477009{self.sequence:05d}"
+        else:
+            wa_id = phone_number(rng.randint(1, self.users)).lstrip("+")
+        if rng.random() < self.status_ratio:
+            # About three callbacks (sent, delivered, read) per outbound message
+            payload = self._envelope({"statuses": [{
+                "id": f"wamid.out{rng.randint(1, max(1, self.sequence // 3)):012d}",
+                "status": rng.choice(["sent", "delivered", "read"]),
+                "timestamp": timestamp,
+                "recipient_id": wa_id,
+            }]})
+        else:
+            payload = self._envelope({
+                "contacts": [{"profile": {"name": "Bench User"}, "wa_id": wa_id}],
+                "messages": [{
+                    "from": wa_id,
+                    "id": f"wamid.in{self.sequence:012d}",
+                    "timestamp": timestamp,
+                    "type": "text",
+                    "text": {"body": " ".join(rng.choice(ANSWER_WORDS) for _ in range(rng.randint(3, 30)))},
+                }],
+            })
+        self.recent = (self.recent + [payload])[-100:]
+        return payload
+
+
+async def run_webhook(args, factory: PayloadFactory) -> dict:
+    """Open-loop POSTs at args.rps for args.duration seconds"""
+    from app.api import webhooks
+    from app.main import app
+
+    payloads = [factory.next() for _ in range(int(args.rps * args.duration))]
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=30.0)
+    else:
+        await app.router.startup()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    latencies, statuses, errors = [], {}, 0
+
+    async def post(body: dict, scheduled: float):
+        nonlocal errors
+        try:
+            response = await client.post("/webhook/whatsapp", json=body)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - scheduled)
+
+    tasks = []
+    started = time.perf_counter()
+    for i, body in enumerate(payloads):
+        scheduled = started + i / args.rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(post(body, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    result = {"target_rps": args.rps, **summarize(latencies, elapsed),
+              "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+              "errors": errors}
+    if not args.url:
+        queue = webhooks.webhook_queue
+        drain_started = time.perf_counter()
+        while queue.depth() or queue.processed + queue.failed < queue.enqueued:
+            await asyncio.sleep(0.01)
+        result["drain_seconds"] = round(time.perf_counter() - drain_started, 3)
+        result["processed_per_s"] = round(queue.processed / (time.perf_counter() - started), 1)
+        result["queue"] = queue.metrics()
+        await app.router.shutdown()  # Also flushes the buffered statuses
+        result["statuses"] = webhooks.status_ingestor.metrics()
+    await client.aclose()
+    return result
+
+
+async def run_dispatch(args) -> dict:
+    """Full daily dispatch and scheduler-sized ticks, then the outbox drained through a stubbed API"""
+    from app.database.database import SessionLocal
+    from app.database.dispatch import dispatch_daily_questions, dispatch_due_questions
+    from app.database.schedule import schedule_missing
+    from app.services.outbox_drainer import OutboxDrainer
+    from app.services.whatsapp import WhatsAppSender
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        report = await asyncio.to_thread(dispatch_daily_questions, db)
+        daily_seconds = time.perf_counter() - started
+        result = {"daily": {
+            "users": report.users,
+            "assigned": report.assigned,
+            "seconds": round(daily_seconds, 3),
+            "users_per_s": round(report.users / daily_seconds, 1) if daily_seconds else 0.0,
+            "phases_s": {phase: round(seconds, 3) for phase, seconds in report.timings.items()},
+        }}
+
+        started = time.perf_counter()
+        scheduled = await asyncio.to_thread(schedule_missing, db, datetime.utcnow())
+        result["schedule_missing"] = {"users": scheduled,
+                                      "seconds": round(time.perf_counter() - started, 3)}
+
+        # Ticks run two days ahead, so everyone is due: a backlog after an outage
+        now = datetime.utcnow() + timedelta(days=2)
+
+        tick_samples = []
+        assigned = 0
+        started = time.perf_counter()
+        for _ in range(args.ticks):
+            tick_started = time.perf_counter()
+            report = await asyncio.to_thread(dispatch_due_questions, db, args.tick_size, now)
+            tick_samples.append(time.perf_counter() - tick_started)
+            if not report.users:
+                break
+            assigned += report.assigned
+        result["ticks"] = {"tick_size": args.tick_size, "assigned": assigned,
+                           **summarize(tick_samples, time.perf_counter() - started)}
+    finally:
+        db.close()
+
+    # Everything queued above (daily dispatch and ticks) goes out through the outbox
+    sender = WhatsAppSender(transport=whatsapp_stub(), rate_limit_per_second=1e9, http2=False)
+    drainer = OutboxDrainer(sender=sender)
+    batch_samples = []
+    async with sender:
+        started = time.perf_counter()
+        while True:
+            batch_started = time.perf_counter()
+            if not await drainer.drain_once():
+                break
+            batch_samples.append(time.perf_counter() - batch_started)
+        elapsed = time.perf_counter() - started
+    result["outbox"] = {"batch_size": drainer.batch_size, "sent": drainer.sent, "failed": drainer.failed,
+                        "sent_per_s": round(drainer.sent / elapsed, 1) if elapsed else 0.0,
+                        **summarize(batch_samples, elapsed)}
+    return result
+
+
+def run_crud(args) -> dict:
+    """Per-message CRUD calls on random users"""
+    from benchmarks.datasets import phone_number
+    from app.database import crud
+    from app.database.database import SessionLocal
+    from app.database.user_state import user_states
+
+    rng = random.Random(args.seed + 1)
+    samples = {name: [] for name in ("get_user_by_whatsapp", "user_state_get", "get_random_question",
+                                      "create_user_response", "update_response_feedback",
+                                      "get_user_responses")}
+    user_states.clear()
+    db = SessionLocal()
+    try:
+        def timed(name, fn, *fn_args):
+            op_started = time.perf_counter()
+            value = fn(*fn_args)
+            samples[name].append(time.perf_counter() - op_started)
+            return value
+
+        started = time.perf_counter()
+        for _ in range(args.crud_ops):
+            number = phone_number(rng.randint(1, args.users))
+            user = timed("get_user_by_whatsapp", crud.get_user_by_whatsapp, db, number)
+            timed("user_state_get", user_states.get, db, number)
+            if user is None:
+                continue
+            question = timed("get_random_question", crud.get_random_question, db, user.tech_area, user.id)
+            if question is None:
+                continue
+            response = timed("create_user_response", crud.create_user_response, db, user.id,
+                             question.id, "bench answer " * rng.randint(1, 20))
+            timed("update_response_feedback", crud.update_response_feedback, db, response.id,
+                  "Bench feedback.", rng.randint(1, 10))
+            timed("get_user_responses", crud.get_user_responses, db, user.id)
+            db.expunge_all()
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+    # Throughput per call is back-to-back on one session, not the loop rate
+    return {"iterations_per_s": round(args.crud_ops / elapsed, 1),
+            **{name: summarize(values, sum(values)) for name, values in samples.items()}}
+
+
+async def run_feedback(args) -> dict:
+    """Grade pending responses with the fake provider for at most args.feedback_seconds"""
+    from app.services.ai_feedback import FakeFeedbackProvider, FeedbackEngine
+
+    provider = FakeFeedbackProvider(latency=args.ai_latency, jitter=args.ai_latency / 4)
+    engine = FeedbackEngine(provider)
+    started = time.perf_counter()
+    await engine.run_until_idle(timeout=args.feedback_seconds)
+    elapsed = time.perf_counter() - started
+    return {
+        "provider_latency_s": args.ai_latency,
+        "graded": engine.graded,
+        "provider_calls": provider.calls,
+        "seconds": round(elapsed, 3),
+        "graded_per_s": round(engine.graded / elapsed, 1) if elapsed else 0.0,
+        "batches_written": engine.batches_written,
+        "deadline_missed": engine.deadline_missed,
+    }
+
+
+def p99s(report: dict, path: str = "") -> dict:
+    """Every p99 in a report, keyed by its dotted path"""
+    found = {}
+    for key, value in report.items():
+        if not isinstance(value, dict):
+            continue
+        here = f"{path}.{key}" if path else key
+        if key == "latency_ms" and "p99" in value:
+            found[path] = value["p99"]
+        else:
+            found.update(p99s(value, here))
+    return found
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """p99 regressions beyond tolerance (a fraction) against a baseline report"""
+    current, previous = p99s(report), p99s(baseline)
+    return [
+        {"metric": name, "baseline_ms": previous[name], "current_ms": value}
+        for name, value in current.items()
+        if name in previous and previous[name] > 0 and value > previous[name] * (1 + tolerance)
+    ]
+
+
+async def run(args, dataset: dict) -> dict:
+    report = {"config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+              "dataset": dataset}
+    if "webhook" in args.scenarios:
+        factory = PayloadFactory(args.users, args.seed, args.status_ratio, args.unknown_ratio,
+                                 args.duplicate_ratio)
+        report["webhook"] = await run_webhook(args, factory)
+    if "crud" in args.scenarios:
+        report["crud"] = await asyncio.to_thread(run_crud, args)
+    if "dispatch" in args.scenarios:
+        report["dispatch"] = await run_dispatch(args)
+    if "feedback" in args.scenarios:
+        report["feedback"] = await run_feedback(args)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", help="SQLite file; generated with the sizes below if it doesn't exist "
+                                     "(default: a temporary file)")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--responses", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--url", help="Drive a running server instead of the in-process app")
+    parser.add_argument("--rps", type=float, default=200.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--status-ratio", type=float, default=0.6, help="Share of delivery-status payloads")
+    parser.add_argument("--unknown-ratio", type=float, default=0.05, help="Share of unregistered senders")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.02, help="Share of redelivered payloads")
+    parser.add_argument("--crud-ops", type=int, default=2000)
+    parser.add_argument("--ticks", type=int, default=10)
+    parser.add_argument("--tick-size", type=int, default=200)
+    parser.add_argument("--ai-latency", type=float, default=0.05)
+    parser.add_argument("--feedback-seconds", type=float, default=10.0)
+    parser.add_argument("--output", help="Also write the report to this file")
+    parser.add_argument("--baseline", help="Earlier report to compare p99s against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p99 regression (0.2 = 20%%)")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    path = os.path.abspath(args.db) if args.db else os.path.join(tempfile.mkdtemp(), "bench.db")
+    # Settings are read at import time, so configure the app before importing it
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("WHATSAPP_ACCESS_TOKEN", "bench")
+    os.environ.setdefault("WHATSAPP_PHONE_NUMBER_ID", "106540352242922")
+    os.environ.setdefault("WEBHOOK_VERIFY_TOKEN", "bench")
+    for flag in ("AI_FEEDBACK_ENABLED", "AUDIO_TRANSCRIPTION_ENABLED", "SCHEDULER_ENABLED", "OUTBOX_ENABLED"):
+        os.environ[flag] = "false"  # Scenarios start what they measure themselves
+
+    from benchmarks.datasets import generate
+
+    if os.path.exists(path):
+        dataset = {"path": path, "reused": True}
+    else:
+        dataset = {"path": path, **generate(os.environ["DATABASE_URL"], args.users, args.questions,
+                                            args.responses, args.seed)}
+
+    import app.main  # noqa: F401  (configures logging)
+    logging.getLogger().setLevel(args.log_level)
+
+    report = asyncio.run(run(args, dataset))
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+
+    output = json.dumps(report, indent=2, default=str)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
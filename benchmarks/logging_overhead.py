@@ -0,0 +1,176 @@
+"""
+Benchmark: logging overhead on webhook latency.
+Drives POST /webhook/whatsapp (with some GET verification attempts) open
+loop at a fixed rate, in-process over ASGITransport, under three logging
+setups writing the same records to a file:
+
+  sync            the old logging.basicConfig: text formatting and the write
+                  on the request's thread, every record
+  queued          app.core.logs with log_sample_rates="" (JSON rendered and
+                  written by the listener thread, nothing sampled)
+  queued_sampled  app.core.logs with the default log_sample_rates
+
+--sink-delay-ms adds a blocking delay to every write, like stdout piped to
+a slow log collector. Reports latency percentiles per setup (pooled over
+the runs, plus each run's p99), the lines written per run and the records
+dropped on a full queue.
+
+Usage: python -m benchmarks.logging_overhead [--rps 400] [--duration 10] [--repeat 3] [--sink-delay-ms 0]
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import List, Tuple
+
+import httpx
+
+VARIANTS = ("sync", "queued", "queued_sampled")
+
+
+class SlowFile(io.TextIOWrapper):
+    """Text file whose every write blocks for `delay` seconds"""
+
+    def __init__(self, path: str, delay: float):
+        super().__init__(open(path, "wb"), encoding="utf-8", line_buffering=True)
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return super().write(text)
+
+
+def use_logging(variant: str, stream, default_rates: str):
+    from app.core.logs import TEXT_FORMAT, configure_logging, stop_logging
+
+    stop_logging()
+    if variant == "sync":
+        logging.basicConfig(level=logging.INFO, format=TEXT_FORMAT, stream=stream, force=True)
+    else:
+        configure_logging(level="INFO", fmt="json", stream=stream,
+                          sample_rates=default_rates if variant == "queued_sampled" else "")
+
+
+async def drive(args, factory, duration: float) -> Tuple[List[float], float]:
+    """Open-loop requests at args.rps for `duration` seconds; latencies from the scheduled start"""
+    from app.api import webhooks
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    requests = [("GET", None) if rng.random() < args.verify_ratio else ("POST", factory.next())
+                for _ in range(int(args.rps * duration))]
+    verify = {"hub.mode": "subscribe", "hub.challenge": "42", "hub.verify_token": "bench"}
+
+    await app.router.startup()
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    latencies = []
+
+    async def call(method: str, body, scheduled: float):
+        if method == "GET":
+            await client.get("/webhook/whatsapp", params=verify)
+        else:
+            await client.post("/webhook/whatsapp", json=body)
+        latencies.append(time.perf_counter() - scheduled)
+
+    tasks = []
+    started = time.perf_counter()
+    for i, (method, body) in enumerate(requests):
+        scheduled = started + i / args.rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(call(method, body, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    queue = webhooks.webhook_queue
+    while queue.depth() or queue.processed + queue.failed < queue.enqueued:
+        await asyncio.sleep(0.01)
+    await app.router.shutdown()
+    await client.aclose()
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rps", type=float, default=400.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each setup, taking turns")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Unmeasured seconds before the first setup")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--status-ratio", type=float, default=0.75, help="Share of delivery-status payloads")
+    parser.add_argument("--verify-ratio", type=float, default=0.05, help="Share of GET verification attempts")
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0, help="Blocking delay per log write")
+    parser.add_argument("--variants", default=",".join(VARIANTS))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    # Settings are read at import time, so configure the app before importing it
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("WHATSAPP_ACCESS_TOKEN", "bench")
+    os.environ.setdefault("WHATSAPP_PHONE_NUMBER_ID", "106540352242922")
+    os.environ["WEBHOOK_VERIFY_TOKEN"] = "bench"
+    for flag in ("AI_FEEDBACK_ENABLED", "AUDIO_TRANSCRIPTION_ENABLED", "SCHEDULER_ENABLED", "OUTBOX_ENABLED"):
+        os.environ[flag] = "false"
+
+    from benchmarks.datasets import generate
+    from benchmarks.load_suite import PayloadFactory, summarize
+
+    generate(os.environ["DATABASE_URL"], args.users, 50, 0, args.seed)
+    import app.main  # noqa: F401
+    from app.core.config import settings
+    from app.core.logs import logging_stats, stop_logging
+
+    # One factory throughout, so every run posts new message ids instead of duplicates
+    factory = PayloadFactory(args.users, args.seed, args.status_ratio, 0.05, 0.02)
+    stop_logging()
+    logging.basicConfig(force=True, handlers=[logging.NullHandler()])
+    if args.warmup:
+        asyncio.run(drive(args, factory, args.warmup))  # Caches, pools and first registrations
+
+    variants = [name.strip() for name in args.variants.split(",") if name.strip()]
+    samples = {variant: [] for variant in variants}
+    runs = {variant: [] for variant in variants}
+    lines = dict.fromkeys(variants, 0)
+    elapsed_total = dict.fromkeys(variants, 0.0)
+    dropped = dict.fromkeys(variants, 0)
+    # Setups take turns, so drift (WAL growth, a noisy neighbour) hits them all alike
+    for _ in range(args.repeat):
+        for variant in variants:
+            path = os.path.join(workdir, f"{variant}.log")
+            stream = SlowFile(path, args.sink_delay_ms / 1000)
+            use_logging(variant, stream, settings.log_sample_rates)
+            latencies, elapsed = asyncio.run(drive(args, factory, args.duration))
+            if variant != "sync":
+                dropped[variant] += logging_stats()["dropped"]
+            stop_logging()
+            logging.basicConfig(force=True, handlers=[logging.NullHandler()])
+            stream.close()
+            with open(path, "rb") as f:
+                lines[variant] += sum(1 for _ in f)
+            samples[variant].extend(latencies)
+            elapsed_total[variant] += elapsed
+            runs[variant].append(summarize(latencies, elapsed)["latency_ms"]["p99"])
+
+    report = {"rps": args.rps, "duration": args.duration, "repeat": args.repeat,
+              "sink_delay_ms": args.sink_delay_ms}
+    for variant in variants:
+        result = summarize(samples[variant], elapsed_total[variant])
+        report[variant] = {**result, "p99_per_run_ms": runs[variant],
+                           "log_lines_per_run": lines[variant] // args.repeat, "dropped": dropped[variant]}
+    if "sync" in report and "queued_sampled" in report:
+        report["p99_removed_ms"] = round(report["sync"]["latency_ms"]["p99"]
+                                         - report["queued_sampled"]["latency_ms"]["p99"], 3)
+
+    stop_logging()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: SQLite write throughput under concurrent requests.
+Compares the old engine (plain create_engine, rollback journal, default
+pool) with the tuned profile from app.database.database (WAL, PRAGMAs,
+single writer + reader pool). Each worker thread imitates an inbound answer:
+look up the user, store a response, commit.
+
+Usage: python -m benchmarks.sqlite_write_throughput [--threads 32] [--writes 200]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.metrics import percentile
+from app.database.database import RoutingSession, create_db_engine
+from app.database.models import Base, User, Question, UserResponse, TechArea, Language
+
+
+def seed(session_factory, users: int):
+    db = session_factory()
+    db.add(Question(tech_area=TechArea.PYTHON, difficulty="easy", question_text_en="What is a tuple?"))
+    db.add_all(
+        User(whatsapp_number=f"+55119{i:08d}", name=f"User {i}",
+             preferred_language=Language.ENGLISH, tech_area=TechArea.PYTHON)
+        for i in range(users)
+    )
+    db.commit()
+    db.close()
+
+
+def run(session_factory, threads: int, writes: int, users: int) -> dict:
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker(index: int):
+        local_latencies, local_errors = [], 0
+        for n in range(writes):
+            number = f"+55119{(index * writes + n) % users:08d}"
+            started = time.perf_counter()
+            db = session_factory()
+            try:
+                user = db.query(User).filter(User.whatsapp_number == number).first()
+                db.add(UserResponse(user_id=user.id, question_id=1,
+                                    response_text="An immutable sequence", response_type="text"))
+                db.commit()
+                local_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                db.rollback()
+                local_errors += 1
+            finally:
+                db.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors.append(local_errors)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "writes": len(latencies),
+        "errors": sum(errors),
+        "seconds": round(elapsed, 3),
+        "writes_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def baseline_factory(url: str):
+    """The engine as originally configured: only check_same_thread=False"""
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return engine, [engine], sessionmaker(bind=engine, class_=Session, autocommit=False, autoflush=False)
+
+
+def tuned_factory(url: str):
+    """The configurable profile: WAL + PRAGMAs, one writer and a reader pool"""
+    writer = create_db_engine(url)
+    reader = create_db_engine(url, read_only=True)
+    factory = sessionmaker(class_=RoutingSession, writer=writer, reader=reader,
+                           autocommit=False, autoflush=False)
+    return writer, [writer, reader], factory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=200, help="writes per thread")
+    parser.add_argument("--users", type=int, default=10000)
+    args = parser.parse_args()
+
+    results = {}
+    for name, build in (("baseline", baseline_factory), ("tuned", tuned_factory)):
+        path = os.path.join(tempfile.mkdtemp(), f"{name}.db")
+        url = f"sqlite:///{path}"
+        engine, engines, factory = build(url)
+        Base.metadata.create_all(engine)
+        seed(factory, args.users)
+        results[name] = run(factory, args.threads, args.writes, args.users)
+        for e in engines:
+            e.dispose()
+
+    print(json.dumps({"threads": args.threads, "writes_per_thread": args.writes, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
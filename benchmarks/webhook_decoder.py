@@ -0,0 +1,142 @@
+"""
+Benchmark: decoding Meta webhook payloads.
+Compares the previous receive_message path (request.json() with the stdlib
+parser, shape checks, a walk for the statuses, the whole dict queued) with
+app.services.webhook_decoder.decode() on orjson and on the stdlib fallback,
+for a text message, a status callback and a batched payload of many
+entries. Reports microseconds per payload and the memory retained per
+queued payload, plus the cost of the X-Hub-Signature-256 check.
+
+Usage: python -m benchmarks.webhook_decoder [--iterations 20000] [--batch-entries 20]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import time
+import tracemalloc
+
+from app.services import webhook_decoder
+from app.services.webhook_decoder import decode, verify_signature
+
+SECRET = "bench-app-secret"
+
+
+def envelope(entries: list) -> dict:
+    return {"object": "whatsapp_business_account", "entry": entries}
+
+
+def entry(value: dict) -> dict:
+    return {"id": "102290129340398", "changes": [{"field": "messages", "value": {
+        "messaging_product": "whatsapp",
+        "metadata": {"display_phone_number": "15550783881", "phone_number_id": "106540352242922"},
+        **value,
+    }}]}
+
+
+def text_value(i: int) -> dict:
+    return {
+        "contacts": [{"profile": {"name": "Bench User"}, "wa_id": f"55119{i:08d}"}],
+        "messages": [{"from": f"55119{i:08d}", "id": f"wamid.in{i:012d}", "timestamp": "1760000000",
+                      "type": "text", "text": {"body": "A tuple is an immutable sequence, so it can be "
+                                                       "hashed and used as a dictionary key " * 3}}],
+    }
+
+
+def status_value(i: int) -> dict:
+    return {"statuses": [{
+        "id": f"wamid.out{i:012d}", "status": "delivered", "timestamp": "1760000000",
+        "recipient_id": f"55119{i:08d}",
+        "conversation": {"id": f"conv{i}", "origin": {"type": "utility"}},
+        "pricing": {"billable": True, "pricing_model": "CBP", "category": "utility"},
+    }]}
+
+
+def payloads(batch_entries: int) -> dict:
+    """Raw bodies as Meta sends them"""
+    return {
+        "text": json.dumps(envelope([entry(text_value(1))])).encode(),
+        "status": json.dumps(envelope([entry(status_value(1))])).encode(),
+        "batch": json.dumps(envelope([entry(text_value(i) if i % 4 == 0 else status_value(i))
+                                      for i in range(batch_entries)])).encode(),
+    }
+
+
+def previous_path(raw: bytes):
+    """What receive_message did before the decoder: parse, check, find statuses, queue the dict"""
+    body = json.loads(raw)
+    if not isinstance(body, dict) or not isinstance(body.get("entry"), list):
+        raise ValueError("Invalid webhook payload")
+    statuses, has_messages = [], False
+    for item in body.get("entry", []):
+        for change in (item.get("changes") or []) if isinstance(item, dict) else []:
+            value = change.get("value") if isinstance(change, dict) else None
+            if not isinstance(value, dict):
+                continue
+            statuses.extend(status for status in value.get("statuses") or [] if isinstance(status, dict))
+            has_messages = has_messages or bool(value.get("messages"))
+    return body if has_messages else None, statuses
+
+
+def decoder_path(raw: bytes):
+    batch = decode(raw)
+    return batch.messages or None, batch.statuses
+
+
+def per_call_us(fn, raw: bytes, iterations: int) -> float:
+    fn(raw)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(raw)
+    return round((time.perf_counter() - started) / iterations * 1e6, 2)
+
+
+def retained_bytes(fn, raw: bytes, count: int = 1000) -> int:
+    """Memory still held per payload by what the endpoint keeps (queued work and statuses)"""
+    tracemalloc.start()
+    kept = [fn(raw) for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size // count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--batch-entries", type=int, default=20, help="Entries in the batched payload")
+    args = parser.parse_args()
+
+    fast_loads = webhook_decoder._loads
+
+    def decoder_stdlib(raw: bytes):
+        webhook_decoder._loads = json.loads
+        try:
+            return decoder_path(raw)
+        finally:
+            webhook_decoder._loads = fast_loads
+
+    variants = {"previous": previous_path, "decoder": decoder_path, "decoder_stdlib_json": decoder_stdlib}
+    if webhook_decoder.orjson is None:
+        del variants["decoder_stdlib_json"]  # decoder already runs on the stdlib parser
+
+    results = {}
+    for name, raw in payloads(args.batch_entries).items():
+        iterations = max(1, args.iterations // (args.batch_entries if name == "batch" else 1))
+        signature = "sha256=" + hmac.new(SECRET.encode(), raw, hashlib.sha256).hexdigest()
+        results[name] = {
+            "bytes": len(raw),
+            "us_per_payload": {variant: per_call_us(fn, raw, iterations) for variant, fn in variants.items()},
+            "retained_bytes_per_payload": {variant: retained_bytes(fn, raw) for variant, fn in variants.items()},
+            "signature_check_us": per_call_us(lambda body: verify_signature(body, signature, SECRET),
+                                              raw, iterations),
+        }
+        speed = results[name]["us_per_payload"]
+        results[name]["speedup"] = round(speed["previous"] / speed["decoder"], 2)
+
+    print(json.dumps({"orjson": webhook_decoder.orjson is not None, "iterations": args.iterations,
+                      **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Script to check the query plans of the CRUD functions.
+It builds a scratch SQLite database with the Alembic migrations, runs every
+CRUD function once, and prints EXPLAIN QUERY PLAN for each SQL statement.
+Exits with status 1 if any statement does a full table scan.
+
+Usage: python explain_queries.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.database import crud, message_status, outbox
+from app.database.catalog import question_catalog
+from app.database.dispatch import dispatch_due_questions
+from app.database.partitions import PartitionLeases
+from app.database.rollup import daily_report, roll_up
+from app.database.schedule import schedule_missing
+from app.database.stats import rebuild_user_stats
+from app.database.user_state import user_states
+from app.database.models import TechArea, Language
+
+
+@contextmanager
+def capture_statements(engine, sink):
+    """Record (statement, parameters) for every query run on the engine"""
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            sink.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def is_full_scan(detail: str) -> bool:
+    """A bare 'SCAN <table>' reads every row; index scans are fine"""
+    return detail.startswith("SCAN ") and " USING " not in detail and "CONSTANT ROW" not in detail
+
+
+def main() -> int:
+    path = os.path.join(tempfile.mkdtemp(), "explain.db")
+    url = f"sqlite:///{path}"
+
+    config = Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.upgrade(config, "head")
+
+    engine = create_engine(url)
+    db = sessionmaker(bind=engine)()
+    # The outbox drain loop runs on async sessions; each check gets its own event loop
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    async_session = async_sessionmaker(async_engine)
+
+    async def drain_cycle():
+        async with async_session() as adb:
+            rows = await outbox.claim(adb, 10, 60)
+            await outbox.complete(adb, [{"row_id": row.id, "new_status": outbox.SENT, "new_attempts": row.attempts,
+                                         "next_at": datetime.utcnow(), "delivered_at": datetime.utcnow(),
+                                         "whatsapp_id": "wamid.explain", "error": None} for row in rows])
+            await outbox.pending_count(adb)
+            await outbox.purge(adb, datetime(2100, 1, 1))
+
+    async def feedback_fetch():
+        from app.services.ai_feedback import FakeFeedbackProvider, FeedbackEngine
+        return await FeedbackEngine(FakeFeedbackProvider(), session_factory=async_session).fetch_pending(10)
+
+    async def status_flush():
+        async with async_session() as adb:
+            for name in ("delivered", "read"):
+                await message_status.upsert(adb, [message_status.status_row("wamid.explain", name, "1760000000")])
+            await message_status.purge(adb, datetime(2000, 1, 1))
+
+    # A little data so every function reaches its queries
+    question = crud.create_question(db, TechArea.PYTHON, "easy", "What is a tuple?")
+    user = crud.create_user(db, "+5511900000000", "Explain", Language.ENGLISH, TechArea.PYTHON)
+    response = crud.create_user_response(db, user.id, question.id, "An immutable sequence")
+    user_id, number, response_id = user.id, user.whatsapp_number, response.id
+
+    partitions = PartitionLeases(owner="explain")
+
+    # The catalog reads the whole (small) questions table once per process by design
+    question_catalog.reload(db)
+
+    checks = [
+        ("get_user_by_whatsapp", lambda: crud.get_user_by_whatsapp(db, number)),
+        ("get_active_users", lambda: crud.get_active_users(db)),
+        ("iter_active_users", lambda: list(crud.iter_active_users(db, chunk_size=100))),
+        ("schedule_missing", lambda: schedule_missing(db)),
+        ("dispatch_due_questions", lambda: dispatch_due_questions(db, limit=100, now=datetime(2100, 1, 1))),
+        ("PartitionLeases.rebalance", lambda: partitions.rebalance(db)),
+        ("dispatch_due_questions(partition)", lambda: dispatch_due_questions(
+            db, limit=100, now=datetime(2100, 1, 1), partition=user_id % 64,
+            fence=partitions.fence(user_id % 64))),
+        ("PartitionLeases.release_all", lambda: partitions.release_all(db)),
+        ("user_states.get", lambda: (user_states.clear(), user_states.get(db, number))),
+        ("deactivate_user", lambda: crud.deactivate_user(db, number)),
+        ("update_last_question_sent", lambda: crud.update_last_question_sent(db, user_id)),
+        ("update_last_question_sent(question)", lambda: crud.update_last_question_sent(db, user_id, question.id)),
+        ("outbox drain cycle", lambda: asyncio.run(drain_cycle())),
+        ("status flush", lambda: asyncio.run(status_flush())),
+        ("get_questions_by_area", lambda: crud.get_questions_by_area(db, TechArea.PYTHON)),
+        ("get_random_question", lambda: crud.get_random_question(db, TechArea.PYTHON, user_id)),
+        ("create_user_response", lambda: crud.create_user_response(db, user_id, question.id, "A tuple")),
+        ("update_response_feedback", lambda: crud.update_response_feedback(db, response_id, "Good", 8)),
+        ("FeedbackEngine.fetch_pending", lambda: asyncio.run(feedback_fetch())),
+        ("get_user_responses", lambda: crud.get_user_responses(db, user_id)),
+        ("get_user_responses_page", lambda: crud.get_user_responses_page(db, user_id, 10, response_id)),
+        ("get_user_progress", lambda: crud.get_user_progress(db, user_id)),
+        ("rebuild_user_stats", lambda: rebuild_user_stats(db)),
+        ("roll_up", lambda: roll_up(db)),
+        ("daily_report", lambda: daily_report(db)),
+    ]
+
+    full_scans = []
+    with engine.connect() as conn:
+        for name, run in checks:
+            statements = []
+            with capture_statements(engine, statements), \
+                    capture_statements(async_engine.sync_engine, statements):
+                run()
+
+            print(f"\n== {name}")
+            for statement, parameters in statements:
+                print("  " + " ".join(statement.split()))
+                plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                for row in plan:
+                    detail = row[-1]
+                    flag = ""
+                    if is_full_scan(detail):
+                        flag = "  <-- FULL SCAN"
+                        full_scans.append((name, detail))
+                    print(f"    {detail}{flag}")
+
+    db.close()
+    engine.dispose()
+    asyncio.run(async_engine.dispose())
+
+    print()
+    if full_scans:
+        print(f"❌ {len(full_scans)} full table scan(s):")
+        for name, detail in full_scans:
+            print(f"  • {name}: {detail}")
+        return 1
+    print("✅ No full table scans")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
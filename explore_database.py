@@ -5,7 +5,11 @@ Use este script para ver dados, adicionar usuários de teste, etc.
 from app.database.database import SessionLocal
 from app.database.models import User, Question, UserResponse, TechArea, Language
 from app.database.crud import *
-from sqlalchemy import text
+from app.database.rollup import daily_report
+from sqlalchemy import func, text
+
+# Quantos usuários listar (a tabela pode ter milhares)
+USERS_SHOWN = 20
 
 def show_all_tables():
     """Mostra todas as tabelas e seus dados"""
@@ -26,21 +30,23 @@ def show_all_tables():
         print(f"❓ Perguntas: {questions_count}")
         print(f"💬 Respostas: {responses_count}")
         
-        # Mostrar usuários
-        print(f"\n👥 USUÁRIOS REGISTRADOS:")
-        users = db.query(User).all()
+        # Mostrar os usuários mais recentes
+        print(f"\n👥 USUÁRIOS REGISTRADOS (últimos {USERS_SHOWN}):")
+        users = db.query(User).order_by(User.id.desc()).limit(USERS_SHOWN).all()
         if users:
             for user in users:
                 status = "🟢 Ativo" if user.is_active else "🔴 Inativo"
                 print(f"  • {user.whatsapp_number} | {user.name} | {user.tech_area.value} | {status}")
+            if users_count > USERS_SHOWN:
+                print(f"  ... e mais {users_count - USERS_SHOWN}")
         else:
             print("  Nenhum usuário registrado ainda")
         
-        # Mostrar perguntas por categoria
+        # Mostrar perguntas por categoria (uma única consulta agrupada)
         print(f"\n❓ PERGUNTAS POR CATEGORIA:")
+        counts = dict(db.query(Question.tech_area, func.count(Question.id)).group_by(Question.tech_area).all())
         for tech_area in TechArea:
-            count = db.query(Question).filter(Question.tech_area == tech_area).count()
-            print(f"  • {tech_area.value}: {count} perguntas")
+            print(f"  • {tech_area.value}: {counts.get(tech_area, 0)} perguntas")
         
         # Mostrar algumas perguntas
         print(f"\n📝 EXEMPLOS DE PERGUNTAS:")
@@ -90,7 +96,7 @@ def show_questions_by_area(tech_area: str):
         
         print(f"\n❓ PERGUNTAS DE {tech_area.upper()}:")
         for i, q in enumerate(questions, 1):
-            print(f"\n{i}. [{q.difficulty}] {q.question_text_pt}")
+            print(f"\n{i}. [{q.difficulty}] {q.text(Language.PORTUGUESE)}")
             if q.expected_concepts:
                 print(f"   Conceitos: {q.expected_concepts}")
         
@@ -101,6 +107,25 @@ def show_questions_by_area(tech_area: str):
     finally:
         db.close()
 
+def show_daily_metrics(days: int = 7):
+    """Mostra as métricas diárias (lidas das tabelas de rollup; atualize com rollup_stats.py)"""
+    db = SessionLocal()
+    
+    try:
+        report = daily_report(db, days=days)
+        print(f"\n📈 MÉTRICAS DIÁRIAS (UTC, até {report['watermark'] or 'nunca calculado'}):")
+        if not report["days"]:
+            print("  Nenhum dia calculado ainda. Rode: python rollup_stats.py")
+        for day in report["days"]:
+            rate = f"{day['response_rate']:.0%}" if day["response_rate"] is not None else "-"
+            print(f"  • {day['day']}: {day['sends']} envios, {day['answers']} respostas, "
+                  f"{day['active_users']} usuários ativos, taxa de resposta {rate}")
+        
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+    finally:
+        db.close()
+
 def run_custom_query(query: str):
     """Executa uma query SQL customizada"""
     db = SessionLocal()
@@ -131,9 +156,10 @@ def main_menu():
         print("2. 👤 Adicionar usuário de teste")
         print("3. ❓ Ver perguntas por área")
         print("4. 🔍 Executar query customizada")
-        print("5. 🚪 Sair")
+        print("5. 📈 Ver métricas diárias")
+        print("6. 🚪 Sair")
         
-        choice = input("\nEscolha uma opção (1-5): ").strip()
+        choice = input("\nEscolha uma opção (1-6): ").strip()
         
         if choice == "1":
             show_all_tables()
@@ -146,6 +172,8 @@ def main_menu():
             query = input("Digite a query SQL: ").strip()
             run_custom_query(query)
         elif choice == "5":
+            show_daily_metrics()
+        elif choice == "6":
             print("👋 Até logo!")
             break
         else:
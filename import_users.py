@@ -0,0 +1,40 @@
+"""
+Script to bulk import users from a CSV or NDJSON file.
+Rows are streamed and upserted on whatsapp_number in chunks, so files of any
+size can be imported with constant memory.
+
+CSV header: whatsapp_number,name,preferred_language,tech_area,agreed_to_messages[,timezone]
+
+Usage: python import_users.py users.csv [--format ndjson] [--chunk-size 1000]
+"""
+import argparse
+import json
+import os
+
+from app.database.database import SessionLocal
+from app.services.user_import import FORMATS, import_users
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users")
+    parser.add_argument("path", help="CSV or NDJSON file")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if os.path.splitext(args.path)[1] in (".ndjson", ".jsonl") else "csv")
+
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8-sig", newline="") as lines:
+            report = import_users(db, lines, fmt=fmt, chunk_size=args.chunk_size)
+        print(f"✅ {report.upserted} users upserted, {report.failed} rows failed")
+        for error in report.errors[:20]:
+            print(f"  • row {error['row']}: {error['error']}")
+        if report.failed > 20:
+            print(f"  ... {report.failed - 20} more")
+        print(json.dumps({k: v for k, v in report.as_dict().items() if k != "errors"}))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
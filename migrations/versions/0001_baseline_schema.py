@@ -0,0 +1,96 @@
+"""Baseline schema
+
+Creates the tables that app.main used to create with Base.metadata.create_all.
+Tables that already exist are left untouched, so this also adopts databases
+created before migrations were introduced.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TECH_AREA = sa.Enum("JAVASCRIPT", "PYTHON", "RUBY", "DSA", name="techarea")
+LANGUAGE = sa.Enum("ENGLISH", "SPANISH", "PORTUGUESE", name="language")
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("whatsapp_number", sa.String(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("preferred_language", LANGUAGE, nullable=False),
+            sa.Column("tech_area", TECH_AREA, nullable=False),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column("last_question_sent", sa.DateTime(timezone=True), nullable=True),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_whatsapp_number", "users", ["whatsapp_number"], unique=True)
+
+    if "questions" not in existing:
+        op.create_table(
+            "questions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("tech_area", TECH_AREA, nullable=False),
+            sa.Column("difficulty", sa.String(), nullable=False),
+            sa.Column("question_text_en", sa.Text(), nullable=False),
+            sa.Column("question_text_es", sa.Text(), nullable=True),
+            sa.Column("question_text_pt", sa.Text(), nullable=True),
+            sa.Column("expected_concepts", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        )
+        op.create_index("ix_questions_id", "questions", ["id"])
+
+    if "user_responses" not in existing:
+        op.create_table(
+            "user_responses",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=False),
+            sa.Column("response_text", sa.Text(), nullable=False),
+            sa.Column("response_type", sa.String(), nullable=False),
+            sa.Column("ai_feedback", sa.Text(), nullable=True),
+            sa.Column("score", sa.Integer(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        )
+        op.create_index("ix_user_responses_id", "user_responses", ["id"])
+
+    if "processed_messages" not in existing:
+        op.create_table(
+            "processed_messages",
+            sa.Column("message_id", sa.String(), primary_key=True),
+            sa.Column("received_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_processed_messages_received_at", "processed_messages", ["received_at"])
+
+    if "question_decks" not in existing:
+        op.create_table(
+            "question_decks",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("tech_area", TECH_AREA, primary_key=True),
+            sa.Column("deck_size", sa.Integer(), nullable=False),
+            sa.Column("multiplier", sa.Integer(), nullable=False),
+            sa.Column("offset", sa.Integer(), nullable=False),
+            sa.Column("cursor", sa.Integer(), nullable=False),
+            sa.Column("recent_question_ids", sa.Text(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        )
+
+
+def downgrade():
+    op.drop_table("question_decks")
+    op.drop_table("processed_messages")
+    op.drop_table("user_responses")
+    op.drop_table("questions")
+    op.drop_table("users")
@@ -0,0 +1,53 @@
+"""Indexes for the hot query shapes
+
+- user_responses (user_id, created_at): per-user history and recent answers
+- user_responses (question_id): joins from questions
+- users (tech_area, id) and (id) WHERE is_active: dispatch over active users
+- questions (tech_area, difficulty): catalog and per-area lookups
+
+Indexes are created with IF NOT EXISTS, and CONCURRENTLY on PostgreSQL, so
+the migration can be applied to a live database.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("is_active = 1")
+
+INDEXES = [
+    ("ix_user_responses_user_id_created_at", "user_responses", ["user_id", "created_at"], None),
+    ("ix_user_responses_question_id", "user_responses", ["question_id"], None),
+    ("ix_users_active_tech_area", "users", ["tech_area", "id"], ACTIVE),
+    ("ix_users_active_id", "users", ["id"], ACTIVE),
+    ("ix_questions_tech_area_difficulty", "questions", ["tech_area", "difficulty"], None),
+]
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    active = sa.text("is_active") if postgresql else ACTIVE
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, where in INDEXES:
+            op.create_index(
+                name, table, columns,
+                if_not_exists=True,
+                sqlite_where=where,
+                postgresql_where=active if where is not None else None,
+                postgresql_concurrently=postgresql,
+            )
+    op.execute("ANALYZE")
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
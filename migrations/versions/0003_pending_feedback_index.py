@@ -0,0 +1,31 @@
+"""Partial index for responses waiting for AI feedback
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("ai_feedback IS NULL")
+
+
+def upgrade():
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_responses_pending_feedback", "user_responses", ["created_at"],
+            if_not_exists=True,
+            sqlite_where=PENDING,
+            postgresql_where=PENDING,
+            postgresql_concurrently=postgresql,
+        )
+
+
+def downgrade():
+    op.drop_index("ix_user_responses_pending_feedback", table_name="user_responses")
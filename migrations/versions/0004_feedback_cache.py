@@ -0,0 +1,42 @@
+"""Feedback cache table
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# The type already exists on PostgreSQL (created with the users table)
+LANGUAGE = sa.Enum("ENGLISH", "SPANISH", "PORTUGUESE", name="language").with_variant(
+    postgresql.ENUM("ENGLISH", "SPANISH", "PORTUGUESE", name="language", create_type=False),
+    "postgresql",
+)
+
+
+def upgrade():
+    if "feedback_cache" in sa.inspect(op.get_bind()).get_table_names():
+        return
+    op.create_table(
+        "feedback_cache",
+        sa.Column("cache_key", sa.String(64), primary_key=True),
+        sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=False),
+        sa.Column("language", LANGUAGE, nullable=False),
+        sa.Column("ai_feedback", sa.Text(), nullable=False),
+        sa.Column("score", sa.Integer(), nullable=True),
+        sa.Column("hits", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_hit_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_feedback_cache_created_at", "feedback_cache", ["created_at"])
+    op.create_index("ix_feedback_cache_last_hit_at", "feedback_cache", ["last_hit_at"])
+
+
+def downgrade():
+    op.drop_table("feedback_cache")
@@ -0,0 +1,43 @@
+"""Per-user timezone and precomputed daily question due time
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("is_active = 1")
+
+
+def upgrade():
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("users")}
+    with op.batch_alter_table("users") as batch:
+        if "timezone" not in columns:
+            batch.add_column(sa.Column("timezone", sa.String(), nullable=False, server_default="UTC"))
+        if "next_question_due_at" not in columns:
+            # Filled in by the scheduler (schedule.schedule_missing) on its first tick
+            batch.add_column(sa.Column("next_question_due_at", sa.DateTime(timezone=True), nullable=True))
+
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    active = sa.text("is_active") if postgresql else ACTIVE
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_active_due", "users", ["next_question_due_at"],
+            if_not_exists=True,
+            sqlite_where=ACTIVE,
+            postgresql_where=active,
+            postgresql_concurrently=postgresql,
+        )
+
+
+def downgrade():
+    op.drop_index("ix_users_active_due", table_name="users")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("next_question_due_at")
+        batch.drop_column("timezone")
@@ -0,0 +1,29 @@
+"""Open question per user for inbound message routing
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("users")}
+    if "pending_question_id" in columns:
+        return
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("pending_question_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_users_pending_question_id", "questions",
+                                 ["pending_question_id"], ["id"])
+
+
+def downgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.drop_constraint("fk_users_pending_question_id", type_="foreignkey")
+        batch.drop_column("pending_question_id")
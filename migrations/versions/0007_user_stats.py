@@ -0,0 +1,52 @@
+"""Per-user progress aggregates
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+The tables start empty; fill them with `python backfill_stats.py`.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# The type already exists on PostgreSQL (created with the users table)
+TECH_AREA = sa.Enum("JAVASCRIPT", "PYTHON", "RUBY", "DSA", name="techarea").with_variant(
+    postgresql.ENUM("JAVASCRIPT", "PYTHON", "RUBY", "DSA", name="techarea", create_type=False),
+    "postgresql",
+)
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if "user_stats" not in tables:
+        op.create_table(
+            "user_stats",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("responses", sa.Integer(), nullable=False),
+            sa.Column("scored", sa.Integer(), nullable=False),
+            sa.Column("score_sum", sa.Integer(), nullable=False),
+            sa.Column("current_streak", sa.Integer(), nullable=False),
+            sa.Column("best_streak", sa.Integer(), nullable=False),
+            sa.Column("last_answered_day", sa.Date(), nullable=True),
+            sa.Column("last_answered_at", sa.DateTime(timezone=True), nullable=True),
+        )
+    if "user_area_stats" not in tables:
+        op.create_table(
+            "user_area_stats",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("tech_area", TECH_AREA, primary_key=True),
+            sa.Column("responses", sa.Integer(), nullable=False),
+            sa.Column("scored", sa.Integer(), nullable=False),
+            sa.Column("score_sum", sa.Integer(), nullable=False),
+        )
+
+
+def downgrade():
+    op.drop_table("user_area_stats")
+    op.drop_table("user_stats")
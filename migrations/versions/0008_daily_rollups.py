@@ -0,0 +1,79 @@
+"""Question send log and daily analytics rollups
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Sends are only logged from this revision on; earlier days show answers only.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if "question_sends" not in tables:
+        op.create_table(
+            "question_sends",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=False),
+            sa.Column("sent_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_question_sends_sent_at", "question_sends", ["sent_at"])
+    if "daily_stats" not in tables:
+        op.create_table(
+            "daily_stats",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("sends", sa.Integer(), nullable=False),
+            sa.Column("recipients", sa.Integer(), nullable=False),
+            sa.Column("responders", sa.Integer(), nullable=False),
+            sa.Column("answers", sa.Integer(), nullable=False),
+            sa.Column("active_users", sa.Integer(), nullable=False),
+            sa.Column("scored", sa.Integer(), nullable=False),
+            sa.Column("score_sum", sa.Integer(), nullable=False),
+            sa.Column("computed_at", sa.DateTime(), nullable=False),
+        )
+    if "daily_breakdowns" not in tables:
+        op.create_table(
+            "daily_breakdowns",
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("dimension", sa.String(), primary_key=True),
+            sa.Column("value", sa.String(), primary_key=True),
+            sa.Column("sends", sa.Integer(), nullable=False),
+            sa.Column("recipients", sa.Integer(), nullable=False),
+            sa.Column("responders", sa.Integer(), nullable=False),
+            sa.Column("answers", sa.Integer(), nullable=False),
+            sa.Column("active_users", sa.Integer(), nullable=False),
+            sa.Column("scored", sa.Integer(), nullable=False),
+            sa.Column("score_sum", sa.Integer(), nullable=False),
+        )
+    if "rollup_watermarks" not in tables:
+        op.create_table(
+            "rollup_watermarks",
+            sa.Column("name", sa.String(), primary_key=True),
+            sa.Column("watermark", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_responses_created_at", "user_responses", ["created_at"],
+            if_not_exists=True,
+            postgresql_concurrently=postgresql,
+        )
+
+
+def downgrade():
+    op.drop_index("ix_user_responses_created_at", table_name="user_responses")
+    op.drop_table("rollup_watermarks")
+    op.drop_table("daily_breakdowns")
+    op.drop_table("daily_stats")
+    op.drop_index("ix_question_sends_sent_at", table_name="question_sends")
+    op.drop_table("question_sends")
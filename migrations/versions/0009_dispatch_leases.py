@@ -0,0 +1,46 @@
+"""Leases and per-partition due index for multi-worker dispatch
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+
+The partition count (64) is part of the index expression and must match
+models.DISPATCH_PARTITIONS.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+ACTIVE = sa.text("is_active = 1")
+PARTITION = sa.text("(id % 64)")
+
+
+def upgrade():
+    if "leases" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "leases",
+            sa.Column("name", sa.String(), primary_key=True),
+            sa.Column("owner", sa.String(), nullable=True),
+            sa.Column("token", sa.Integer(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+        )
+
+    postgresql = op.get_bind().dialect.name == "postgresql"
+    active = sa.text("is_active") if postgresql else ACTIVE
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_active_partition_due", "users", [PARTITION, "next_question_due_at"],
+            if_not_exists=True,
+            sqlite_where=ACTIVE,
+            postgresql_where=active,
+            postgresql_concurrently=postgresql,
+        )
+
+
+def downgrade():
+    op.drop_index("ix_users_active_partition_due", table_name="users")
+    op.drop_table("leases")
@@ -0,0 +1,43 @@
+"""Transactional outbox for outbound WhatsApp messages
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+PENDING = sa.text("status = 'pending'")
+
+
+def upgrade():
+    if "outbox" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "outbox",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("recipient", sa.String(), nullable=False),
+            sa.Column("kind", sa.String(), nullable=False),
+            sa.Column("payload", sa.Text(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("available_at", sa.DateTime(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("sent_at", sa.DateTime(), nullable=True),
+            sa.Column("message_id", sa.String(), nullable=True),
+            sa.Column("last_error", sa.Text(), nullable=True),
+        )
+    op.create_index("ix_outbox_created_at", "outbox", ["created_at"], if_not_exists=True)
+    op.create_index("ix_outbox_pending", "outbox", ["available_at"], if_not_exists=True,
+                    sqlite_where=PENDING, postgresql_where=PENDING)
+
+
+def downgrade():
+    op.drop_index("ix_outbox_pending", table_name="outbox")
+    op.drop_index("ix_outbox_created_at", table_name="outbox")
+    op.drop_table("outbox")
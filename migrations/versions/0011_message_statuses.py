@@ -0,0 +1,50 @@
+"""Delivery status of outbound messages and its daily rollup counters
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+COUNTERS = ("tracked", "delivered", "read", "undelivered")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if "message_statuses" not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            "message_statuses",
+            sa.Column("message_id", sa.String(), primary_key=True),
+            sa.Column("recipient", sa.String(), nullable=True),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("sent_at", sa.DateTime(), nullable=True),
+            sa.Column("delivered_at", sa.DateTime(), nullable=True),
+            sa.Column("read_at", sa.DateTime(), nullable=True),
+            sa.Column("failed_at", sa.DateTime(), nullable=True),
+            sa.Column("error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=False),
+        )
+    op.create_index("ix_message_statuses_created_at", "message_statuses", ["created_at"],
+                    if_not_exists=True)
+
+    columns = {c["name"] for c in sa.inspect(bind).get_columns("daily_stats")}
+    missing = [name for name in COUNTERS if name not in columns]
+    if missing:
+        with op.batch_alter_table("daily_stats") as batch:
+            for name in missing:
+                batch.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default="0"))
+
+
+def downgrade():
+    with op.batch_alter_table("daily_stats") as batch:
+        for name in COUNTERS:
+            batch.drop_column(name)
+    op.drop_index("ix_message_statuses_created_at", table_name="message_statuses")
+    op.drop_table("message_statuses")
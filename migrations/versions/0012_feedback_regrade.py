@@ -0,0 +1,36 @@
+"""Regrade responses that got fallback feedback
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+RETRY = sa.text("feedback_retry_at IS NOT NULL")
+
+
+def upgrade():
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("user_responses")}
+    if "feedback_retry_at" not in columns:
+        with op.batch_alter_table("user_responses") as batch:
+            batch.add_column(sa.Column("feedback_retry_at", sa.DateTime(), nullable=True))
+            batch.add_column(sa.Column("feedback_regrades", sa.Integer(), nullable=False, server_default="0"))
+    op.create_index(
+        "ix_user_responses_feedback_retry", "user_responses", ["feedback_retry_at"],
+        if_not_exists=True,
+        sqlite_where=RETRY,
+        postgresql_where=RETRY,
+    )
+
+
+def downgrade():
+    op.drop_index("ix_user_responses_feedback_retry", table_name="user_responses")
+    with op.batch_alter_table("user_responses") as batch:
+        batch.drop_column("feedback_regrades")
+        batch.drop_column("feedback_retry_at")
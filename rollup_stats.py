@@ -0,0 +1,55 @@
+"""
+Script to refresh the daily analytics rollups and print a report.
+Only the days since the last run are recomputed, so it can run from cron
+every few minutes; the report reads the rollup tables only.
+
+Usage: python rollup_stats.py [--days 14] [--since 2026-01-01] [--report-only] [--json]
+"""
+import argparse
+import json
+from datetime import date
+
+from app.database.database import SessionLocal
+from app.database.rollup import daily_report, roll_up
+
+def _percent(value):
+    return f"{value:.0%}" if value is not None else "-"
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh and print daily analytics")
+    parser.add_argument("--days", type=int, default=14, help="Days to print")
+    parser.add_argument("--since", type=date.fromisoformat, help="Recompute from this day (YYYY-MM-DD)")
+    parser.add_argument("--report-only", action="store_true", help="Don't refresh the rollups first")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not args.report_only:
+            run = roll_up(db, since=args.since)
+            if not args.json:
+                print(f"✅ Rolled up {run['days']} day(s) from {run['from']} in {run['seconds']}s")
+        report = daily_report(db, days=args.days)
+    finally:
+        db.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"\n📈 Daily metrics (UTC, rolled up to {report['watermark']})")
+    print(f"{'day':<12}{'sends':>8}{'answers':>9}{'DAU':>7}{'resp. rate':>12}{'avg score':>11}"
+          f"{'delivered':>11}{'read':>8}")
+    for day in report["days"]:
+        average = f"{day['average_score']:.1f}" if day["average_score"] is not None else "-"
+        print(f"{day['day']:<12}{day['sends']:>8}{day['answers']:>9}{day['active_users']:>7}"
+              f"{_percent(day['response_rate']):>12}{average:>11}"
+              f"{_percent(day['delivery_rate']):>11}{_percent(day['read_rate']):>8}")
+        for dimension in ("by_tech_area", "by_language"):
+            parts = [f"{value} {_percent(row['response_rate'])}"
+                     for value, row in sorted(day[dimension].items())]
+            if parts:
+                print(f"{'':<12}{dimension[3:]}: " + ", ".join(parts))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Test configuration.
+Settings are read when app.core.config is imported, so the environment is
+set up here first: a throwaway SQLite file and dummy WhatsApp credentials.
+"""
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="interview-bot-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ.setdefault("WHATSAPP_ACCESS_TOKEN", "test-token")
+os.environ.setdefault("WHATSAPP_PHONE_NUMBER_ID", "106540352242922")
+os.environ.setdefault("WEBHOOK_VERIFY_TOKEN", "test-verify")
+os.environ.pop("WHATSAPP_APP_SECRET", None)
+for flag in ("AI_FEEDBACK_ENABLED", "AUDIO_TRANSCRIPTION_ENABLED", "SCHEDULER_ENABLED", "OUTBOX_ENABLED"):
+    os.environ[flag] = "false"
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Create the schema once for the tests that touch the database"""
+    from app.database import models  # noqa: F401  Registers the tables
+    from app.database.database import Base, engine
+
+    Base.metadata.create_all(engine)
+    return engine
@@ -0,0 +1,135 @@
+"""AI feedback engine against the fake provider"""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app.database import crud
+from app.database.database import SessionLocal
+from app.database.models import Language, TechArea, UserResponse, UserStats
+from app.services.ai_feedback import (FALLBACK_FEEDBACK, FakeFeedbackProvider, FeedbackEngine, GradingItem,
+                                      GradingResult)
+
+
+class FlakyProvider(FakeFeedbackProvider):
+    """Fails the first `failures` calls, then grades like the fake provider"""
+
+    def __init__(self, failures: int):
+        super().__init__(latency=0, jitter=0)
+        self.failures = failures
+
+    async def grade(self, item):
+        if self.calls < self.failures:
+            self.calls += 1
+            raise RuntimeError("provider unavailable")
+        return await super().grade(item)
+
+
+def responses(db, number: str, answers):
+    """A user with one response per answer; returns the response ids"""
+    question = crud.create_question(db, TechArea.PYTHON, "easy", f"Question for {number}")
+    user = crud.create_user(db, number, "Grader", Language.ENGLISH, TechArea.PYTHON)
+    return user.id, [crud.create_user_response(db, user.id, question.id, answer).id for answer in answers]
+
+
+def rows(db, ids):
+    db.expire_all()
+    return {row.id: row for row in db.execute(select(UserResponse).where(UserResponse.id.in_(ids))).scalars()}
+
+
+def grade(provider, **kwargs):
+    engine = FeedbackEngine(provider, max_concurrency=2, poll_interval=0.05, flush_interval=0.05, **kwargs)
+    asyncio.run(engine.run_until_idle(timeout=10))
+    return engine
+
+
+def test_workers_grade_earliest_deadline_first():
+    order = []
+
+    class RecordingProvider:
+        async def grade(self, item):
+            order.append(item.response_id)
+            return GradingResult(feedback="ok", score=5)
+
+    engine = FeedbackEngine(RecordingProvider(), max_concurrency=1)
+
+    async def run():
+        engine._cond, engine._flush_now = asyncio.Condition(), asyncio.Event()
+        items = [GradingItem(deadline=deadline, response_id=i, user_id=1, question_id=1, question_text="q",
+                             expected_concepts=None, response_text="a", language=Language.ENGLISH,
+                             created_at=0.0)
+                 for i, deadline in enumerate([30.0, 10.0, 40.0, 20.0])]
+        await engine._admit(items)
+        worker = asyncio.create_task(engine._worker())
+        while len(order) < len(items):
+            await asyncio.sleep(0.01)
+        worker.cancel()
+
+    asyncio.run(run())
+    assert order == [1, 3, 0, 2]
+
+
+def test_batched_flush_writes_responses_and_aggregates(database):
+    db = SessionLocal()
+    try:
+        user_id, ids = responses(db, "+15550300001", ["one two three four five six", "a b c d e f g h i"])
+        engine = grade(FakeFeedbackProvider(latency=0, jitter=0))
+        assert engine.batches_written >= 1
+
+        graded = rows(db, ids)
+        assert [graded[i].score for i in ids] == [2, 3]
+        assert all(graded[i].ai_feedback.startswith("[fake]") for i in ids)
+        stats = db.get(UserStats, user_id)
+        assert (stats.responses, stats.scored, stats.score_sum) == (2, 2, 5)
+    finally:
+        db.close()
+
+
+def test_retries_before_giving_up(database):
+    provider = FlakyProvider(failures=2)
+    db = SessionLocal()
+    try:
+        _, ids = responses(db, "+15550300002", ["one two three"])
+        engine = grade(provider, max_attempts=3)
+        assert provider.calls == 3 and engine.fallbacks == 0
+        assert rows(db, ids)[ids[0]].score == 1
+    finally:
+        db.close()
+
+
+def test_fallback_is_regraded_later(database):
+    db = SessionLocal()
+    try:
+        user_id, ids = responses(db, "+15550300003", ["one two three four five six"])
+        engine = grade(FlakyProvider(failures=3), max_attempts=3)
+        assert engine.fallbacks == 1
+
+        row = rows(db, ids)[ids[0]]
+        assert row.ai_feedback == FALLBACK_FEEDBACK[Language.ENGLISH] and row.score is None
+        assert row.feedback_retry_at is not None and row.feedback_regrades == 0
+
+        # Not due yet: nothing to do
+        assert grade(FakeFeedbackProvider(latency=0, jitter=0)).graded == 0
+
+        db.execute(update(UserResponse).where(UserResponse.id == ids[0])
+                   .values(feedback_retry_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+        engine = grade(FakeFeedbackProvider(latency=0, jitter=0))
+        assert engine.regraded == 1
+
+        row = rows(db, ids)[ids[0]]
+        assert row.score == 2 and row.feedback_retry_at is None and row.feedback_regrades == 1
+        assert db.get(UserStats, user_id).scored == 1
+    finally:
+        db.close()
+
+
+def test_fallback_is_final_after_max_regrades(database):
+    db = SessionLocal()
+    try:
+        _, ids = responses(db, "+15550300004", ["one two three"])
+        grade(FlakyProvider(failures=100), max_attempts=1, max_regrades=0)
+        row = rows(db, ids)[ids[0]]
+        assert row.ai_feedback == FALLBACK_FEEDBACK[Language.ENGLISH] and row.feedback_retry_at is None
+    finally:
+        db.close()
@@ -0,0 +1,18 @@
+"""Question lookups served by the question catalog"""
+from app.database import crud
+from app.database.database import SessionLocal
+from app.database.models import Language, TechArea
+
+
+def test_questions_by_area_come_from_the_catalog(database):
+    db = SessionLocal()
+    try:
+        question = crud.create_question(db, TechArea.RUBY, "easy", "What is a block?",
+                                        question_text_pt="O que é um bloco?")
+        questions = crud.get_questions_by_area(db, TechArea.RUBY)
+        assert question.id in [q.id for q in questions]
+        record = next(q for q in questions if q.id == question.id)
+        assert record.text(Language.PORTUGUESE) == "O que é um bloco?"
+        assert all(q.tech_area == TechArea.RUBY for q in questions)
+    finally:
+        db.close()
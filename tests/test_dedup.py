@@ -0,0 +1,46 @@
+"""Message deduplication in the webhook workers"""
+import asyncio
+
+from app.services import webhook_processor
+from app.services.dedup import MessageDeduplicator
+from app.services.webhook_decoder import InboundMessage
+
+
+def test_second_delivery_is_a_duplicate():
+    dedup = MessageDeduplicator()
+
+    async def run():
+        return [await dedup.is_duplicate("wamid.1"), await dedup.is_duplicate("wamid.1")]
+
+    assert asyncio.run(run()) == [False, True]
+
+
+def test_forget_lets_the_redelivery_through(database):
+    dedup = MessageDeduplicator(persist=True)
+
+    async def run():
+        await dedup.is_duplicate("wamid.forget")
+        await dedup.forget("wamid.forget")
+        return await dedup.is_duplicate("wamid.forget")
+
+    assert asyncio.run(run()) is False
+
+
+def test_failed_message_is_not_recorded_and_the_rest_are_handled(monkeypatch):
+    dedup = MessageDeduplicator()
+    monkeypatch.setattr(webhook_processor, "deduplicator", dedup)
+    handled = []
+
+    async def lookup(wa_id):
+        if wa_id == "15550001111":
+            raise RuntimeError("database unavailable")
+        handled.append(wa_id)
+
+    monkeypatch.setattr(webhook_processor, "lookup_sender", lookup)
+    messages = [InboundMessage(message_id="wamid.fail", sender="15550001111", type="text", text="hi"),
+                InboundMessage(message_id="wamid.next", sender="15550002222", type="text", text="hi")]
+
+    asyncio.run(webhook_processor.process_messages(messages))
+    assert handled == ["15550002222"]
+    assert asyncio.run(dedup.is_duplicate("wamid.fail")) is False
+    assert asyncio.run(dedup.is_duplicate("wamid.next")) is True
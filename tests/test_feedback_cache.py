@@ -0,0 +1,39 @@
+"""Two-tier AI feedback cache"""
+import asyncio
+
+from sqlalchemy import select
+
+from app.database import crud
+from app.database.database import AsyncSessionLocal, SessionLocal
+from app.database.models import FeedbackCacheEntry, Language, TechArea
+from app.services.feedback_cache import FeedbackCache, cache_key
+
+
+def test_memory_hits_keep_an_entry_from_being_pruned(database):
+    db = SessionLocal()
+    try:
+        question_id = crud.create_question(db, TechArea.JAVASCRIPT, "easy", "Cache question").id
+    finally:
+        db.close()
+    hot, cold = (cache_key(question_id, Language.ENGLISH, answer) for answer in ("hot answer", "cold answer"))
+
+    async def run():
+        cache = FeedbackCache(max_rows=1)
+        async with AsyncSessionLocal() as session:
+            cache.put(hot, question_id, Language.ENGLISH, "Hot", 4)
+            await cache.flush(session)
+            await asyncio.sleep(0.01)
+            cache.put(cold, question_id, Language.ENGLISH, "Cold", 2)
+            await cache.flush(session)
+            await session.commit()
+
+            assert await cache.lookup(session, [hot]) == {hot: ("Hot", 4)}
+            assert cache.memory_hits == 1
+            await cache.flush(session)
+            await cache.prune(session)
+            await session.commit()
+            return {key: hits for key, hits in await session.execute(
+                select(FeedbackCacheEntry.cache_key, FeedbackCacheEntry.hits)
+                .where(FeedbackCacheEntry.cache_key.in_([hot, cold])))}
+
+    assert asyncio.run(run()) == {hot: 1}
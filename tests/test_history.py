@@ -0,0 +1,41 @@
+"""Response history export"""
+import asyncio
+
+from app.database import crud
+from app.database.database import AsyncSessionLocal, SessionLocal
+from app.database.history import export_query, stream_ndjson
+from app.database.models import Language, TechArea
+
+
+def test_export_closes_its_session_when_the_consumer_stops_early(database):
+    db = SessionLocal()
+    try:
+        question = crud.create_question(db, TechArea.PYTHON, "easy", "Export question")
+        user = crud.create_user(db, "+15550400001", "Exporter", Language.ENGLISH, TechArea.PYTHON)
+        for i in range(3):
+            crud.create_user_response(db, user.id, question.id, f"answer {i}")
+        user_id = user.id
+    finally:
+        db.close()
+
+    closed = []
+
+    def session_factory():
+        session = AsyncSessionLocal()
+        close = session.close
+
+        async def tracked_close():
+            closed.append(session)
+            await close()
+
+        session.close = tracked_close
+        return session
+
+    async def run():
+        chunks = stream_ndjson(session_factory, export_query(user_id), batch_size=1)
+        first = await chunks.__anext__()
+        await chunks.aclose()  # What the server does when the client disconnects
+        assert len(closed) == 1  # Before the loop's shutdown would finalize it
+        return first
+
+    assert b"answer 0" in asyncio.run(run())
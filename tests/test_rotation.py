@@ -0,0 +1,26 @@
+"""Question rotation decks"""
+from app.database import crud
+from app.database.database import SessionLocal
+from app.database.models import Language, TechArea
+
+
+def test_draw_is_kept_only_when_the_caller_commits(database):
+    db = SessionLocal()
+    try:
+        for i in range(3):
+            crud.create_question(db, TechArea.DSA, "easy", f"Rotation question {i}")
+        user = crud.create_user(db, "+15550009001", "Deck", Language.ENGLISH, TechArea.DSA)
+
+        crud.get_random_question(db, TechArea.DSA, user.id)
+        db.commit()  # Sent: the deck now exists
+
+        first = crud.get_random_question(db, TechArea.DSA, user.id)
+        db.rollback()  # Fetched but never sent
+        assert crud.get_random_question(db, TechArea.DSA, user.id).id == first.id
+
+        # Drawing again in the same transaction advances the same (flushed) deck
+        second = crud.get_random_question(db, TechArea.DSA, user.id)
+        assert second.id != first.id
+        db.commit()
+    finally:
+        db.close()
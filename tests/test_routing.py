@@ -0,0 +1,40 @@
+"""Reader/writer routing of sessions"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import text
+
+from app.database.database import SessionLocal, _write_lock, engine, read_engine
+
+
+@pytest.mark.parametrize("sql, writes", [
+    ("SELECT 1", False),
+    ("  explain query plan SELECT * FROM users", False),
+    ("UPDATE users SET name = name", True),
+    ("PRAGMA journal_mode=WAL", True),
+    ("WITH x AS (SELECT 1) DELETE FROM users", True),
+])
+def test_raw_sql_goes_to_the_writer_only_when_it_may_write(sql, writes):
+    if read_engine is engine:
+        pytest.skip("reads and writes share one engine")
+    db = SessionLocal()
+    try:
+        assert db.get_bind(clause=text(sql)) is (engine if writes else read_engine)
+    finally:
+        db.close()
+
+
+def test_health_probe_does_not_wait_for_the_writer(database):
+    from app.main import app
+
+    async def probe():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.wait_for(client.get("/health"), timeout=5)
+
+    assert _write_lock.acquire(timeout=5)  # As if a long write held the writer
+    try:
+        response = asyncio.run(probe())
+    finally:
+        _write_lock.release()
+    assert response.status_code == 200 and response.json()["database"]["status"] == "connected"
@@ -0,0 +1,31 @@
+"""Question scheduler"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from app.services.scheduler import QuestionScheduler
+
+
+def test_first_tick_is_due_now_whatever_the_local_timezone(monkeypatch, database):
+    monkeypatch.setenv("TZ", "Asia/Tokyo")
+    time.tzset()
+    try:
+        scheduler = QuestionScheduler()
+
+        async def no_tick():
+            pass
+
+        scheduler.tick = no_tick
+
+        async def run():
+            await scheduler.start()
+            try:
+                return scheduler._scheduler.get_job("dispatch-due-questions").next_run_time
+            finally:
+                await scheduler.stop()
+
+        next_run = asyncio.run(run())
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+    assert abs(next_run - datetime.now(timezone.utc)) < timedelta(seconds=5)
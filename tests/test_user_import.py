@@ -0,0 +1,79 @@
+"""Bulk user import"""
+import asyncio
+
+from app.database import crud
+from app.database.database import AsyncSessionLocal, SessionLocal
+from app.services.user_import import MAX_RECORD_LINES, RowParser, import_users, import_users_async
+
+CSV = (
+    "whatsapp_number,name,preferred_language,tech_area,agreed_to_messages\n"
+    '+15550100001,"Ana\nSecond line, with a comma",en,python,yes\n'
+    "+15550100002,Bruno,pt,ruby,yes\n"
+    '+15550100003,"Say ""hi""",es,dsa,no\n'
+)
+
+
+def parse(parser: RowParser, lines):
+    rows = [row for line in lines for row in parser.parse(line)]
+    return rows + parser.finish()
+
+
+def test_quoted_fields_span_lines():
+    parser = RowParser("csv")
+    rows = parse(parser, CSV.splitlines(keepends=True))
+    assert [number for number, _ in rows] == [2, 4, 5]
+    assert rows[0][1]["name"] == "Ana\nSecond line, with a comma"
+    assert rows[2][1]["name"] == 'Say "hi"'
+
+
+def test_unterminated_quote_is_a_row_error():
+    rows = parse(RowParser("csv"), ["number,name\n", '+15550100009,"Open\n', "never,closed\n"])
+    assert [(number, type(raw)) for number, raw in rows] == [(2, ValueError), (3, dict)]
+    assert str(rows[0][1]) == "Unterminated quoted field"
+
+
+def test_stray_quote_mid_field_is_kept_literally():
+    lines = ["number,name\n", '+15550100010,Ana "Bo\n', "+15550100011,Bruno\n"]
+    assert parse(RowParser("csv"), lines) == [(2, {"number": "+15550100010", "name": 'Ana "Bo'}),
+                                              (3, {"number": "+15550100011", "name": "Bruno"})]
+
+
+def test_stray_opening_quote_does_not_swallow_the_rows_after_it():
+    valid = [f"+155501{i:05d},Row {i}\n" for i in range(MAX_RECORD_LINES * 2)]
+    parser = RowParser("csv")
+    rows, buffered = [], 0
+    for line in ["number,name\n", '+15550100012,"Stray\n'] + valid:
+        rows.extend(parser.parse(line))
+        buffered = max(buffered, len(parser._lines))
+    rows.extend(parser.finish())
+
+    assert buffered <= MAX_RECORD_LINES
+    assert rows[0][0] == 2 and isinstance(rows[0][1], ValueError)
+    assert [raw["name"] for _, raw in rows[1:]] == [f"Row {i}" for i in range(len(valid))]
+    assert [number for number, _ in rows[1:]] == list(range(3, 3 + len(valid)))
+
+
+def test_import_keeps_multiline_names(database):
+    db = SessionLocal()
+    try:
+        report = import_users(db, CSV.splitlines(keepends=True))
+        assert (report.upserted, report.failed) == (2, 1)
+        assert report.errors[0]["row"] == 5
+        assert crud.get_user_by_whatsapp(db, "+15550100001").name == "Ana\nSecond line, with a comma"
+    finally:
+        db.close()
+
+
+def test_streamed_import_with_a_field_split_across_chunks(database):
+    body = CSV.replace("+1555010", "+1555020").encode()
+
+    async def chunks():
+        for start in range(0, len(body), 7):  # Splits lines and the quoted field
+            yield body[start:start + 7]
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await import_users_async(db, chunks())
+
+    report = asyncio.run(run())
+    assert (report.rows, report.upserted, report.failed) == (3, 2, 1)
@@ -0,0 +1,53 @@
+"""User endpoints"""
+import asyncio
+
+import httpx
+
+from app.database import crud
+from app.database.database import SessionLocal
+
+
+def call(method: str, url: str, **kwargs) -> httpx.Response:
+    from app.main import app
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+
+    return asyncio.run(run())
+
+
+def test_numbers_are_stored_and_looked_up_normalized(database):
+    registration = {"whatsapp_number": "55 11 99999-0001", "preferred_language": "pt", "tech_area": "python",
+                    "agreed_to_messages": True, "name": "Normalized"}
+    response = call("POST", "/api/users/register", json=registration)
+    assert response.status_code == 200
+    assert response.json()["whatsapp_number"] == "+5511999990001"
+
+    db = SessionLocal()
+    try:
+        assert crud.get_user_by_whatsapp(db, "+5511999990001") is not None
+    finally:
+        db.close()
+
+    assert call("POST", "/api/users/register", json={**registration, "whatsapp_number": "+5511999990001"}
+                ).status_code == 409
+    assert call("GET", "/api/users/5511999990001/progress").status_code == 200
+    assert call("POST", "/api/users/unsubscribe/5511999990001").status_code == 200
+
+
+def test_number_without_digits_is_rejected(database):
+    assert call("GET", "/api/users/not-a-number/progress").status_code == 400
+
+
+def test_bulk_export_requires_the_admin_token(database, monkeypatch):
+    from app.core.config import settings
+
+    assert call("GET", "/api/users/responses/export").status_code == 403  # No token configured
+
+    monkeypatch.setattr(settings, "admin_api_token", "s3cret")
+    assert call("GET", "/api/users/responses/export").status_code == 401
+    assert call("GET", "/api/users/responses/export", headers={"X-Admin-Token": "wrong"}).status_code == 401
+    response = call("GET", "/api/users/responses/export", headers={"X-Admin-Token": "s3cret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
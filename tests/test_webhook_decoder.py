@@ -0,0 +1,49 @@
+"""Webhook payload decoding"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.webhook_decoder import WebhookDecodeError, decode
+
+
+def body(value) -> bytes:
+    return json.dumps({"entry": [{"changes": [{"value": value}]}]}).encode()
+
+
+def test_text_message_and_status():
+    batch = decode(body({
+        "messages": [{"id": "wamid.1", "from": "15550001111", "type": "text", "text": {"body": "hi"}}],
+        "statuses": [{"id": "wamid.2", "status": "failed", "errors": [{"code": 131047, "title": "Expired"}]}],
+    }))
+    assert [(m.message_id, m.sender, m.text) for m in batch.messages] == [("wamid.1", "15550001111", "hi")]
+    assert [(s.message_id, s.error) for s in batch.statuses] == [("wamid.2", "131047: Expired")]
+
+
+@pytest.mark.parametrize("value", [
+    {"messages": 5},
+    {"statuses": 5},
+    {"messages": {"id": "wamid.1"}, "statuses": "delivered"},
+    {"messages": [{"id": "wamid.1", "type": ["text"]}]},
+])
+def test_malformed_items_are_skipped(value):
+    batch = decode(body(value))
+    assert batch.statuses == []
+    assert all(message.type == "" for message in batch.messages)
+
+
+def test_non_payload_is_a_decode_error():
+    with pytest.raises(WebhookDecodeError):
+        decode(b'{"entry": 5}')
+
+
+def test_malformed_messages_do_not_fail_the_webhook(database):
+    from app.main import app
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/webhook/whatsapp", content=body({"messages": 5}))
+
+    response = asyncio.run(post())
+    assert response.status_code == 200
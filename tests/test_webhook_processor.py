@@ -0,0 +1,36 @@
+"""Processing of queued webhook messages"""
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+
+from app.database.models import Language
+from app.services import webhook_processor
+from app.services.dedup import MessageDeduplicator
+from app.services.webhook_decoder import InboundMessage
+
+
+class Pipeline:
+    async def transcribe_media(self, media_id, language):
+        raise BrokenProcessPool("worker died")
+
+
+class State:
+    is_active = True
+    preferred_language = Language.ENGLISH
+
+
+def test_failed_transcription_does_not_drop_sibling_messages(monkeypatch):
+    handled = []
+
+    async def lookup_sender(wa_id):
+        handled.append(wa_id)
+        return State()
+
+    monkeypatch.setattr(webhook_processor, "deduplicator", MessageDeduplicator())
+    monkeypatch.setattr(webhook_processor, "lookup_sender", lookup_sender)
+    monkeypatch.setattr(webhook_processor, "get_audio_pipeline", lambda: Pipeline())
+    monkeypatch.setattr(webhook_processor.settings, "audio_transcription_enabled", True)
+
+    messages = [InboundMessage(message_id="wamid.voice", sender="15550400001", type="audio", media_id="m1"),
+                InboundMessage(message_id="wamid.text", sender="15550400002", type="text", text="hi")]
+    asyncio.run(webhook_processor.process_messages(messages))
+    assert handled == ["15550400001", "15550400002"]
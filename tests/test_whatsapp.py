@@ -0,0 +1,100 @@
+"""WhatsAppSender against a local stub of the Cloud API (httpx.MockTransport)"""
+import asyncio
+import time
+
+import httpx
+
+from app.services.whatsapp import WhatsAppSender
+
+
+def sender(handler, **kwargs) -> WhatsAppSender:
+    options = {"rate_limit_per_second": 1e9, "backoff_base": 0.001, "http2": False, **kwargs}
+    return WhatsAppSender(access_token="test", phone_number_id="123", base_url="http://stub",
+                          transport=httpx.MockTransport(handler), **options)
+
+
+def accepted(message_id: str = "wamid.1") -> httpx.Response:
+    return httpx.Response(200, json={"messages": [{"id": message_id}]})
+
+
+def test_retries_429_after_retry_after():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.2"}, text="rate limited")
+        return accepted()
+
+    async def run():
+        async with sender(handler) as client:
+            return await client.send_text("+15550001111", "hi")
+
+    result = asyncio.run(run())
+    assert result.ok and result.message_id == "wamid.1"
+    assert result.attempts == 2
+    assert calls[1] - calls[0] >= 0.2
+
+
+def test_gives_up_after_max_retries():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(503, text="unavailable")
+
+    async def run():
+        async with sender(handler, max_retries=2) as client:
+            return await client.send_text("+15550001111", "hi")
+
+    result = asyncio.run(run())
+    assert not result.ok
+    assert result.status_code == 503
+    assert result.attempts == len(calls) == 3
+
+
+def test_does_not_retry_client_errors():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(400, json={"error": {"message": "invalid number"}})
+
+    async def run():
+        async with sender(handler, max_retries=3) as client:
+            return await client.send_text("+15550001111", "hi")
+
+    result = asyncio.run(run())
+    assert not result.ok and result.attempts == len(calls) == 1
+
+
+def test_respects_concurrency_cap():
+    in_flight = peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return accepted()
+
+    async def run():
+        async with sender(handler, max_concurrency=3) as client:
+            return await client.send_many((f"+1555000{i:04d}", "hi") for i in range(20))
+
+    report = asyncio.run(run())
+    assert report.sent == 20 and report.failed == 0
+    assert peak == 3
+
+
+def test_non_json_success_body_counts_as_sent():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text="OK")
+
+    async def run():
+        async with sender(handler) as client:
+            return await client.send_text("+15550001111", "hi")
+
+    result = asyncio.run(run())
+    assert result.ok and result.message_id is None and result.attempts == 1